@@ -168,8 +168,113 @@ CACHES = {
     }
 }
 
+# Where the last known price per ticker is kept. Use DjangoCacheLastPriceStore with a
+# shared cache (e.g. Redis) or FileLastPriceStore so all worker processes agree on it.
+LAST_PRICE_STORE = {
+    'BACKEND': env('LAST_PRICE_STORE_BACKEND', default='stocks_api.services.price_store.InMemoryLastPriceStore'),
+    'OPTIONS': {},
+}
+
+# Recent ticks kept in memory per symbol (per process) for /recent-ticks/ and the analysis service
+TICK_BUFFER_SIZE = env.int('TICK_BUFFER_SIZE', default=512)
+
+# Streaming signal detectors run on every ingested tick (see services.detectors), by name.
+# Keys override the detector defaults (ENABLED, THRESHOLD and detector-specific ones such as
+# MIN_SAMPLES); DetectorConfig rows override them again per symbol.
+SIGNAL_DETECTORS = {
+    'threshold': {'THRESHOLD': env.float('SIGNAL_THRESHOLD_PERCENT', default=2.0)},
+    'zscore': {'ENABLED': env.bool('SIGNAL_ZSCORE_ENABLED', default=True)},
+    'ewma_volatility': {'ENABLED': env.bool('SIGNAL_EWMA_VOLATILITY_ENABLED', default=True)},
+    'volume_spike': {'ENABLED': env.bool('SIGNAL_VOLUME_SPIKE_ENABLED', default=True)},
+    'gap_open': {'ENABLED': env.bool('SIGNAL_GAP_OPEN_ENABLED', default=True)},
+}
+
+# Alert rules a user may create through /alert-rules/. A triggered rule's cooldown is claimed
+# with cache.add() and rule changes are announced through a version key in the default cache,
+# so with several worker processes CACHES must be shared (e.g. Redis): with LocMemCache each
+# process alerts on its own and only notices rule changes made in that process.
+MAX_ALERT_RULES_PER_USER = env.int('MAX_ALERT_RULES_PER_USER', default=100)
+
+# Seconds an /event-summary/ response is cached for
+EVENT_SUMMARY_CACHE_TTL = env.int('EVENT_SUMMARY_CACHE_TTL', default=30)
+
+# Server-Sent Events stream of significant events (/event-stream/): seconds between
+# database polls, events per query, events buffered per client before a slow client
+# is dropped, seconds between keepalive comments and the client reconnect delay
+EVENT_STREAM = {
+    'POLL_INTERVAL': env.float('EVENT_STREAM_POLL_INTERVAL', default=1.0),
+    'BATCH_SIZE': env.int('EVENT_STREAM_BATCH_SIZE', default=500),
+    'QUEUE_SIZE': env.int('EVENT_STREAM_QUEUE_SIZE', default=1000),
+    'HEARTBEAT_INTERVAL': env.int('EVENT_STREAM_HEARTBEAT_INTERVAL', default=15),
+    'RETRY_MS': env.int('EVENT_STREAM_RETRY_MS', default=3000),
+}
+
+# Rows fetched from the database per round trip by /price-export/
+PRICE_EXPORT_CHUNK_SIZE = env.int('PRICE_EXPORT_CHUNK_SIZE', default=2000)
+
 # Polygon API settings
 POLYGON_API_KEY = env('POLYGON_API_KEY')
+# Max number of Polygon requests the ingestion task keeps in flight at once
+POLYGON_FETCH_CONCURRENCY = env.int('POLYGON_FETCH_CONCURRENCY', default=8)
+# Ingestion runs hold a lock, renewed every third of this many seconds while they run, and
+# overlapping runs are skipped until it is released (or expires this many seconds after the
+# worker holding it died). Needs a cache shared by the workers
+INGESTION_LOCK_TIMEOUT = env.int('INGESTION_LOCK_TIMEOUT', default=300)
+# Date-range chunks a price backfill (manage.py backfill_prices) downloads at once per process
+POLYGON_BACKFILL_CONCURRENCY = env.int('POLYGON_BACKFILL_CONCURRENCY', default=4)
+# Token bucket shared through the cache: at most CAPACITY requests per PERIOD seconds.
+# Disabled (0) unless configured; set CAPACITY to your plan's quota (e.g. 5 on Polygon's
+# free plan). Background work (Celery tasks) leaves INTERACTIVE_RESERVE tokens for API
+# requests, and each priority waits at most its *_TIMEOUT seconds for a token. The bucket
+# is only shared between processes with a shared cache (e.g. Redis): with the default
+# LocMemCache every process enforces the limit on its own.
+POLYGON_RATE_LIMIT = {
+    'CAPACITY': env.int('POLYGON_RATE_LIMIT_CAPACITY', default=0),
+    'PERIOD': env.int('POLYGON_RATE_LIMIT_PERIOD', default=60),
+    'INTERACTIVE_RESERVE': env.int('POLYGON_RATE_LIMIT_INTERACTIVE_RESERVE', default=1),
+    'INTERACTIVE_TIMEOUT': env.int('POLYGON_RATE_LIMIT_INTERACTIVE_TIMEOUT', default=10),
+    'BACKGROUND_TIMEOUT': env.int('POLYGON_RATE_LIMIT_BACKGROUND_TIMEOUT', default=300),
+}
+# HTTP pipeline for Polygon requests: pooled connections, connect timeout (read timeouts are
+# per call), jittered exponential retries for 429/5xx and connection errors (Retry-After is
+# honored up to BACKOFF_MAX seconds), and a circuit breaker that fails fast for
+# BREAKER_RESET_TIMEOUT seconds after BREAKER_FAILURE_THRESHOLD consecutive failures (0 disables it)
+POLYGON_HTTP = {
+    'POOL_SIZE': env.int('POLYGON_HTTP_POOL_SIZE', default=max(10, POLYGON_FETCH_CONCURRENCY)),
+    'CONNECT_TIMEOUT': env.float('POLYGON_HTTP_CONNECT_TIMEOUT', default=3.05),
+    'MAX_RETRIES': env.int('POLYGON_HTTP_MAX_RETRIES', default=3),
+    'BACKOFF_BASE': env.float('POLYGON_HTTP_BACKOFF_BASE', default=0.5),
+    'BACKOFF_MAX': env.float('POLYGON_HTTP_BACKOFF_MAX', default=20),
+    'BREAKER_FAILURE_THRESHOLD': env.int('POLYGON_BREAKER_FAILURE_THRESHOLD', default=5),
+    'BREAKER_RESET_TIMEOUT': env.int('POLYGON_BREAKER_RESET_TIMEOUT', default=30),
+}
+# WebSocket ingestion (manage.py stream_prices): feed URL and channel (T trades, A per-second
+# or AM per-minute aggregates), ticks per analysis batch, max seconds a tick waits for its
+# batch, ticks buffered before the reader stops reading the socket, the reconnect backoff cap
+# (also used between retries of a failed batch) and how often a failed batch is retried
+# before the ingestor stops
+POLYGON_STREAM = {
+    'URL': env('POLYGON_STREAM_URL', default='wss://socket.polygon.io/stocks'),
+    'FEED': env('POLYGON_STREAM_FEED', default='A'),
+    'BATCH_SIZE': env.int('POLYGON_STREAM_BATCH_SIZE', default=500),
+    'BATCH_INTERVAL': env.float('POLYGON_STREAM_BATCH_INTERVAL', default=1.0),
+    'QUEUE_SIZE': env.int('POLYGON_STREAM_QUEUE_SIZE', default=10000),
+    'RECONNECT_MAX': env.int('POLYGON_STREAM_RECONNECT_MAX', default=60),
+    'PROCESS_RETRIES': env.int('POLYGON_STREAM_PROCESS_RETRIES', default=5),
+}
+# Max Polygon requests in flight per event loop for AsyncPolygonService (ASGI deployments)
+POLYGON_ASYNC_CONCURRENCY = env.int('POLYGON_ASYNC_CONCURRENCY', default=100)
+# Seconds a worker waits for another worker's in-flight request for the same Polygon
+# response before fetching it itself. The per-key lock itself lives as long as the fetching
+# worker's request can take, rate-limit wait and retries included (see _max_request_time)
+POLYGON_SINGLE_FLIGHT_TIMEOUT = env.int('POLYGON_SINGLE_FLIGHT_TIMEOUT', default=20)
+# Seconds Polygon responses stay in the cache: ranges that ended before today never change,
+# ranges touching today can, and empty results are negative-cached briefly
+POLYGON_CACHE_TTL = {
+    'HISTORICAL': env.int('POLYGON_CACHE_TTL_HISTORICAL', default=60 * 60 * 24 * 7),
+    'RECENT': env.int('POLYGON_CACHE_TTL_RECENT', default=60),
+    'EMPTY': env.int('POLYGON_CACHE_TTL_EMPTY', default=300),
+}
 
 # Logging configuration
 LOGGING = {
@@ -214,6 +319,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False, # Prevent duplication of the log if it's already being logged
         },
+        'httpx': {
+            'handlers': ['console'],
+            'level': 'WARNING', # httpx logs every request URL at INFO, including the apiKey parameter
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['console'],
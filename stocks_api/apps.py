@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StocksApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stocks_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks_api.models import StockSymbol
+from stocks_api.services.backfill import CHUNK_DAYS, PriceBackfill
+from stocks_api.tasks import backfill_prices_task
+
+
+class Command(BaseCommand):
+    help = "Seed price history from Polygon aggregates. Interrupted runs resume from their checkpoints when started again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', help="Comma-separated tickers (default: every StockSymbol)")
+        parser.add_argument('--from', dest='date_from', required=True, type=date.fromisoformat, help="First day, YYYY-MM-DD")
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help="Last day, YYYY-MM-DD (default: yesterday)")
+        parser.add_argument('--timespan', choices=CHUNK_DAYS, default='minute', help="Bar size stored per price update")
+        parser.add_argument('--concurrency', type=int, help="Parallel downloads per process")
+        parser.add_argument('--queue', action='store_true', help="Queue one Celery task per ticker instead of running here")
+
+    def handle(self, *args, **options):
+        tickers = [ticker.strip().upper() for ticker in (options['tickers'] or '').split(',') if ticker.strip()]
+        if not tickers:
+            tickers = list(StockSymbol.objects.values_list('ticker', flat=True))
+        if not tickers:
+            raise CommandError("No tickers given and no StockSymbol in the database.")
+        date_from = options['date_from']
+        date_to = options['date_to'] or date.today() - timedelta(days=1)
+        if date_from > date_to:
+            raise CommandError("--from cannot be after --to.")
+
+        if options['queue']:
+            for ticker in tickers:
+                backfill_prices_task.delay([ticker], date_from.isoformat(), date_to.isoformat(), options['timespan'], options['concurrency'])
+            self.stdout.write(self.style.SUCCESS(f"Queued backfill tasks for {len(tickers)} tickers"))
+            return
+
+        stats = PriceBackfill(concurrency=options['concurrency']).run(tickers, date_from, date_to, options['timespan'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['done']}/{stats['chunks']} chunks done, {stats['rows']} price updates written"
+        ))
+        if stats['failed']:
+            self.stdout.write(self.style.WARNING(f"{stats['failed']} chunks failed, run the command again to retry them"))
@@ -0,0 +1,28 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from stocks_api.services.stream_ingestor import FEEDS, PolygonStreamIngestor
+
+
+class Command(BaseCommand):
+    help = "Ingest prices from Polygon's WebSocket feed and analyze them in micro-batches until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', help="Comma-separated tickers (default: every StockSymbol)")
+        parser.add_argument('--feed', choices=FEEDS, help="T (trades), A (per-second) or AM (per-minute aggregates)")
+        parser.add_argument('--url', help="WebSocket URL (default: settings.POLYGON_STREAM['URL'])")
+
+    def handle(self, *args, **options):
+        tickers = [ticker.strip().upper() for ticker in (options['tickers'] or '').split(',') if ticker.strip()]
+        asyncio.run(self.stream(tickers or None, options['feed'], options['url']))
+
+    async def stream(self, tickers, feed, url):
+        ingestor = PolygonStreamIngestor(tickers=tickers, feed=feed, url=url)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, ingestor.stop)
+        self.stdout.write(f"Streaming {ingestor.feed} from {ingestor.url}, press Ctrl+C to stop")
+        await ingestor.run()
+        self.stdout.write(self.style.SUCCESS(f"Stopped: {ingestor.stats}"))
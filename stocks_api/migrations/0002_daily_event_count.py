@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_event_counts(apps, schema_editor):
+    SignificantEvent = apps.get_model('stocks_api', 'SignificantEvent')
+    DailyEventCount = apps.get_model('stocks_api', 'DailyEventCount')
+
+    rows = SignificantEvent.objects.annotate(date=TruncDate('timestamp')).order_by().values(
+        'symbol_id', 'date', 'event_type'
+    ).annotate(count=Count('id'))
+    DailyEventCount.objects.bulk_create(
+        DailyEventCount(symbol_id=row['symbol_id'], date=row['date'], event_type=row['event_type'], count=row['count'])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEventCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('event_type', models.CharField(choices=[('PRICE_INCREASE', 'Price Increase'), ('PRICE_DECREASE', 'Price Decrease')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_event_counts', to='stocks_api.stocksymbol')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='stocks_api__date_e1eb81_idx')],
+                'constraints': [models.UniqueConstraint(fields=('symbol', 'date', 'event_type'), name='unique_daily_event_count')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_event_counts, migrations.RunPython.noop),
+    ]
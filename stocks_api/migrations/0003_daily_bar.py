@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks_api', '0002_daily_event_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.FloatField()),
+                ('vwap', models.FloatField(blank=True, null=True)),
+                ('transactions', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['ticker', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('ticker', 'date'), name='unique_daily_bar')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyBarCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+            ],
+            options={
+                'ordering': ['ticker', 'date_from'],
+                'indexes': [models.Index(fields=['ticker', 'date_from'], name='stocks_api__ticker_ed3b7a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks_api', '0003_daily_bar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timespan', models.CharField(max_length=10)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backfill_chunks', to='stocks_api.stocksymbol')),
+            ],
+            options={
+                'ordering': ['symbol', 'timespan', 'date_from'],
+                'indexes': [models.Index(fields=['status'], name='stocks_api__status_d9d6b3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('symbol', 'timespan', 'date_from', 'date_to'), name='unique_backfill_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:26
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def delete_duplicate_price_updates(apps, schema_editor):
+    """Keep only the most recently inserted row per (symbol, timestamp)."""
+    PriceUpdate = apps.get_model('stocks_api', 'PriceUpdate')
+    duplicates = (
+        PriceUpdate.objects.order_by()
+        .values('symbol_id', 'timestamp')
+        .annotate(rows=Count('id'), keep_id=Max('id'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in list(duplicates):
+        PriceUpdate.objects.filter(
+            symbol_id=duplicate['symbol_id'], timestamp=duplicate['timestamp']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks_api', '0004_backfill_chunk'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_price_updates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='priceupdate',
+            constraint=models.UniqueConstraint(fields=('symbol', 'timestamp'), name='unique_price_update'),
+        ),
+    ]
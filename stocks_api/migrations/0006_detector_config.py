@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks_api', '0005_unique_price_update'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailyeventcount',
+            name='event_type',
+            field=models.CharField(choices=[('PRICE_INCREASE', 'Price Increase'), ('PRICE_DECREASE', 'Price Decrease'), ('PRICE_ANOMALY', 'Price Anomaly'), ('VOLATILITY_BREAKOUT', 'Volatility Breakout'), ('VOLUME_SPIKE', 'Volume Spike'), ('GAP_UP', 'Gap Up'), ('GAP_DOWN', 'Gap Down')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='significantevent',
+            name='event_type',
+            field=models.CharField(choices=[('PRICE_INCREASE', 'Price Increase'), ('PRICE_DECREASE', 'Price Decrease'), ('PRICE_ANOMALY', 'Price Anomaly'), ('VOLATILITY_BREAKOUT', 'Volatility Breakout'), ('VOLUME_SPIKE', 'Volume Spike'), ('GAP_UP', 'Gap Up'), ('GAP_DOWN', 'Gap Down')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='DetectorConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('detector', models.CharField(choices=[('threshold', 'Threshold vs. previous price'), ('zscore', 'Rolling z-score'), ('ewma_volatility', 'EWMA volatility breakout'), ('volume_spike', 'Volume spike'), ('gap_open', 'Gap open')], max_length=20)),
+                ('enabled', models.BooleanField(default=True)),
+                ('threshold', models.FloatField(blank=True, null=True)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detector_configs', to='stocks_api.stocksymbol')),
+            ],
+            options={
+                'ordering': ['symbol', 'detector'],
+                'constraints': [models.UniqueConstraint(fields=('symbol', 'detector'), name='unique_detector_config')],
+            },
+        ),
+    ]
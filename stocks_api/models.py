@@ -1,5 +1,7 @@
+from collections import Counter, defaultdict
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class StockSymbol(models.Model):
     ticker = models.CharField(max_length=10, unique=True, primary_key=True)
@@ -19,6 +21,9 @@ class PriceUpdate(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'timestamp'], name='unique_price_update'),
+        ]
         indexes = [
             models.Index(fields=['symbol', '-timestamp']),
         ]
@@ -26,10 +31,35 @@ class PriceUpdate(models.Model):
     def __str__(self):
         return f"{self.symbol.ticker} at {self.timestamp}: ${self.price}"
 
+    @classmethod
+    def upsert(cls, price_updates, batch_size=1000):
+        """
+        Insert price updates, overwriting price and volume of rows that already exist
+        for the same symbol and timestamp, so retried or overlapping ingestion runs
+        never duplicate history. Within the batch the last update for a key wins.
+
+        Returns:
+            int: Number of rows inserted or updated
+        """
+        unique = {(update.symbol_id, update.timestamp): update for update in price_updates}
+        cls.objects.bulk_create(
+            unique.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['symbol', 'timestamp'],
+            update_fields=['price', 'volume'],
+        )
+        return len(unique)
+
 class SignificantEvent(models.Model):
     EVENT_TYPES = [
         ('PRICE_INCREASE', 'Price Increase'),
-        ('PRICE_DECREASE', 'Price Decrease')
+        ('PRICE_DECREASE', 'Price Decrease'),
+        ('PRICE_ANOMALY', 'Price Anomaly'),
+        ('VOLATILITY_BREAKOUT', 'Volatility Breakout'),
+        ('VOLUME_SPIKE', 'Volume Spike'),
+        ('GAP_UP', 'Gap Up'),
+        ('GAP_DOWN', 'Gap Down'),
     ]
     symbol = models.ForeignKey(StockSymbol, on_delete=models.CASCADE, related_name='significant_events')
     event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
@@ -44,4 +74,223 @@ class SignificantEvent(models.Model):
         ]
 
     def __str__(self):
-        return f"Significant event for {self.symbol.ticker} at {self.timestamp}"
\ No newline at end of file
+        return f"Significant event for {self.symbol.ticker} at {self.timestamp}"
+
+class DailyEventCount(models.Model):
+    """
+        Rollup of significant events per symbol, event type and day, kept up to date as
+        events are created so summaries never have to scan SignificantEvent.
+    """
+    symbol = models.ForeignKey(StockSymbol, on_delete=models.CASCADE, related_name='daily_event_counts')
+    date = models.DateField()
+    event_type = models.CharField(max_length=50, choices=SignificantEvent.EVENT_TYPES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'date', 'event_type'], name='unique_daily_event_count'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol_id} {self.event_type} on {self.date}: {self.count}"
+
+    @classmethod
+    def increment_for(cls, events, delta=1):
+        """
+        Add `delta` to the counters of the given events, creating missing counters.
+
+        Counters are created with one ignore_conflicts insert and incremented with
+        F() updates grouped by increment, so a batch costs a handful of queries and
+        concurrent writers never lose increments.
+        """
+        counts = Counter(
+            (event.symbol_id, timezone.localdate(event.timestamp), event.event_type)
+            for event in events
+        )
+        if not counts:
+            return
+
+        if delta > 0:
+            cls.objects.bulk_create(
+                [cls(symbol_id=ticker, date=date, event_type=event_type) for ticker, date, event_type in counts],
+                ignore_conflicts=True
+            )
+
+        keys_by_increment = defaultdict(list)
+        for key, count in counts.items():
+            keys_by_increment[count * delta].append(key)
+
+        for increment, keys in keys_by_increment.items():
+            # Chunked to stay below SQLite's expression depth limit
+            for start in range(0, len(keys), 500):
+                condition = models.Q()
+                for ticker, date, event_type in keys[start:start + 500]:
+                    condition |= models.Q(symbol_id=ticker, date=date, event_type=event_type)
+                cls.objects.filter(condition).update(count=models.F('count') + increment)
+
+class DailyBar(models.Model):
+    """
+        Daily OHLCV bar as returned by Polygon's aggregates endpoint. Keyed by ticker
+        string rather than a StockSymbol FK because charts can be requested for
+        tickers that are not on the ingestion watchlist.
+    """
+    ticker = models.CharField(max_length=10)
+    date = models.DateField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.FloatField()
+    vwap = models.FloatField(null=True, blank=True)
+    transactions = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['ticker', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'date'], name='unique_daily_bar'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} on {self.date}: {self.close}"
+
+class DailyBarCoverage(models.Model):
+    """
+        Date ranges whose daily bars have already been downloaded for a ticker, so
+        weekends and holidays (which have no bars) are not re-requested.
+        Only closed ranges (ending before today) are recorded, and empty ranges
+        only for tickers that have bars.
+    """
+    ticker = models.CharField(max_length=10)
+    date_from = models.DateField()
+    date_to = models.DateField()
+
+    class Meta:
+        ordering = ['ticker', 'date_from']
+        indexes = [
+            models.Index(fields=['ticker', 'date_from']),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} bars from {self.date_from} to {self.date_to}"
+
+class BackfillChunk(models.Model):
+    """
+        Checkpoint of a historical price backfill: one Polygon-sized date range of
+        bars for a symbol. Chunks are planned up front and marked done in the same
+        transaction that stores their rows, so an interrupted backfill picks up
+        where it stopped when it is started again.
+    """
+    PENDING = 'PENDING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    symbol = models.ForeignKey(StockSymbol, on_delete=models.CASCADE, related_name='backfill_chunks')
+    timespan = models.CharField(max_length=10)
+    date_from = models.DateField()
+    date_to = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    rows = models.PositiveIntegerField(default=0) # Price updates written by this chunk
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', 'timespan', 'date_from']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'timespan', 'date_from', 'date_to'], name='unique_backfill_chunk'),
+        ]
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol_id} {self.timespan} bars from {self.date_from} to {self.date_to}: {self.status}"
+
+class DetectorConfig(models.Model):
+    """
+        Per-symbol settings of a signal detector (see services.detectors). Fields
+        left empty fall back to settings.SIGNAL_DETECTORS and the detector defaults.
+    """
+    DETECTORS = [
+        ('threshold', 'Threshold vs. previous price'),
+        ('zscore', 'Rolling z-score'),
+        ('ewma_volatility', 'EWMA volatility breakout'),
+        ('volume_spike', 'Volume spike'),
+        ('gap_open', 'Gap open'),
+    ]
+    symbol = models.ForeignKey(StockSymbol, on_delete=models.CASCADE, related_name='detector_configs')
+    detector = models.CharField(max_length=20, choices=DETECTORS)
+    enabled = models.BooleanField(default=True)
+    threshold = models.FloatField(null=True, blank=True)
+    params = models.JSONField(default=dict, blank=True) # Other parameters, e.g. {'min_samples': 50}
+
+    class Meta:
+        ordering = ['symbol', 'detector']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'detector'], name='unique_detector_config'),
+        ]
+
+    def __str__(self):
+        return f"{self.detector} detector for {self.symbol_id}"
+
+class AlertRule(models.Model):
+    """
+        A user's alert: notify when the symbol's price moves by at least
+        `threshold` percent in `direction` within the last `window` seconds.
+        Evaluated on every ingested batch, see services.alert_engine.
+    """
+    UP = 'UP'
+    DOWN = 'DOWN'
+    DIRECTIONS = [
+        (UP, 'Up'),
+        (DOWN, 'Down'),
+    ]
+    WINDOWS = [
+        (60, '1 minute'),
+        (300, '5 minutes'),
+        (900, '15 minutes'),
+        (3600, '1 hour'),
+        (86400, '1 day'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alert_rules')
+    symbol = models.ForeignKey(StockSymbol, on_delete=models.CASCADE, related_name='alert_rules')
+    direction = models.CharField(max_length=4, choices=DIRECTIONS)
+    threshold = models.DecimalField(max_digits=7, decimal_places=2) # Percent
+    window = models.PositiveIntegerField(choices=WINDOWS, default=300) # Seconds
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_triggered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.symbol_id} {self.direction} {self.threshold}% in {self.window}s for {self.user}"
+
+class Alert(models.Model):
+    """
+        A triggered AlertRule. `user` and `symbol` are copied from the rule so a
+        user's alerts are listed without joining the rules.
+    """
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='alerts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alerts')
+    symbol = models.ForeignKey(StockSymbol, on_delete=models.CASCADE, related_name='alerts')
+    timestamp = models.DateTimeField() # Detection time
+    details = models.JSONField() # Prices and change over the rule's window
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp']),
+        ]
+
+    def __str__(self):
+        return f"Alert {self.rule_id} for {self.symbol_id} at {self.timestamp}"
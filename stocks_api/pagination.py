@@ -0,0 +1,130 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TimestampKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on (timestamp, id) for time-ordered endpoints.
+
+    Each page is a range scan starting right after the previous page's last row, so
+    deep pages cost the same as the first one instead of an OFFSET scan. The response
+    keeps the page-number layout ({'count', 'next', 'previous', 'results'}).
+    Rows may be model instances or named values_list() tuples with 'id' and 'timestamp'.
+
+    Query parameters:
+    - cursor: opaque position taken from the 'next' / 'previous' links
+    - page_size: rows per page, capped at max_page_size
+    - count=false: skip the COUNT(*) over the filtered table ('count' is omitted)
+
+    Requests using ?page=N, or ordered by anything other than timestamp, fall back
+    to regular page-number pagination.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fallback = None
+
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        first_field = ordering[0] if ordering else None
+        if 'page' in request.query_params or first_field not in ('timestamp', '-timestamp'):
+            self.fallback = PageNumberPagination()
+            self.fallback.page_size = self.page_size
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.descending = first_field == '-timestamp'
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        self.include_count = request.query_params.get(self.count_query_param, 'true').lower() not in ('false', '0', 'no')
+        if self.include_count:
+            self.count = queryset.count()
+
+        if self.descending:
+            queryset = queryset.order_by('-timestamp', '-id')
+        else:
+            queryset = queryset.order_by('timestamp', 'id')
+
+        if cursor:
+            # Walking forward through a descending list (or backward through an ascending one) means lower keys
+            if self.descending != reverse:
+                position = Q(timestamp__lt=cursor['timestamp']) | Q(timestamp=cursor['timestamp'], id__lt=cursor['id'])
+            else:
+                position = Q(timestamp__gt=cursor['timestamp']) | Q(timestamp=cursor['timestamp'], id__gt=cursor['id'])
+            queryset = queryset.filter(position)
+
+        if reverse:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+
+        response = {}
+        if self.include_count:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        position = json.dumps({'t': row.timestamp.isoformat(), 'i': row.id, 'r': reverse})
+        token = base64.urlsafe_b64encode(position.encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return {
+                'timestamp': datetime.fromisoformat(position['t']),
+                'id': int(position['i']),
+                'reverse': bool(position['r']),
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound("Invalid cursor")
@@ -1,5 +1,7 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import SignificantEvent, StockSymbol, PriceUpdate
+from .models import Alert, AlertRule, SignificantEvent, StockSymbol, PriceUpdate
 
 class StockSymbolSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,3 +23,16 @@ class PriceUpdateSerializer(serializers.ModelSerializer):
         model = PriceUpdate
         fields = ['id', 'symbol', 'timestamp', 'price', 'volume']
         read_only_fields = ['timestamp']
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    threshold = serializers.DecimalField(max_digits=7, decimal_places=2, min_value=Decimal('0.01'))
+
+    class Meta:
+        model = AlertRule
+        fields = ['id', 'symbol', 'direction', 'threshold', 'window', 'enabled', 'created_at', 'last_triggered_at']
+        read_only_fields = ['created_at', 'last_triggered_at']
+
+class AlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Alert
+        fields = ['id', 'rule', 'symbol', 'timestamp', 'details']
@@ -0,0 +1,178 @@
+import logging
+import uuid
+from bisect import bisect_right
+from collections import namedtuple
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from stocks_api.models import Alert, AlertRule, PriceUpdate
+from stocks_api.services.tick_buffer import from_epoch_us, get_tick_buffer, to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+# Changes whenever an AlertRule is saved or deleted (see signals.py), so every
+# process rebuilds its index on its next batch
+RULES_VERSION_KEY = 'alert_rules:version'
+COOLDOWN_KEY_PREFIX = 'alert_rule_cooldown'
+
+RuleEntry = namedtuple('RuleEntry', ['id', 'user_id', 'threshold'])
+
+
+def invalidate_alert_rules():
+    cache.set(RULES_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class AlertRuleIndex:
+    """
+    Enabled alert rules grouped by ticker, window and direction, each group sorted
+    by threshold. The rules a price move triggers are a prefix of its group, found
+    with one binary search, so evaluating a ticker costs O(windows x log rules +
+    matches) however many rules there are.
+    """
+
+    def __init__(self, rules):
+        """
+        Args:
+            rules: Iterable of (id, user_id, ticker, direction, threshold, window) tuples
+        """
+        groups = {}
+        for rule_id, user_id, ticker, direction, threshold, window in rules:
+            groups.setdefault(ticker, {}).setdefault(window, {}).setdefault(direction, []).append(
+                RuleEntry(rule_id, user_id, float(threshold))
+            )
+        self._groups = {}
+        self.size = 0
+        for ticker, windows in groups.items():
+            for window, directions in windows.items():
+                for direction, entries in directions.items():
+                    entries.sort(key=lambda entry: entry.threshold)
+                    thresholds = [entry.threshold for entry in entries]
+                    self._groups.setdefault(ticker, {}).setdefault(window, {})[direction] = (thresholds, entries)
+                    self.size += len(entries)
+
+    def windows(self, ticker):
+        """Windows (seconds) with rules for the ticker."""
+        return list(self._groups.get(ticker, ()))
+
+    def matching(self, ticker, window, direction, change):
+        """
+        Rules of a ticker, window and direction whose threshold is at most `change`
+        (a non-negative percentage).
+        """
+        group = self._groups.get(ticker, {}).get(window, {}).get(direction)
+        if not group:
+            return []
+        thresholds, entries = group
+        return entries[:bisect_right(thresholds, change)]
+
+
+class AlertEngine:
+    """
+    Evaluates user alert rules against the ticks in the tick buffer, caught up from
+    the database first so ticks ingested by other workers are seen.
+
+    The AlertRuleIndex is built with one query and kept until a rule changes. For
+    every ticker in a batch the engine looks up the price move over each window
+    that has rules, from the price at the start of the window (the newest tick at
+    or before it) to the newest tick, and collects the matching rules. The start
+    price comes from the buffer when it reaches back that far and from PriceUpdate
+    otherwise; windows that reach back before the ticker's history are skipped.
+    A triggered rule is silenced for its window with a cache key, claimed
+    atomically so workers sharing the cache never alert twice.
+    """
+
+    def __init__(self, tick_buffer=None):
+        self._tick_buffer = tick_buffer
+        self._index = None
+        self._version = None
+
+    @property
+    def tick_buffer(self):
+        return self._tick_buffer or get_tick_buffer()
+
+    @property
+    def index(self):
+        version = cache.get(RULES_VERSION_KEY)
+        if self._index is None or version != self._version:
+            rules = AlertRule.objects.filter(enabled=True).values_list(
+                'id', 'user_id', 'symbol_id', 'direction', 'threshold', 'window'
+            )
+            self._index = AlertRuleIndex(rules)
+            self._version = version
+            logger.info(f"Indexed {self._index.size} alert rules")
+        return self._index
+
+    def evaluate(self, tickers):
+        """
+        Check the rules of the given tickers against their buffered ticks.
+
+        Args:
+            tickers: Tickers that received new ticks
+
+        Returns:
+            list: Unsaved Alert objects
+        """
+        index = self.index
+        tickers = [ticker for ticker in sorted(tickers) if index.windows(ticker)]
+        if not tickers:
+            return []
+        self.tick_buffer.load(tickers)
+        now = timezone.now()
+        alerts = []
+        for ticker in tickers:
+            windows = index.windows(ticker)
+            latest = self.tick_buffer.latest([ticker]).get(ticker)
+            if latest is None:
+                continue
+            timestamps, prices, _ = self.tick_buffer.window(ticker)
+            newest = to_epoch_us(latest['timestamp'])
+
+            for window in windows:
+                start = self._reference(ticker, timestamps, prices, newest - window * 1_000_000)
+                if start is None:
+                    continue
+                reference_timestamp, reference = start
+                current = float(prices[-1])
+                if not reference or reference == current:
+                    continue
+                change = (current - reference) / reference * 100
+                direction = AlertRule.UP if change > 0 else AlertRule.DOWN
+                for rule in index.matching(ticker, window, direction, abs(change)):
+                    if not cache.add(f"{COOLDOWN_KEY_PREFIX}:{rule.id}", True, timeout=window):
+                        continue
+                    alerts.append(Alert(
+                        rule_id=rule.id,
+                        user_id=rule.user_id,
+                        symbol_id=ticker,
+                        timestamp=now,
+                        details={
+                            'direction': direction,
+                            'threshold': rule.threshold,
+                            'window': window,
+                            'reference_price': reference,
+                            'reference_timestamp': from_epoch_us(reference_timestamp).isoformat(),
+                            'current_price': current,
+                            'current_timestamp': latest['timestamp'].isoformat(),
+                            'percentage_change': f"{change:.2f}",
+                        },
+                    ))
+        return alerts
+
+    @staticmethod
+    def _reference(ticker, timestamps, prices, start):
+        """
+        The (epoch microseconds, price) of the newest tick at or before `start`, read
+        from the buffered ticks if they reach back that far, else from PriceUpdate.
+
+        Returns:
+            tuple or None: None if the ticker has no price that old
+        """
+        position = int(np.searchsorted(timestamps, start, side='right')) - 1
+        if position >= 0:
+            return int(timestamps[position]), float(prices[position])
+        row = PriceUpdate.objects.filter(symbol_id=ticker, timestamp__lte=from_epoch_us(start)).order_by('-timestamp').values_list('timestamp', 'price').first()
+        if row is None:
+            return None
+        return to_epoch_us(row[0]), float(row[1])
@@ -1,40 +1,176 @@
 import logging
+import threading
 from decimal import Decimal
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
-from stocks_api.models import StockSymbol, SignificantEvent, PriceUpdate
+from stocks_api.models import Alert, AlertRule, StockSymbol, SignificantEvent, PriceUpdate, DailyEventCount
+from stocks_api.services.alert_engine import AlertEngine
+from stocks_api.services.detectors import DetectorEngine, Tick
+from stocks_api.services.price_store import get_last_price_store
+from stocks_api.services.tick_buffer import NO_VOLUME, get_tick_buffer
 
 logger = logging.getLogger(__name__)
 
-# Store the last known price for each symbol.
-LAST_PRICES_MEMORY_CACHE = {} # { 'ticker': {'price': Decimal, 'timestamp': datetime} }
-
-SIGNIFICANT_CHANGE_PERCENTAGE_THRESHOLD = Decimal('2.0') # e.g., 2% change
-
 class StockAnalysisService:
     def __init__(self):
-        # Load initial last prices from DB
-        self._initialize_cache_from_db()
-    
+        # Warm-up is deferred until a method actually needs previous prices
+        self._warm = False
+        self._warm_lock = threading.Lock()
+        # Signal detectors run over every analyzed tick, see services.detectors
+        self.detector_engine = DetectorEngine()
+        # User alert rules, checked against the tick buffer after every batch
+        self.alert_engine = AlertEngine()
+
+    @property
+    def price_store(self):
+        # Last known prices live in a store shared by all workers (see settings.LAST_PRICE_STORE)
+        return get_last_price_store()
+
+    @property
+    def tick_buffer(self):
+        # Recent ticks per symbol in this process, see TickBuffer
+        return get_tick_buffer()
+
+    def _ensure_warm(self):
+        """
+        Load last prices from the database the first time they are needed, unless
+        another worker sharing the price store already did.
+        """
+        if self._warm:
+            return
+        with self._warm_lock:
+            if not self._warm:
+                if not self.price_store.is_warm():
+                    self._initialize_cache_from_db()
+                if not self.tick_buffer.is_warm():
+                    self.tick_buffer.load()
+                self._warm = True
+
     def _initialize_cache_from_db(self):
         """
         Initialize the price cache from the database.
         This ensures we have historical data even after service restart.
         """
         logger.info("Initializing price cache from database...")
-        symbols = StockSymbol.objects.all()
-        count = 0
-        
-        for symbol in symbols:
-            last_update = PriceUpdate.objects.filter(symbol=symbol).order_by('-timestamp').first()
-            if last_update:
-                LAST_PRICES_MEMORY_CACHE[symbol.ticker] = {
-                    'price': last_update.price,
-                    'timestamp': last_update.timestamp
-                }
-                count += 1
-                logger.debug(f"Initialized cache for {symbol.ticker} with price {last_update.price}")
-        
-        logger.info(f"Price cache initialization complete. Loaded {count} symbols.")
+        latest_prices = self._latest_prices_from_db()
+        # Only fills the gaps, never replaces a newer live price
+        self.price_store.swap_many(latest_prices)
+        self.price_store.mark_warm()
+        logger.info(f"Price cache initialization complete. Loaded {len(latest_prices)} symbols.")
+
+    def _latest_prices_from_db(self, tickers=None):
+        """
+        Fetch the latest PriceUpdate for each symbol in one query.
+
+        Args:
+            tickers: Restrict to these tickers, all symbols if None
+
+        Returns:
+            dict: { 'ticker': {'price': Decimal, 'timestamp': datetime} }
+        """
+        price_updates = PriceUpdate.objects.all()
+        if tickers is not None:
+            price_updates = price_updates.filter(symbol_id__in=tickers)
+
+        latest = price_updates.annotate(
+            row_number=Window(RowNumber(), partition_by=[F('symbol')], order_by=F('timestamp').desc())
+        ).filter(row_number=1).values_list('symbol_id', 'price', 'timestamp')
+
+        return {ticker: {'price': price, 'timestamp': timestamp} for ticker, price, timestamp in latest}
+
+    def process_price_batch(self, records):
+        """
+        Analyzes a batch of new price data in one pass and persists it in a single transaction.
+
+        Symbols and any last prices missing from the price store are resolved with one
+        query each, the signal detectors run over the batch in memory, and all PriceUpdate and
+        SignificantEvent rows are written with bulk inserts (price updates as upserts).
+
+        Args:
+            records: Iterable of dicts with 'symbol', 'price' (Decimal), 'timestamp'
+                     and optionally 'volume', e.g. the output of PolygonService.get_last_trades
+
+        Returns:
+            List of created SignificantEvent objects
+        """
+        records = sorted(records, key=lambda record: record['timestamp'])
+        if not records:
+            return []
+        self._ensure_warm()
+
+        tickers = {record['symbol'] for record in records}
+        symbols = StockSymbol.objects.in_bulk(tickers)
+        for ticker in tickers - set(symbols):
+            logger.warning(f"StockSymbol {ticker} not found. Cannot process.")
+        records = [record for record in records if record['symbol'] in symbols]
+
+        missing = set(symbols) - set(self.price_store.get_many(symbols))
+        if missing:
+            self.price_store.swap_many(self._latest_prices_from_db(missing))
+
+        # Claim the newest tick per symbol in one atomic swap; the entries it replaces are the
+        # previous prices every other worker will also see, so events are never double counted.
+        newest = {record['symbol']: {'price': record['price'], 'timestamp': record['timestamp']} for record in records}
+        swaps = self.price_store.swap_many(newest)
+        try:
+            events, price_updates = self._analyze_and_store(records, symbols, swaps)
+        except Exception:
+            # Nothing was stored: put the previous prices back so a retry is not skipped as stale
+            self.price_store.revert_swaps(newest, swaps)
+            raise
+        self.tick_buffer.extend(records)
+        alerts = self._trigger_alerts(symbols)
+
+        logger.info(
+            f"Processed batch of {len(price_updates)} price updates, created {len(events)} significant events and {len(alerts)} alerts"
+        )
+        return events
+
+    def _analyze_and_store(self, records, symbols, swaps):
+        """
+        Run the detectors over the non-stale records of a batch and write its events
+        and price updates in one transaction.
+
+        Returns:
+            tuple: (created SignificantEvent objects, PriceUpdate objects)
+        """
+        last_prices = {ticker: previous for ticker, (previous, applied) in swaps.items()}
+        ticks = []
+        price_updates = []
+        for record in records:
+            stock_symbol = symbols[record['symbol']]
+            current_price = record['price']
+            current_timestamp = record['timestamp']
+            last_known_data = last_prices.get(stock_symbol.ticker)
+
+            if last_known_data and current_timestamp <= last_known_data['timestamp']:
+                logger.debug(f"Skipping analysis of stale tick for {stock_symbol.ticker} at {current_timestamp}")
+            else:
+                ticks.append(Tick(stock_symbol, current_price, current_timestamp, record.get('volume'), last_known_data))
+                last_prices[stock_symbol.ticker] = {'price': current_price, 'timestamp': current_timestamp}
+
+            price_updates.append(PriceUpdate(
+                symbol=stock_symbol,
+                timestamp=current_timestamp,
+                price=current_price,
+                volume=record.get('volume')
+            ))
+
+        events, detector_states = self.detector_engine.run(ticks)
+        with transaction.atomic():
+            SignificantEvent.objects.bulk_create(events)
+            # bulk_create skips the post_save signal that maintains the rollup
+            DailyEventCount.increment_for(events)
+            # Upsert: a tick that is delivered twice (retries, overlapping runs) is stored once
+            PriceUpdate.upsert(price_updates)
+        # Only once the batch is stored, so a failed write leaves the detectors where a retry expects them
+        self.detector_engine.save_states(detector_states)
+        return events, price_updates
 
     def process_new_price_data(self, symbol_ticker: str, current_price: Decimal, current_timestamp: timezone.datetime):
         """
@@ -46,73 +182,118 @@ class StockAnalysisService:
             current_timestamp: The timestamp of the current price data
             
         Returns:
-            SignificantEvent object if created, None otherwise
+            The first SignificantEvent created (detectors may create several), None otherwise
         """
         try:
             stock_symbol = StockSymbol.objects.get(ticker=symbol_ticker)
         except StockSymbol.DoesNotExist:
             logger.warning(f"StockSymbol {symbol_ticker} not found. Cannot process.")
             return None
+        self._ensure_warm()
 
-        # First try to get the last price from memory cache
-        last_known_data = LAST_PRICES_MEMORY_CACHE.get(symbol_ticker)
-        
-        # If not in memory cache, try to get from database
-        if not last_known_data:
+        # If the price store has nothing for this symbol yet, seed it from the database
+        if self.price_store.get(symbol_ticker) is None:
             last_price_update = PriceUpdate.objects.filter(symbol=stock_symbol).order_by('-timestamp').first()
             if last_price_update:
-                last_known_data = {
-                    'price': last_price_update.price,
-                    'timestamp': last_price_update.timestamp
-                }
+                self.price_store.swap(symbol_ticker, last_price_update.price, last_price_update.timestamp)
                 logger.info(f"Retrieved last price for {symbol_ticker} from database: {last_price_update.price}")
 
-        event_created = None
-        if last_known_data:
-            previous_price = last_known_data['price']
-            if previous_price == Decimal('0') or previous_price == Decimal('0.00000001'):
-                percentage_change = Decimal('0')
+        # Atomically replace the last price; the entry we get back is the agreed previous price
+        entry = {'price': current_price, 'timestamp': current_timestamp}
+        swaps = self.price_store.swap_many({symbol_ticker: entry})
+        last_known_data, applied = swaps[symbol_ticker]
+
+        try:
+            events, detector_states = [], {}
+            if applied:
+                events, detector_states = self.detector_engine.run([Tick(stock_symbol, current_price, current_timestamp, None, last_known_data)])
             else:
-                percentage_change = ((current_price - previous_price) / previous_price) * Decimal('100')
-
-            logger.info(
-                f"Symbol: {symbol_ticker}, Prev Price: {previous_price}, Curr Price: {current_price}, %Change: {percentage_change:.2f}%"
-            )
-
-            if abs(percentage_change) >= SIGNIFICANT_CHANGE_PERCENTAGE_THRESHOLD:
-                event_type = 'PRICE_INCREASE' if percentage_change > 0 else 'PRICE_DECREASE'
-                details = {
-                    'previous_price': str(previous_price),
-                    'current_price': str(current_price),
-                    'percentage_change': f"{percentage_change:.2f}",
-                    'previous_timestamp': last_known_data['timestamp'].isoformat() if last_known_data.get('timestamp') else None,
-                    'current_timestamp': current_timestamp.isoformat(),
-                }
-                event_created = SignificantEvent.objects.create(
+                logger.debug(f"Skipping analysis of stale tick for {symbol_ticker} at {current_timestamp}")
+            with transaction.atomic():
+                for event in events:
+                    event.save()
+                    logger.info(f"Significant event CREATED for {symbol_ticker}: {event.event_type}, {event.details}")
+
+                # Save the price update to the database for historical record
+                PriceUpdate.upsert([PriceUpdate(
                     symbol=stock_symbol,
-                    event_type=event_type,
-                    timestamp=timezone.now(), # Event detection time
-                    details=details
-                )
-                logger.info(f"Significant event CREATED for {symbol_ticker}: {event_type}, {percentage_change:.2f}%")
-
-        # Update the memory cache
-        LAST_PRICES_MEMORY_CACHE[symbol_ticker] = {
-            'price': current_price,
-            'timestamp': current_timestamp
-        }
-        
-        # Save the price update to the database for historical record
-        price_update = PriceUpdate.objects.create(
-            symbol=stock_symbol,
-            timestamp=current_timestamp,
-            price=current_price,
-            volume=None  # Could be populated if volume data is available
-        )
+                    timestamp=current_timestamp,
+                    price=current_price,
+                    volume=None  # Could be populated if volume data is available
+                )])
+            self.detector_engine.save_states(detector_states)
+        except Exception:
+            # Nothing was stored: put the previous price back so a retry is not skipped as stale
+            self.price_store.revert_swaps({symbol_ticker: entry}, swaps)
+            raise
+        event_created = events[0] if events else None
+        self.tick_buffer.extend([{'symbol': symbol_ticker, 'price': current_price, 'timestamp': current_timestamp}])
+        self._trigger_alerts([symbol_ticker])
         logger.debug(f"Saved price update for {symbol_ticker}: {current_price} at {current_timestamp}")
         
         return event_created
     
+    def _trigger_alerts(self, tickers):
+        """
+        Evaluate user alert rules for tickers that received ticks and store the
+        triggered alerts. Tickers without rules cost no query; for the others the
+        tick buffer is caught up with one query per batch, plus one per window the
+        buffer does not reach back to, one to re-index changed rules and the writes
+        of triggered alerts.
+
+        Returns:
+            List of created Alert objects
+        """
+        alerts = self.alert_engine.evaluate(tickers)
+        if alerts:
+            with transaction.atomic():
+                Alert.objects.bulk_create(alerts)
+                AlertRule.objects.filter(id__in=[alert.rule_id for alert in alerts]).update(last_triggered_at=alerts[0].timestamp)
+        return alerts
+
+    def get_recent_ticks(self, symbol_ticker: str, seconds: int = None, limit: int = None):
+        """
+        Recent ticks for a symbol from the in-memory tick buffer, after catching up
+        with rows other processes have stored since the last read.
+
+        Args:
+            symbol_ticker: The ticker symbol (e.g., 'GOOGL')
+            seconds: Only ticks from the last `seconds` seconds
+            limit: Only the newest `limit` ticks (at most settings.TICK_BUFFER_SIZE are kept)
+
+        Returns:
+            Dictionary with columnar 'series' (timestamps, prices, volumes) and window statistics
+        """
+        self.tick_buffer.load([symbol_ticker])
+        since = timezone.now() - timezone.timedelta(seconds=seconds) if seconds else None
+        timestamps, prices, volumes = self.tick_buffer.window(symbol_ticker, since=since, limit=limit)
+
+        known_volumes = volumes != NO_VOLUME
+        stats = None
+        if len(prices):
+            traded = volumes[known_volumes]
+            stats = {
+                'first': float(prices[0]),
+                'last': float(prices[-1]),
+                'min': float(prices.min()),
+                'max': float(prices.max()),
+                'mean': float(prices.mean()),
+                'change_percent': float((prices[-1] - prices[0]) / prices[0] * 100) if prices[0] else 0.0,
+                'vwap': float((prices[known_volumes] * traded).sum() / traded.sum()) if traded.sum() else None,
+            }
+        return {
+            'count': len(prices),
+            'stats': stats,
+            'series': {
+                'timestamp': [
+                    timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+                    for timestamp in timestamps.astype('datetime64[us]').astype(object)
+                ],
+                'price': prices.tolist(),
+                'volume': [int(volume) if known else None for volume, known in zip(volumes.tolist(), known_volumes.tolist())],
+            },
+        }
+
     def get_price_history(self, symbol_ticker: str, days: int = 7):
         """
         Get price history for a symbol for the specified number of days.
@@ -139,40 +320,90 @@ class StockAnalysisService:
         
         return price_updates
     
-    def get_significant_events_summary(self, days: int = 7):
+    def get_significant_events_summary(self, days: int = 7, include_daily: bool = False, top_n: int = None):
         """
         Get a summary of significant events for all symbols for the specified number of days.
+
+        Served from the DailyEventCount rollup, so the cost depends on the number of
+        (symbol, event type, day) counters rather than on the number of events, and
+        cached for EVENT_SUMMARY_CACHE_TTL seconds. The period covers whole days,
+        starting at the date `days` days ago.
         
         Args:
             days: Number of days of history to include
+            include_daily: Also return per-day counts under 'by_day'
+            top_n: Also return the N symbols with the most events under 'top_movers'
             
         Returns:
             Dictionary with summary statistics
         """
-        start_date = timezone.now() - timezone.timedelta(days=days)
-        
-        # Get all events in the time period
-        events = SignificantEvent.objects.filter(timestamp__gte=start_date)
-        
-        # Count events by type
-        increases = events.filter(event_type='PRICE_INCREASE').count()
-        decreases = events.filter(event_type='PRICE_DECREASE').count()
-        
-        # Count events by symbol
-        events_by_symbol = {}
-        for symbol in StockSymbol.objects.all():
-            symbol_events = events.filter(symbol=symbol)
-            if symbol_events.exists():
-                events_by_symbol[symbol.ticker] = {
-                    'total': symbol_events.count(),
-                    'increases': symbol_events.filter(event_type='PRICE_INCREASE').count(),
-                    'decreases': symbol_events.filter(event_type='PRICE_DECREASE').count()
-                }
-        
-        return {
+        cache_key = f"event_summary:{days}:{int(include_daily)}:{top_n or 0}"
+        summary = cache.get(cache_key)
+        if summary is not None:
+            return summary
+
+        start_date = timezone.localdate(timezone.now() - timezone.timedelta(days=days))
+        counters = DailyEventCount.objects.filter(date__gte=start_date)
+
+        # symbol_id is the ticker (StockSymbol's primary key), so no join is needed
+        group_by = ['symbol_id', 'event_type']
+        if include_daily:
+            group_by.append('date')
+        counts = counters.order_by().values(*group_by).annotate(total=Sum('count'))
+
+        rows = (
+            (row['symbol_id'], row['event_type'], row.get('date'), row['total'])
+            for row in counts if row['total']
+        )
+        summary = self._summarize_event_counts(rows, days, include_daily, top_n)
+        cache.set(cache_key, summary, settings.EVENT_SUMMARY_CACHE_TTL)
+        return summary
+
+    def _summarize_event_counts(self, rows, days, include_daily=False, top_n=None):
+        """
+        Fold (ticker, event_type, day, count) rows into the event summary response.
+        """
+        summary = {
             'period_days': days,
-            'total_events': events.count(),
-            'increases': increases,
-            'decreases': decreases,
-            'by_symbol': events_by_symbol
+            'total_events': 0,
+            'increases': 0,
+            'decreases': 0,
+            'by_symbol': {}
         }
+        by_day = {}
+
+        for ticker, event_type, day, count in rows:
+            symbol_summary = summary['by_symbol'].setdefault(ticker, {'total': 0, 'increases': 0, 'decreases': 0})
+            symbol_summary['total'] += count
+            summary['total_events'] += count
+            if event_type == 'PRICE_INCREASE':
+                symbol_summary['increases'] += count
+                summary['increases'] += count
+            elif event_type == 'PRICE_DECREASE':
+                symbol_summary['decreases'] += count
+                summary['decreases'] += count
+
+            if include_daily:
+                day_summary = by_day.setdefault(day.isoformat(), {'total': 0, 'increases': 0, 'decreases': 0})
+                day_summary['total'] += count
+                if event_type == 'PRICE_INCREASE':
+                    day_summary['increases'] += count
+                elif event_type == 'PRICE_DECREASE':
+                    day_summary['decreases'] += count
+
+        summary['by_symbol'] = dict(sorted(summary['by_symbol'].items()))
+        if include_daily:
+            summary['by_day'] = dict(sorted(by_day.items()))
+        if top_n:
+            movers = sorted(summary['by_symbol'].items(), key=lambda item: (-item[1]['total'], item[0]))[:top_n]
+            summary['top_movers'] = [{'ticker': ticker, **counts} for ticker, counts in movers]
+
+        return summary
+
+@lru_cache(maxsize=None)
+def get_analysis_service():
+    """
+    Return the process-wide StockAnalysisService, so the price store is warmed
+    at most once per process instead of on every task run and API request.
+    """
+    return StockAnalysisService()
@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+
+# Polygon aggregate keys and the column names used in analytics frames
+AGGREGATE_COLUMNS = {
+    'o': 'open',
+    'h': 'high',
+    'l': 'low',
+    'c': 'close',
+    'v': 'volume',
+}
+
+
+def aggregates_to_frame(aggregates):
+    """
+    Convert Polygon aggregate dicts into a DataFrame indexed by bar start time (UTC).
+
+    Args:
+        aggregates (list): Polygon aggregates ({'t', 'o', 'h', 'l', 'c', 'v', ...})
+
+    Returns:
+        pandas.DataFrame: open/high/low/close/volume float columns, missing values as 0
+    """
+    frame = pd.DataFrame.from_records(aggregates, columns=['t', *AGGREGATE_COLUMNS])
+    frame = frame.rename(columns=AGGREGATE_COLUMNS)
+    frame.index = pd.to_datetime(frame.pop('t').fillna(0), unit='ms', utc=True)
+    return frame.astype(float).fillna(0.0)
+
+
+def _zscores(values):
+    std = values.std()
+    if not std:
+        return np.zeros_like(values)
+    return (values - values.mean()) / std
+
+
+def compare_to_average(frame):
+    """
+    Compare each bar's close and volume with the period average.
+
+    Args:
+        frame (pandas.DataFrame): Output of aggregates_to_frame
+
+    Returns:
+        tuple: (averages dict, per-bar analysis list) in the
+               get_daily_aggregates_against_average response format
+    """
+    close = frame['close'].to_numpy()
+    volume = frame['volume'].to_numpy()
+    avg_close = close.mean()
+    avg_volume = volume.mean()
+
+    close_diff = close - avg_close
+    volume_diff = volume - avg_volume
+    close_diff_pct = close_diff / avg_close * 100 if avg_close else np.zeros_like(close)
+    volume_diff_pct = volume_diff / avg_volume * 100 if avg_volume else np.zeros_like(volume)
+
+    columns = zip(
+        frame.index.strftime('%Y-%m-%d'),
+        close.tolist(),
+        volume.tolist(),
+        close_diff.tolist(),
+        close_diff_pct.tolist(),
+        (close_diff > 0).tolist(),
+        volume_diff.tolist(),
+        volume_diff_pct.tolist(),
+        (volume_diff > 0).tolist(),
+    )
+    daily_analysis = [
+        {
+            'date': day,
+            'close': close_price,
+            'volume': bar_volume,
+            'close_vs_avg': {'diff': c_diff, 'diff_pct': c_pct, 'is_above_avg': c_above},
+            'volume_vs_avg': {'diff': v_diff, 'diff_pct': v_pct, 'is_above_avg': v_above},
+        }
+        for day, close_price, bar_volume, c_diff, c_pct, c_above, v_diff, v_pct, v_above in columns
+    ]
+    return {'close': float(avg_close), 'volume': float(avg_volume)}, daily_analysis
+
+
+def analyze_aggregates(frame, window=20, zscore_threshold=2.0):
+    """
+    Summary statistics, z-scores, rolling averages and volume anomalies for a series of bars.
+
+    Args:
+        frame (pandas.DataFrame): Output of aggregates_to_frame
+        window (int): Number of bars in the rolling average
+        zscore_threshold (float): Absolute volume z-score at which a bar is an anomaly
+
+    Returns:
+        dict: Scalar statistics plus a columnar 'series' block (one list per column)
+    """
+    if frame.empty:
+        return {'count': 0, 'close': None, 'volume': None, 'series': {}, 'volume_anomalies': []}
+
+    close = frame['close']
+    volume = frame['volume']
+    close_zscore = _zscores(close.to_numpy())
+    volume_zscore = _zscores(volume.to_numpy())
+    rolling_close = close.rolling(window, min_periods=1).mean()
+    rolling_volume = volume.rolling(window, min_periods=1).mean()
+    dates = frame.index.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    anomalies = np.flatnonzero(np.abs(volume_zscore) >= zscore_threshold)
+
+    return {
+        'count': len(frame),
+        'close': {
+            'mean': float(close.mean()),
+            'median': float(close.median()),
+            'std': float(close.std(ddof=0)),
+            'min': float(close.min()),
+            'max': float(close.max()),
+            'last': float(close.iloc[-1]),
+        },
+        'volume': {
+            'mean': float(volume.mean()),
+            'median': float(volume.median()),
+            'std': float(volume.std(ddof=0)),
+        },
+        'series': {
+            'timestamp': dates.tolist(),
+            'close': close.tolist(),
+            'close_zscore': close_zscore.tolist(),
+            'rolling_close': rolling_close.tolist(),
+            'volume': volume.tolist(),
+            'volume_zscore': volume_zscore.tolist(),
+            'rolling_volume': rolling_volume.tolist(),
+        },
+        'volume_anomalies': [
+            {'timestamp': dates[i], 'volume': float(volume.iloc[i]), 'zscore': float(volume_zscore[i])}
+            for i in anomalies
+        ],
+    }
+
+
+# Chart intervals accepted by resample_prices and their pandas offsets
+RESAMPLE_INTERVALS = {
+    '1m': '1min',
+    '5m': '5min',
+    '15m': '15min',
+    '1h': '1h',
+    '1d': '1D',
+}
+
+
+def prices_to_frame(rows):
+    """
+    Convert (timestamp, price, volume) rows, e.g. from PriceUpdate values_list(),
+    into a DataFrame indexed by timestamp (UTC).
+
+    Args:
+        rows (iterable): (datetime, Decimal, int or None) tuples in timestamp order
+
+    Returns:
+        pandas.DataFrame: price/volume float columns, missing volumes as NaN
+    """
+    frame = pd.DataFrame.from_records(list(rows), columns=['timestamp', 'price', 'volume'])
+    frame.index = pd.to_datetime(frame.pop('timestamp'), utc=True)
+    return frame.astype(float)
+
+
+def resample_prices(frame, interval):
+    """
+    Bucket price ticks into OHLCV bars in one vectorized pass. Buckets without
+    ticks are left out rather than filled.
+
+    Args:
+        frame (pandas.DataFrame): Output of prices_to_frame
+        interval (str): One of RESAMPLE_INTERVALS
+
+    Returns:
+        pandas.DataFrame: open/high/low/close/volume/count columns indexed by bucket start
+    """
+    resampler = frame.resample(RESAMPLE_INTERVALS[interval], label='left', closed='left')
+    bars = resampler['price'].ohlc()
+    bars['volume'] = resampler['volume'].sum()
+    bars['count'] = resampler['price'].count()
+    return bars[bars['count'] > 0]
+
+
+def lttb_indices(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets: pick `points` samples that keep the visual
+    shape of a line chart. The first and last samples are always kept; in between
+    every bucket contributes the sample forming the largest triangle with the
+    previously picked sample and the average of the next bucket.
+
+    Args:
+        x (numpy.ndarray): Ascending x values (e.g. epoch timestamps)
+        y (numpy.ndarray): y values
+        points (int): Number of samples to keep, at least 3
+
+    Returns:
+        numpy.ndarray: Indices of the kept samples, ascending
+    """
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 inner samples, then the last sample as the final "next bucket"
+    edges = np.append(np.arange(points - 1) * (n - 2) // (points - 2) + 1, n)
+    selected = np.empty(points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[end:edges[i + 2]].mean()
+        next_y = y[end:edges[i + 2]].mean()
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def frame_to_series(frame):
+    """
+    Columnar, JSON-ready view of a time-indexed frame: one list per column plus
+    ISO 8601 'timestamp' strings, with missing values as None.
+
+    Returns:
+        dict: column name -> list
+    """
+    series = {'timestamp': frame.index.strftime('%Y-%m-%dT%H:%M:%SZ').tolist()}
+    for column in frame.columns:
+        values = frame[column]
+        series[column] = values.astype(object).where(values.notna(), None).tolist()
+    return series
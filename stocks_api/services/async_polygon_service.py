@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from stocks_api.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from stocks_api.services.polygon_service import PolygonService
+from stocks_api.services.rate_limiter import INTERACTIVE, RateLimitExceeded, TokenBucketRateLimiter
+from stocks_api.services.single_flight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPolygonService:
+    """
+    asyncio counterpart of PolygonService for async views served over ASGI (uvicorn).
+
+    Requests go through the same pipeline as PolygonService (circuit breaker, rate
+    limiter, retries with backoff, response cache) and share its cache keys, quota and
+    breaker state. Each event loop gets one pooled httpx.AsyncClient, and at most
+    settings.POLYGON_ASYNC_CONCURRENCY requests are in flight per loop, so a single
+    process can wait on hundreds of Polygon responses without holding a worker each.
+    """
+    BASE_URL = "https://api.polygon.io"
+    API_KEY = settings.POLYGON_API_KEY
+    RETRY_STATUSES = PolygonService.RETRY_STATUSES
+
+    # Event loop -> (httpx.AsyncClient, asyncio.Semaphore); clients are bound to the loop that created them
+    _clients = weakref.WeakKeyDictionary()
+    _single_flight = AsyncSingleFlight()
+
+    def __init__(self, priority=INTERACTIVE):
+        """
+        Args:
+            priority (str): Rate limiter priority class of this service's requests
+        """
+        http = settings.POLYGON_HTTP
+        self.priority = priority
+        self.rate_limiter = TokenBucketRateLimiter.from_settings()
+        self.circuit_breaker = CircuitBreaker(
+            'polygon',
+            failure_threshold=http['BREAKER_FAILURE_THRESHOLD'],
+            reset_timeout=http['BREAKER_RESET_TIMEOUT'],
+        )
+
+    @staticmethod
+    def _describe_error(e):
+        """
+        Describe a request error for the log without its URL: httpx puts the full
+        request URL, apiKey parameter included, into its exception messages.
+        """
+        if isinstance(e, httpx.HTTPStatusError):
+            return f"HTTP {e.response.status_code}"
+        if isinstance(e, httpx.HTTPError):
+            return type(e).__name__
+        return repr(e)
+
+    @classmethod
+    def _client(cls):
+        loop = asyncio.get_running_loop()
+        if loop not in cls._clients:
+            http = settings.POLYGON_HTTP
+            concurrency = settings.POLYGON_ASYNC_CONCURRENCY
+            client = httpx.AsyncClient(
+                params={'apiKey': cls.API_KEY},
+                limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=http['POOL_SIZE']),
+                timeout=httpx.Timeout(15, connect=http['CONNECT_TIMEOUT']),
+            )
+            cls._clients[loop] = (client, asyncio.Semaphore(concurrency))
+        return cls._clients[loop]
+
+    @classmethod
+    async def aclose(cls):
+        """Close the current event loop's client, e.g. on ASGI lifespan shutdown."""
+        entry = cls._clients.pop(asyncio.get_running_loop(), None)
+        if entry:
+            await entry[0].aclose()
+
+    async def _get(self, endpoint, params=None, timeout=15):
+        """
+        Async PolygonService._get(): circuit breaker, rate limiter token, then the
+        pooled client, retrying connection errors, timeouts and RETRY_STATUSES with
+        jittered exponential backoff while honoring Retry-After.
+
+        Raises:
+            httpx.TransportError: Once retries are exhausted
+            CircuitOpenError, RateLimitExceeded: Without sending the request
+        """
+        http = settings.POLYGON_HTTP
+        attempts = http['MAX_RETRIES'] + 1
+        client, semaphore = self._client()
+
+        for attempt in range(attempts):
+            await sync_to_async(self.circuit_breaker.allow_request, thread_sensitive=False)()
+            await self.rate_limiter.aacquire(self.priority)
+            try:
+                async with semaphore:
+                    response = await client.get(endpoint, params=params, timeout=httpx.Timeout(timeout, connect=http['CONNECT_TIMEOUT']))
+            except httpx.TransportError as e:
+                await sync_to_async(self.circuit_breaker.record_failure, thread_sensitive=False)()
+                if attempt == attempts - 1:
+                    raise
+                delay = PolygonService._backoff_delay(attempt)
+                logger.warning(f"Polygon request failed ({self._describe_error(e)}), retry {attempt + 1}/{attempts - 1} in {delay:.2f}s")
+            else:
+                if response.status_code >= 500:
+                    await sync_to_async(self.circuit_breaker.record_failure, thread_sensitive=False)()
+                else:
+                    await sync_to_async(self.circuit_breaker.record_success, thread_sensitive=False)()
+                if response.status_code not in self.RETRY_STATUSES or attempt == attempts - 1:
+                    return response
+
+                delay = PolygonService._retry_after(response)
+                if delay is None:
+                    delay = PolygonService._backoff_delay(attempt)
+                elif delay > http['BACKOFF_MAX']:
+                    logger.warning(f"Polygon asked to retry after {delay:.0f}s, giving up")
+                    return response
+                logger.warning(f"Polygon returned {response.status_code}, retry {attempt + 1}/{attempts - 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _request_json(self, endpoint, params=None, timeout=15):
+        """Async PolygonService._request_json(); a 404 becomes a NOT_FOUND payload."""
+        response = await self._get(endpoint, params=params, timeout=timeout)
+        if response.status_code == 404:
+            return {'status': 'NOT_FOUND'}
+        response.raise_for_status()
+        return response.json()
+
+    async def _cached_request_json(self, endpoint, params=None, to_date=None):
+        """
+        Async PolygonService._cached_request_json(), sharing its cache entries.
+        Concurrent misses for the same key on this event loop share one request.
+        """
+        cache_key = PolygonService._cache_key(endpoint, params)
+        payload = await cache.aget(cache_key)
+        if payload is not None:
+            await sync_to_async(PolygonService._count_cache, thread_sensitive=False)('hits')
+            return payload
+
+        await sync_to_async(PolygonService._count_cache, thread_sensitive=False)('misses')
+        payload, shared = await self._single_flight.do(cache_key, lambda: self._fetch_and_cache(cache_key, endpoint, params, to_date))
+        if shared:
+            logger.debug(f"Shared an in-flight Polygon request for {endpoint}")
+        return payload
+
+    async def _fetch_and_cache(self, cache_key, endpoint, params, to_date):
+        payload = await self._request_json(endpoint, params)
+        await cache.aset(cache_key, payload, PolygonService._cache_ttl(payload, to_date))
+        return payload
+
+    async def get_aggregates(self, ticker, multiplier, timespan, from_date, to_date):
+        """
+        Get aggregated price data for a stock over a specified time range.
+
+        Args:
+            ticker (str): The stock ticker symbol
+            multiplier (int): The size of the timespan multiplier
+            timespan (str): The timespan unit (minute, hour, day, week, month, quarter, year)
+            from_date (str): The start date in YYYY-MM-DD format
+            to_date (str): The end date in YYYY-MM-DD format
+
+        Returns:
+            list: The aggregated price data or empty list if the request failed
+        """
+        endpoint = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}"
+
+        try:
+            data = await self._cached_request_json(endpoint, to_date=to_date)
+        except (httpx.HTTPError, CircuitOpenError, RateLimitExceeded, ValueError) as e:
+            logger.error(f"Error fetching aggregate data for {ticker} from {from_date} to {to_date}: {self._describe_error(e)}")
+            return []
+
+        if data.get('status') == 'OK' and data.get('results'):
+            return data['results']
+        logger.warning(f"No aggregate data found for {ticker} from {from_date} to {to_date}")
+        return []
+
+    async def get_daily_aggregates(self, ticker_symbol, date_from, date_to):
+        """
+        Get daily bars for a stock, ascending by date.
+
+        Args:
+            ticker_symbol (str): The stock ticker symbol
+            date_from (str): The start date in YYYY-MM-DD format
+            date_to (str): The end date in YYYY-MM-DD format
+
+        Returns:
+            list: Polygon aggregates, [] if there are none, or None if the request failed
+        """
+        url = f"{self.BASE_URL}/v2/aggs/ticker/{ticker_symbol}/range/1/day/{date_from}/{date_to}"
+
+        try:
+            data = await self._cached_request_json(url, params={'sort': 'asc'}, to_date=date_to)
+        except (httpx.HTTPError, CircuitOpenError, RateLimitExceeded, ValueError) as e:
+            logger.error(f"Error fetching daily aggregates for {ticker_symbol} from {date_from} to {date_to}: {self._describe_error(e)}")
+            return None
+
+        if data.get('status') == 'OK' and 'results' in data:
+            return data['results']
+        if data.get('resultsCount') == 0:
+            return []
+        logger.warning(f"AsyncPolygonService: Unexpected response structure or status for {ticker_symbol}. Response: {data}")
+        return None
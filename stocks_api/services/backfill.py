@@ -0,0 +1,170 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from stocks_api.models import BackfillChunk, PriceUpdate, StockSymbol
+from stocks_api.services.polygon_service import PolygonService
+from stocks_api.services.rate_limiter import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Days per download, sized so a chunk fits in one Polygon response (50,000 bars)
+# even with extended-hours minute bars (~960 a day)
+CHUNK_DAYS = {
+    'minute': 30,
+    'hour': 1825,
+    'day': 3650,
+}
+
+
+def chunk_ranges(date_from, date_to, timespan):
+    """
+    Split a date range into CHUNK_DAYS-sized (date_from, date_to) ranges. Chunks are
+    aligned to a fixed grid rather than to date_from, so overlapping backfills
+    share checkpoints for the chunks they have in common.
+    """
+    days = CHUNK_DAYS[timespan]
+    ranges = []
+    start = date_from
+    while start <= date_to:
+        grid_end = date.fromordinal((start.toordinal() // days + 1) * days - 1)
+        end = min(grid_end, date_to)
+        ranges.append((start, end))
+        start = end + timedelta(days=1)
+    return ranges
+
+
+class PriceBackfill:
+    """
+    Seeds PriceUpdate history from Polygon's aggregates endpoint, one bar per
+    PriceUpdate (close price, bar start time).
+
+    A (symbols x date range) request is split into BackfillChunk checkpoints.
+    Chunks are downloaded in parallel on a thread pool (HTTP only, throttled by the
+    shared rate limiter at BACKGROUND priority) while the calling thread stores each
+    finished chunk and marks it done in one transaction. Re-running a backfill
+    skips finished chunks, and rows are upserted on (symbol, timestamp), so a
+    crashed or repeated run never duplicates history.
+    """
+
+    def __init__(self, polygon_service=None, concurrency=None):
+        """
+        Args:
+            polygon_service (PolygonService): Defaults to a BACKGROUND priority service
+            concurrency (int): Chunks downloaded at once (default: settings.POLYGON_BACKFILL_CONCURRENCY)
+        """
+        self.polygon_service = polygon_service or PolygonService(priority=BACKGROUND)
+        self.concurrency = concurrency or settings.POLYGON_BACKFILL_CONCURRENCY
+
+    def plan(self, tickers, date_from, date_to, timespan='minute'):
+        """
+        Create the checkpoints of a backfill (existing ones are kept).
+        Ranges are cut off at yesterday: today's bars are still forming and come
+        from live ingestion.
+
+        Returns:
+            list: Unfinished BackfillChunk objects of the request, oldest first
+        """
+        if timespan not in CHUNK_DAYS:
+            raise ValueError(f"timespan must be one of {', '.join(CHUNK_DAYS)}")
+        date_to = min(date_to, date.today() - timedelta(days=1))
+        symbols = list(StockSymbol.objects.filter(ticker__in=tickers).values_list('ticker', flat=True))
+        for ticker in set(tickers) - set(symbols):
+            logger.warning(f"StockSymbol {ticker} not found. Cannot backfill.")
+
+        ranges = chunk_ranges(date_from, date_to, timespan)
+        BackfillChunk.objects.bulk_create(
+            [
+                BackfillChunk(symbol_id=ticker, timespan=timespan, date_from=chunk_from, date_to=chunk_to)
+                for ticker in symbols
+                for chunk_from, chunk_to in ranges
+            ],
+            ignore_conflicts=True,
+        )
+        return list(
+            BackfillChunk.objects.filter(
+                symbol_id__in=symbols, timespan=timespan, date_from__gte=date_from, date_to__lte=date_to,
+            ).exclude(status=BackfillChunk.DONE).order_by('date_from', 'symbol_id')
+        )
+
+    def run(self, tickers, date_from, date_to, timespan='minute'):
+        """
+        Backfill price history for the given tickers and dates (inclusive).
+
+        Returns:
+            dict: Counts of planned, done and failed chunks and written rows
+        """
+        chunks = self.plan(tickers, date_from, date_to, timespan)
+        stats = {'chunks': len(chunks), 'done': 0, 'failed': 0, 'rows': 0}
+        if not chunks:
+            return stats
+        logger.info(f"Backfilling {len(chunks)} chunks of {timespan} bars with concurrency {self.concurrency}")
+
+        pending = iter(chunks)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='polygon-backfill') as executor:
+            # Keep a bounded number of downloads in flight so finished chunks never pile up in memory
+            in_flight = {}
+            for chunk in pending:
+                in_flight[executor.submit(self._download, chunk)] = chunk
+                if len(in_flight) >= self.concurrency * 2:
+                    break
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = in_flight.pop(future)
+                    try:
+                        bars = future.result()
+                    except Exception as e:
+                        logger.error(f"Error downloading {chunk}: {e}")
+                        bars = None
+                    if bars is None:
+                        self._mark_failed(chunk, "Download failed")
+                        stats['failed'] += 1
+                    else:
+                        stats['rows'] += self._store(chunk, bars)
+                        stats['done'] += 1
+                    next_chunk = next(pending, None)
+                    if next_chunk is not None:
+                        in_flight[executor.submit(self._download, next_chunk)] = next_chunk
+
+        logger.info(f"Backfill finished: {stats}")
+        return stats
+
+    def _download(self, chunk):
+        # Runs on the pool: HTTP only, no ORM access
+        return self.polygon_service.get_aggregate_bars(
+            chunk.symbol_id, 1, chunk.timespan, chunk.date_from.isoformat(), chunk.date_to.isoformat()
+        )
+
+    def _store(self, chunk, bars):
+        """
+        Upsert the chunk's bars and mark it done, atomically.
+
+        Returns:
+            int: Number of PriceUpdate rows written
+        """
+        updates = [
+            PriceUpdate(
+                symbol_id=chunk.symbol_id,
+                timestamp=datetime.fromtimestamp(bar['t'] / 1000, tz=dt_timezone.utc),
+                price=Decimal(str(bar['c'])),
+                volume=int(bar['v']) if bar.get('v') is not None else None,
+            )
+            for bar in bars
+        ]
+        with transaction.atomic():
+            rows = PriceUpdate.upsert(updates)
+            BackfillChunk.objects.filter(pk=chunk.pk).update(
+                status=BackfillChunk.DONE, rows=rows, attempts=F('attempts') + 1, error='',
+            )
+        return rows
+
+    def _mark_failed(self, chunk, error):
+        BackfillChunk.objects.filter(pk=chunk.pk).update(
+            status=BackfillChunk.FAILED, attempts=F('attempts') + 1, error=error,
+        )
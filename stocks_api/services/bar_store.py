@@ -0,0 +1,150 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from stocks_api.models import DailyBar, DailyBarCoverage
+from stocks_api.services.polygon_service import PolygonService
+
+logger = logging.getLogger(__name__)
+
+# Polygon stamps daily bars with midnight in the exchange's timezone
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+
+
+class DailyBarStore:
+    """
+    Read-through store for daily OHLCV bars. Requests are served from the DailyBar
+    table and only the sub-ranges that have never been downloaded are fetched from
+    Polygon and upserted.
+    """
+
+    def __init__(self, polygon_service=None):
+        self.polygon_service = polygon_service or PolygonService()
+
+    def get_bars(self, ticker, date_from, date_to):
+        """
+        Get daily bars for a ticker, downloading missing ranges first.
+
+        Args:
+            ticker (str): The stock ticker symbol
+            date_from (date): First day of the range
+            date_to (date): Last day of the range (inclusive)
+
+        Returns:
+            list: Polygon-shaped aggregate dicts ({'o', 'h', 'l', 'c', 'v', 'vw', 'n', 't'})
+                  in date order, or None if a missing range could not be downloaded
+        """
+        for gap_from, gap_to in self.missing_ranges(ticker, date_from, date_to):
+            logger.info(f"Downloading daily bars for {ticker} from {gap_from} to {gap_to}")
+            aggregates = self.polygon_service.get_daily_aggregates(ticker, gap_from.isoformat(), gap_to.isoformat())
+            if aggregates is None:
+                return None
+            self._store(ticker, gap_from, gap_to, aggregates)
+
+        return self._read_bars(ticker, date_from, date_to)
+
+    async def aget_bars(self, ticker, date_from, date_to):
+        """
+        get_bars() for async views, with an AsyncPolygonService as polygon_service.
+        Downloads are awaited; database work runs in Django's sync thread.
+        """
+        gaps = await sync_to_async(self.missing_ranges)(ticker, date_from, date_to)
+        for gap_from, gap_to in gaps:
+            logger.info(f"Downloading daily bars for {ticker} from {gap_from} to {gap_to}")
+            aggregates = await self.polygon_service.get_daily_aggregates(ticker, gap_from.isoformat(), gap_to.isoformat())
+            if aggregates is None:
+                return None
+            await sync_to_async(self._store)(ticker, gap_from, gap_to, aggregates)
+
+        return await sync_to_async(self._read_bars)(ticker, date_from, date_to)
+
+    def _read_bars(self, ticker, date_from, date_to):
+        bars = DailyBar.objects.filter(ticker=ticker, date__range=(date_from, date_to)).order_by('date')
+        return [self._to_aggregate(bar) for bar in bars]
+
+    def missing_ranges(self, ticker, date_from, date_to):
+        """
+        Return the (date_from, date_to) sub-ranges of the request not covered by a
+        previous download, in date order.
+        """
+        coverage = DailyBarCoverage.objects.filter(
+            ticker=ticker, date_from__lte=date_to, date_to__gte=date_from
+        ).order_by('date_from').values_list('date_from', 'date_to')
+
+        gaps = []
+        cursor = date_from
+        for covered_from, covered_to in coverage:
+            if covered_from > cursor:
+                gaps.append((cursor, covered_from - timedelta(days=1)))
+            cursor = max(cursor, covered_to + timedelta(days=1))
+            if cursor > date_to:
+                break
+        if cursor <= date_to:
+            gaps.append((cursor, date_to))
+        return gaps
+
+    def _store(self, ticker, date_from, date_to, aggregates):
+        bars = [
+            DailyBar(
+                ticker=ticker,
+                date=datetime.fromtimestamp(agg['t'] / 1000, tz=MARKET_TIMEZONE).date(),
+                open=agg['o'],
+                high=agg['h'],
+                low=agg['l'],
+                close=agg['c'],
+                volume=agg.get('v', 0),
+                vwap=agg.get('vw'),
+                transactions=agg.get('n'),
+            )
+            for agg in aggregates
+        ]
+        # Today's bar is still forming, so only the closed part of the range counts as downloaded
+        covered_to = min(date_to, date.today() - timedelta(days=1))
+        if not bars and not DailyBar.objects.filter(ticker=ticker).exists():
+            # Nothing is known about the ticker, so the empty answer may be a typo or a
+            # listing Polygon doesn't have yet rather than a stretch without trading days.
+            # It is not recorded; repeats are absorbed by the response cache's EMPTY TTL.
+            logger.info(f"No daily bars for {ticker} from {date_from} to {date_to}, not recording coverage")
+            return
+
+        with transaction.atomic():
+            DailyBar.objects.bulk_create(
+                bars,
+                update_conflicts=True,
+                unique_fields=['ticker', 'date'],
+                update_fields=['open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions'],
+            )
+            if covered_to >= date_from:
+                self._add_coverage(ticker, date_from, covered_to)
+
+    def _add_coverage(self, ticker, date_from, date_to):
+        """Record a downloaded range, merging it with adjacent or overlapping ones."""
+        overlapping = DailyBarCoverage.objects.filter(
+            ticker=ticker,
+            date_from__lte=date_to + timedelta(days=1),
+            date_to__gte=date_from - timedelta(days=1),
+        )
+        for covered in overlapping:
+            date_from = min(date_from, covered.date_from)
+            date_to = max(date_to, covered.date_to)
+        overlapping.delete()
+        DailyBarCoverage.objects.create(ticker=ticker, date_from=date_from, date_to=date_to)
+
+    @staticmethod
+    def _to_aggregate(bar):
+        aggregate = {
+            'o': bar.open,
+            'h': bar.high,
+            'l': bar.low,
+            'c': bar.close,
+            'v': bar.volume,
+            't': int(datetime.combine(bar.date, time(), tzinfo=MARKET_TIMEZONE).timestamp() * 1000),
+        }
+        if bar.vwap is not None:
+            aggregate['vw'] = bar.vwap
+        if bar.transactions is not None:
+            aggregate['n'] = bar.transactions
+        return aggregate
@@ -0,0 +1,76 @@
+import logging
+import time
+
+import requests
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    The circuit is open and the request was not sent. Subclasses RequestException
+    so callers treat it like any other failed request.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream service is down instead of letting every worker
+    wait for its own timeout.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests
+    are rejected for `reset_timeout` seconds. After that one trial request is let
+    through (half-open): success closes the circuit, failure opens it again.
+    State lives in a Django cache so every process sharing the cache trips together.
+    A failure_threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, cache_alias='default'):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = caches[cache_alias]
+        self.key_prefix = f"circuit:{name}"
+
+    def allow_request(self):
+        """
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a trial request already in flight
+        """
+        if not self.failure_threshold:
+            return
+        open_until = self.cache.get(f"{self.key_prefix}:open_until")
+        if open_until is None:
+            return
+        if time.time() < open_until:
+            raise CircuitOpenError(f"Circuit {self.name} is open, failing fast")
+        # Half-open: only one caller gets to probe the service
+        if not self.cache.add(f"{self.key_prefix}:trial", True, timeout=self.reset_timeout):
+            raise CircuitOpenError(f"Circuit {self.name} is half-open, trial request in flight")
+
+    def record_success(self):
+        if not self.failure_threshold:
+            return
+        if self.cache.get(f"{self.key_prefix}:open_until") is not None:
+            logger.info(f"Circuit {self.name} closed")
+        self.cache.delete_many([
+            f"{self.key_prefix}:failures", f"{self.key_prefix}:open_until", f"{self.key_prefix}:trial",
+        ])
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        failures_key = f"{self.key_prefix}:failures"
+        self.cache.add(failures_key, 0, timeout=None)
+        try:
+            failures = self.cache.incr(failures_key)
+        except ValueError: # Evicted between add() and incr()
+            failures = 1
+            self.cache.set(failures_key, failures, timeout=None)
+
+        half_open = self.cache.get(f"{self.key_prefix}:trial") is not None
+        if failures >= self.failure_threshold or half_open:
+            logger.warning(f"Circuit {self.name} opened after {failures} consecutive failures")
+            self.cache.set(f"{self.key_prefix}:open_until", time.time() + self.reset_timeout, timeout=None)
+            self.cache.delete(f"{self.key_prefix}:trial")
@@ -0,0 +1,320 @@
+import logging
+import math
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from stocks_api.models import DetectorConfig, SignificantEvent
+from stocks_api.services.bar_store import MARKET_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+SIGNIFICANT_CHANGE_PERCENTAGE_THRESHOLD = Decimal('2.0') # e.g., 2% change
+
+# A tick to analyze. `previous` is the last known {'price', 'timestamp'} for the symbol
+# (the entry it replaced in the last price store), or None for the first tick.
+Tick = namedtuple('Tick', ['symbol', 'price', 'timestamp', 'volume', 'previous'])
+
+
+class Detector:
+    """
+    A streaming signal over the ticks of one symbol.
+
+    Detectors keep whatever they need about the past in a small per-symbol state
+    (a few numbers updated in O(1) per tick, never a window of ticks) and return
+    at most one event per tick. Parameters come from `defaults`, overridden by
+    settings.SIGNAL_DETECTORS and then by the symbol's DetectorConfig row.
+    """
+    name = None
+    event_types = []
+    defaults = {}
+
+    def initial_state(self):
+        return None
+
+    def update(self, state, tick, params):
+        """
+        Args:
+            state: This detector's state for the symbol (initial_state() on the first tick)
+            tick (Tick): The new tick
+            params (dict): Effective parameters, including 'threshold'
+
+        Returns:
+            tuple: (new state, (event_type, details) or None)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _ew_update(count, mean, variance, value, alpha):
+        """One step of an exponentially weighted mean and variance."""
+        if not count:
+            return 1, value, 0.0
+        diff = value - mean
+        increment = alpha * diff
+        return count + 1, mean + increment, (1 - alpha) * (variance + diff * increment)
+
+
+class ThresholdDetector(Detector):
+    """Percentage change against the previous price (the original 2% rule)."""
+    name = 'threshold'
+    event_types = ['PRICE_INCREASE', 'PRICE_DECREASE']
+    defaults = {'threshold': float(SIGNIFICANT_CHANGE_PERCENTAGE_THRESHOLD)}
+
+    def update(self, state, tick, params):
+        previous = tick.previous
+        if not previous:
+            return state, None
+
+        previous_price = Decimal(str(previous['price']))
+        current_price = Decimal(str(tick.price))
+        if previous_price == Decimal('0') or previous_price == Decimal('0.00000001'):
+            percentage_change = Decimal('0')
+        else:
+            percentage_change = ((current_price - previous_price) / previous_price) * Decimal('100')
+
+        logger.info(
+            f"Symbol: {tick.symbol.ticker}, Prev Price: {previous_price}, Curr Price: {current_price}, %Change: {percentage_change:.2f}%"
+        )
+
+        if abs(percentage_change) < Decimal(str(params['threshold'])):
+            return state, None
+
+        event_type = 'PRICE_INCREASE' if percentage_change > 0 else 'PRICE_DECREASE'
+        return state, (event_type, {
+            'previous_price': str(previous_price),
+            'current_price': str(current_price),
+            'percentage_change': f"{percentage_change:.2f}",
+            'previous_timestamp': previous['timestamp'].isoformat() if previous.get('timestamp') else None,
+            'current_timestamp': tick.timestamp.isoformat(),
+        })
+
+
+class ZScoreDetector(Detector):
+    """Price that many standard deviations away from its exponentially weighted mean."""
+    name = 'zscore'
+    event_types = ['PRICE_ANOMALY']
+    defaults = {'threshold': 4.0, 'alpha': 0.05, 'min_samples': 30}
+
+    def initial_state(self):
+        return (0, 0.0, 0.0) # count, mean, variance
+
+    def update(self, state, tick, params):
+        count, mean, variance = state
+        price = float(tick.price)
+        event = None
+        if count >= params['min_samples'] and variance > 0:
+            zscore = (price - mean) / math.sqrt(variance)
+            if abs(zscore) >= params['threshold']:
+                event = ('PRICE_ANOMALY', {
+                    'detector': self.name,
+                    'current_price': str(tick.price),
+                    'mean': round(mean, 4),
+                    'std': round(math.sqrt(variance), 4),
+                    'zscore': f"{zscore:.2f}",
+                    'current_timestamp': tick.timestamp.isoformat(),
+                })
+        return self._ew_update(count, mean, variance, price, params['alpha']), event
+
+
+class VolatilityBreakoutDetector(Detector):
+    """Log return larger than `threshold` times the EWMA (RiskMetrics) volatility."""
+    name = 'ewma_volatility'
+    event_types = ['VOLATILITY_BREAKOUT']
+    defaults = {'threshold': 4.0, 'decay': 0.94, 'min_samples': 30}
+
+    def initial_state(self):
+        return (0, 0.0) # count, variance of returns
+
+    def update(self, state, tick, params):
+        count, variance = state
+        previous = tick.previous
+        if not previous or float(previous['price']) <= 0 or float(tick.price) <= 0:
+            return state, None
+
+        log_return = math.log(float(tick.price) / float(previous['price']))
+        event = None
+        if count >= params['min_samples'] and variance > 0:
+            volatility = math.sqrt(variance)
+            if abs(log_return) >= params['threshold'] * volatility:
+                event = ('VOLATILITY_BREAKOUT', {
+                    'detector': self.name,
+                    'previous_price': str(previous['price']),
+                    'current_price': str(tick.price),
+                    'log_return': f"{log_return:.6f}",
+                    'volatility': f"{volatility:.6f}",
+                    'current_timestamp': tick.timestamp.isoformat(),
+                })
+        decay = params['decay']
+        variance = log_return ** 2 if not count else decay * variance + (1 - decay) * log_return ** 2
+        return (count + 1, variance), event
+
+
+class VolumeSpikeDetector(Detector):
+    """Volume at least `threshold` times its exponentially weighted average."""
+    name = 'volume_spike'
+    event_types = ['VOLUME_SPIKE']
+    defaults = {'threshold': 5.0, 'alpha': 0.05, 'min_samples': 20}
+
+    def initial_state(self):
+        return (0, 0.0) # count, mean volume
+
+    def update(self, state, tick, params):
+        if tick.volume is None:
+            return state, None
+        count, mean = state
+        volume = float(tick.volume)
+        event = None
+        if count >= params['min_samples'] and mean > 0 and volume >= params['threshold'] * mean:
+            event = ('VOLUME_SPIKE', {
+                'detector': self.name,
+                'volume': tick.volume,
+                'average_volume': round(mean, 2),
+                'ratio': f"{volume / mean:.2f}",
+                'current_timestamp': tick.timestamp.isoformat(),
+            })
+        mean = volume if not count else mean + params['alpha'] * (volume - mean)
+        return (count + 1, mean), event
+
+
+class GapOpenDetector(Detector):
+    """
+    First tick of a trading day (exchange time) opening `threshold` percent away
+    from the previous day's last price, after at least `min_idle_seconds` without ticks.
+    """
+    name = 'gap_open'
+    event_types = ['GAP_UP', 'GAP_DOWN']
+    defaults = {'threshold': 2.0, 'min_idle_seconds': 3600}
+
+    def update(self, state, tick, params):
+        previous = tick.previous
+        if not previous or not previous.get('timestamp') or not previous['price']:
+            return state, None
+        if timezone.localtime(tick.timestamp, MARKET_TIMEZONE).date() <= timezone.localtime(previous['timestamp'], MARKET_TIMEZONE).date():
+            return state, None
+        if (tick.timestamp - previous['timestamp']).total_seconds() < params['min_idle_seconds']:
+            return state, None
+
+        gap = (float(tick.price) - float(previous['price'])) / float(previous['price']) * 100
+        if abs(gap) < params['threshold']:
+            return state, None
+        return state, ('GAP_UP' if gap > 0 else 'GAP_DOWN', {
+            'detector': self.name,
+            'previous_close': str(previous['price']),
+            'open': str(tick.price),
+            'gap_percent': f"{gap:.2f}",
+            'previous_timestamp': previous['timestamp'].isoformat(),
+            'current_timestamp': tick.timestamp.isoformat(),
+        })
+
+
+DETECTORS = [ThresholdDetector(), ZScoreDetector(), VolatilityBreakoutDetector(), VolumeSpikeDetector(), GapOpenDetector()]
+
+
+class DetectorEngine:
+    """
+    Runs every enabled detector over batches of ticks.
+
+    Per-symbol detector state is read from and written back to the Django cache
+    once per batch (one get_many and one set_many), so with a shared cache every
+    worker continues the same state. Ingestion is serialized (the polling task
+    holds a lock, the stream worker analyzes one batch at a time), so states are
+    not updated concurrently.
+    """
+    STATE_KEY_PREFIX = 'detector_state'
+
+    def __init__(self, detectors=None):
+        self.detectors = DETECTORS if detectors is None else detectors
+
+    def _state_key(self, ticker):
+        return f"{self.STATE_KEY_PREFIX}:{ticker}"
+
+    def _params(self, tickers):
+        """
+        Effective {ticker: {detector name: params or None if disabled}}, resolving
+        defaults, settings.SIGNAL_DETECTORS and DetectorConfig rows (one query).
+        """
+        configured = {}
+        for config in DetectorConfig.objects.filter(symbol_id__in=tickers):
+            configured[(config.symbol_id, config.detector)] = config
+
+        base = {}
+        for detector in self.detectors:
+            overrides = {key.lower(): value for key, value in settings.SIGNAL_DETECTORS.get(detector.name, {}).items()}
+            base[detector.name] = {**detector.defaults, 'enabled': True, **overrides}
+
+        params = {}
+        for ticker in tickers:
+            params[ticker] = {}
+            for detector in self.detectors:
+                resolved = base[detector.name]
+                config = configured.get((ticker, detector.name))
+                if config:
+                    resolved = {**resolved, **config.params, 'enabled': config.enabled}
+                    if config.threshold is not None:
+                        resolved['threshold'] = config.threshold
+                params[ticker][detector.name] = resolved if resolved['enabled'] else None
+        return params
+
+    def detect(self, ticks):
+        """
+        Run the detectors over ticks in timestamp order and save their new state.
+
+        Args:
+            ticks (list): Tick tuples; stale ticks should already be filtered out
+
+        Returns:
+            list: Unsaved SignificantEvent objects
+        """
+        events, states = self.run(ticks)
+        self.save_states(states)
+        return events
+
+    def run(self, ticks):
+        """
+        detect() without saving the state, for callers that save it with save_states()
+        only once the ticks are stored, so a batch that fails to store and is retried
+        is not counted twice.
+
+        Returns:
+            tuple: (unsaved SignificantEvent objects, {ticker: detector states})
+        """
+        if not ticks:
+            return [], {}
+        tickers = sorted({tick.symbol.ticker for tick in ticks})
+        params = self._params(tickers)
+        stored = cache.get_many([self._state_key(ticker) for ticker in tickers])
+        states = {ticker: dict(stored.get(self._state_key(ticker), {})) for ticker in tickers}
+
+        events = []
+        for tick in ticks:
+            ticker = tick.symbol.ticker
+            symbol_states = states[ticker]
+            for detector in self.detectors:
+                detector_params = params[ticker][detector.name]
+                if detector_params is None:
+                    continue
+                state = symbol_states.get(detector.name)
+                if state is None:
+                    state = detector.initial_state()
+                state, event = detector.update(state, tick, detector_params)
+                if state is not None:
+                    symbol_states[detector.name] = state
+                if event:
+                    event_type, details = event
+                    events.append(SignificantEvent(
+                        symbol=tick.symbol,
+                        event_type=event_type,
+                        timestamp=timezone.now(), # Event detection time
+                        details=details,
+                    ))
+
+        return events, states
+
+    def save_states(self, states):
+        """Write the states returned by run() back to the cache."""
+        states = {self._state_key(ticker): state for ticker, state in states.items() if state}
+        if states:
+            cache.set_many(states, timeout=None)
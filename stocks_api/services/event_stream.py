@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from stocks_api.models import SignificantEvent
+from stocks_api.serializers import SignificantEventSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_events_after(last_id, tickers=None, limit=None):
+    """
+    Significant events with an id above last_id, oldest first, serialized once.
+
+    Args:
+        last_id (int): Cursor; events with this id or lower are skipped
+        tickers (set): Only events for these tickers (None for all)
+        limit (int): Max events to return
+
+    Returns:
+        list: (id, ticker, JSON string) tuples
+    """
+    queryset = SignificantEvent.objects.filter(id__gt=last_id).select_related('symbol').order_by('id')
+    if tickers:
+        queryset = queryset.filter(symbol_id__in=tickers)
+    if limit:
+        queryset = queryset[:limit]
+    return [
+        (event.id, event.symbol_id, json.dumps(SignificantEventSerializer(event).data))
+        for event in queryset
+    ]
+
+
+def latest_event_id():
+    return SignificantEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+class Subscription:
+    """One streaming client: its ticker filter and the queue the broadcaster fills."""
+
+    def __init__(self, tickers, queue_size):
+        self.tickers = tickers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def wants(self, ticker):
+        return not self.tickers or ticker in self.tickers
+
+
+class EventBroadcaster:
+    """
+    Fans new significant events out to every streaming client on one event loop.
+
+    Events are created by Celery workers in other processes, so a single poller per
+    loop asks the database for rows past the last id it has seen (one indexed query
+    per POLL_INTERVAL however many clients are connected) and pushes each event,
+    serialized once, onto the queues of the subscriptions whose tickers match.
+    The poller runs only while there are subscribers.
+
+    A client whose queue fills up (it reads slower than events arrive) is dropped:
+    its queue is cleared and ends with None, and the client is expected to reconnect
+    with Last-Event-ID to replay what it missed from the database.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.last_id = None
+        self._task = None
+
+    def subscribe(self, tickers=None):
+        subscription = Subscription(set(tickers or ()), settings.EVENT_STREAM['QUEUE_SIZE'])
+        self.subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, events):
+        """Queue (id, ticker, JSON) events for every matching subscriber."""
+        for subscription in list(self.subscribers):
+            for event in events:
+                if not subscription.wants(event[1]):
+                    continue
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    logger.warning("Dropping a slow event stream client, it has to resume from its last event id")
+                    self._close(subscription)
+                    break
+
+    def _close(self, subscription):
+        """Unsubscribe and end the client's stream, discarding whatever it has not read."""
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    async def _poll(self):
+        interval = settings.EVENT_STREAM['POLL_INTERVAL']
+        try:
+            if self.last_id is None:
+                self.last_id = await sync_to_async(latest_event_id)()
+            while self.subscribers:
+                events = await sync_to_async(fetch_events_after)(self.last_id, limit=settings.EVENT_STREAM['BATCH_SIZE'])
+                if events:
+                    self.last_id = events[-1][0]
+                    self.publish(events)
+                    continue # More may be waiting, fetch again right away
+                await asyncio.sleep(interval)
+        except Exception as e:
+            logger.error(f"Event stream poller failed: {e}")
+            for subscription in list(self.subscribers):
+                self._close(subscription)
+        finally:
+            # Start from the newest event again next time instead of flushing a backlog to new clients
+            self.last_id = None
+
+
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_event_broadcaster():
+    """Return the broadcaster of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    if loop not in _broadcasters:
+        _broadcasters[loop] = EventBroadcaster()
+    return _broadcasters[loop]
+
+
+def format_sse(event_id, data, event='significant_event'):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+async def stream_events(tickers=None, last_event_id=None):
+    """
+    Server-Sent Events stream: events after last_event_id replayed from the
+    database (if given), then live events from the broadcaster, with comment
+    heartbeats so proxies keep idle connections open.
+
+    Args:
+        tickers (set): Only events for these tickers (None for all)
+        last_event_id (int): Resume cursor, normally the Last-Event-ID header
+    """
+    config = settings.EVENT_STREAM
+    broadcaster = get_event_broadcaster()
+    # Subscribe before replaying so nothing created in between is lost; duplicates are skipped by id
+    subscription = broadcaster.subscribe(tickers)
+    last_sent = last_event_id or 0
+    try:
+        yield f"retry: {config['RETRY_MS']}\n\n"
+
+        if last_event_id is not None:
+            while True:
+                events = await sync_to_async(fetch_events_after)(last_sent, tickers, config['BATCH_SIZE'])
+                for event_id, ticker, data in events:
+                    yield format_sse(event_id, data)
+                    last_sent = event_id
+                if len(events) < config['BATCH_SIZE']:
+                    break
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), config['HEARTBEAT_INTERVAL'])
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None: # Dropped by the broadcaster
+                break
+            event_id, ticker, data = event
+            if event_id <= last_sent:
+                continue
+            yield format_sse(event_id, data)
+            last_sent = event_id
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+
+from stocks_api.models import PriceUpdate
+
+# Columns of an exported price history row, in output order
+EXPORT_COLUMNS = ['symbol', 'timestamp', 'price', 'volume']
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'columnar': 'application/x-ndjson',
+}
+
+
+def export_queryset(tickers, timestamp_from=None, timestamp_to=None):
+    """
+    Price history rows for a symbol set and time range, as plain tuples.
+
+    Args:
+        tickers (list): Stock ticker symbols
+        timestamp_from (datetime): Inclusive lower bound, or None
+        timestamp_to (datetime): Inclusive upper bound, or None
+
+    Returns:
+        QuerySet: (symbol, timestamp, price, volume) tuples ordered by symbol and
+                  timestamp, which walks the (symbol, -timestamp) index
+    """
+    queryset = PriceUpdate.objects.filter(symbol_id__in=tickers)
+    if timestamp_from:
+        queryset = queryset.filter(timestamp__gte=timestamp_from)
+    if timestamp_to:
+        queryset = queryset.filter(timestamp__lte=timestamp_to)
+    return queryset.order_by('symbol_id', 'timestamp').values_list('symbol_id', 'timestamp', 'price', 'volume')
+
+
+def _chunked_rows(queryset, chunk_size):
+    """Yield lists of at most chunk_size rows without loading the whole result."""
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _format_row(symbol, timestamp, price, volume):
+    return symbol, timestamp.isoformat(), str(price), volume
+
+
+def stream_csv(queryset, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in _chunked_rows(queryset, chunk_size):
+        writer.writerows(_format_row(*row) for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(queryset, chunk_size):
+    for chunk in _chunked_rows(queryset, chunk_size):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _format_row(*row)))) + '\n'
+            for row in chunk
+        )
+
+
+def stream_columnar(queryset, chunk_size):
+    """
+    One JSON object per chunk holding a list per column (a record batch), which
+    loads straight into column-oriented tools such as pandas or Arrow.
+    """
+    for chunk in _chunked_rows(queryset, chunk_size):
+        columns = zip(*(_format_row(*row) for row in chunk))
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, map(list, columns)))) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'columnar': stream_columnar,
+}
@@ -0,0 +1,46 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+@contextmanager
+def cache_lock(cache, key, timeout=5, wait=None, keep_alive=False):
+    """
+    Exclusive section guarded by a lock key taken through cache.add(), which is
+    atomic on shared backends (e.g. Redis), so it serialises every process using
+    the same cache. The lock expires after `timeout` seconds if its holder dies.
+
+    Args:
+        cache: Django cache instance
+        key (str): Lock key
+        timeout (int): Seconds before a stale lock expires
+        wait (float): Seconds to wait for the lock (default: timeout)
+        keep_alive (bool): Renew the lock every timeout / 3 seconds from a background
+                           thread for as long as the section runs, so sections of
+                           unknown length keep it while a dead holder's still expires
+
+    Raises:
+        TimeoutError: If the lock could not be acquired in time
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + (timeout if wait is None else wait)
+    while not cache.add(key, token, timeout=timeout):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Could not acquire lock {key}")
+        time.sleep(0.01)
+    released = threading.Event()
+    if keep_alive:
+        threading.Thread(target=_renew, args=(cache, key, token, timeout, released), daemon=True, name=f'lock-renew:{key}').start()
+    try:
+        yield
+    finally:
+        released.set()
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def _renew(cache, key, token, timeout, released):
+    while not released.wait(timeout / 3):
+        if cache.get(key) != token or not cache.touch(key, timeout):
+            return # Lost the lock (it expired and was taken over), nothing left to renew
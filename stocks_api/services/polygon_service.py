@@ -1,9 +1,21 @@
+import hashlib
+import json
 import logging
+import random
+import time
+import uuid
 import requests
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 from stocks_api.models import StockSymbol, PriceUpdate
+from stocks_api.services.analytics import aggregates_to_frame, compare_to_average
+from stocks_api.services.circuit_breaker import CircuitBreaker
+from stocks_api.services.rate_limiter import INTERACTIVE, TokenBucketRateLimiter
+from stocks_api.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +25,324 @@ class PolygonService:
     """
     BASE_URL = "https://api.polygon.io"
     API_KEY = settings.POLYGON_API_KEY
+    # Tickers per snapshot request, keeps the query string well below URL length limits
+    SNAPSHOT_BATCH_SIZE = 250
 
-    def __init__(self):
+    CACHE_KEY_PREFIX = 'polygon'
+    # Responses worth retrying: rate limited, or Polygon having trouble
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    # Seconds between cache checks while another worker fetches the same response
+    SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+    # Most bars Polygon returns per aggregates request; longer ranges continue at next_url
+    AGGREGATES_LIMIT = 50000
+
+    # Shared by every instance so concurrent requests in this process are coalesced
+    _single_flight = SingleFlight()
+
+    def __init__(self, priority=INTERACTIVE):
+        """
+        Args:
+            priority (str): Rate limiter priority class of this service's requests;
+                            INTERACTIVE for API requests, BACKGROUND for batch work
+        """
+        http = settings.POLYGON_HTTP
         self.session = requests.Session()
         self.session.params = {'apiKey': self.API_KEY}
+        # Retries are handled in _get(), the adapter only keeps connections alive
+        adapter = HTTPAdapter(pool_connections=http['POOL_SIZE'], pool_maxsize=http['POOL_SIZE'], max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.priority = priority
+        self.rate_limiter = TokenBucketRateLimiter.from_settings()
+        self.circuit_breaker = CircuitBreaker(
+            'polygon',
+            failure_threshold=http['BREAKER_FAILURE_THRESHOLD'],
+            reset_timeout=http['BREAKER_RESET_TIMEOUT'],
+        )
+
+    def _get(self, endpoint, params=None, timeout=15):
+        """
+        GET an endpoint through the request pipeline every Polygon call goes through:
+        circuit breaker, rate limiter, then the pooled session with connect/read
+        timeouts. Connection errors, timeouts and RETRY_STATUSES responses are retried
+        with jittered exponential backoff, honoring Retry-After.
+
+        Returns:
+            requests.Response: The last response (possibly an error status)
+
+        Raises:
+            RequestException: On connection errors or timeouts once retries are exhausted,
+                              CircuitOpenError while Polygon is failing, or RateLimitExceeded
+        """
+        http = settings.POLYGON_HTTP
+        attempts = http['MAX_RETRIES'] + 1
+
+        for attempt in range(attempts):
+            self.circuit_breaker.allow_request()
+            self.rate_limiter.acquire(self.priority)
+            try:
+                response = self.session.get(endpoint, params=params, timeout=(http['CONNECT_TIMEOUT'], timeout))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.circuit_breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Polygon request failed ({e}), retry {attempt + 1}/{attempts - 1} in {delay:.2f}s")
+            else:
+                if response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                if response.status_code not in self.RETRY_STATUSES or attempt == attempts - 1:
+                    return response
+
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                elif delay > http['BACKOFF_MAX']:
+                    logger.warning(f"Polygon asked to retry after {delay:.0f}s, giving up")
+                    return response
+                logger.warning(f"Polygon returned {response.status_code}, retry {attempt + 1}/{attempts - 1} in {delay:.2f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def _backoff_delay(attempt):
+        """Full-jitter exponential backoff: uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)]."""
+        http = settings.POLYGON_HTTP
+        return random.uniform(0, min(http['BACKOFF_MAX'], http['BACKOFF_BASE'] * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(dt_timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def _request_json(self, endpoint, params=None, timeout=15):
+        """
+        GET an endpoint and return its JSON body. A 404 is Polygon's way of saying
+        "no data" (e.g. open/close on a holiday) and is returned as a NOT_FOUND payload
+        so it can be negative-cached; other HTTP errors raise RequestException.
+        """
+        response = self._get(endpoint, params=params, timeout=timeout)
+        if response.status_code == 404:
+            return {'status': 'NOT_FOUND'}
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _is_empty(payload):
+        return (
+            payload.get('status') != 'OK'
+            or payload.get('resultsCount') == 0
+            or ('results' in payload and not payload['results'])
+        )
+
+    @classmethod
+    def _cache_ttl(cls, payload, to_date=None):
+        """
+        Pick how long a response stays cached: empty results get the short negative
+        TTL, ranges ending before today can no longer change, anything else may still
+        move during the trading day.
+        """
+        ttls = settings.POLYGON_CACHE_TTL
+        if cls._is_empty(payload):
+            return ttls['EMPTY']
+        if to_date and to_date < date.today().isoformat():
+            return ttls['HISTORICAL']
+        return ttls['RECENT']
+
+    def _cached_request_json(self, endpoint, params=None, to_date=None):
+        """
+        Read-through cache around _request_json keyed on endpoint + params.
+        Request errors propagate and are never cached.
+
+        Misses are single-flighted: concurrent callers in this process share one
+        request (see SingleFlight), and across processes the first worker takes a
+        cache lock on the key while the others wait for its cached response, so
+        Polygon sees one request per key however many callers ask at once.
+
+        Args:
+            endpoint (str): The full endpoint URL
+            params (dict): Extra query parameters (the API key is added by the session)
+            to_date (str): Last date (YYYY-MM-DD) covered by the response, if any
+        """
+        cache_key = self._cache_key(endpoint, params)
+        payload = cache.get(cache_key)
+        if payload is not None:
+            self._count_cache('hits')
+            return payload
+
+        self._count_cache('misses')
+        payload, shared = self._single_flight.do(
+            cache_key, lambda: self._fetch_and_cache(cache_key, endpoint, params, to_date)
+        )
+        if shared:
+            logger.debug(f"Shared an in-flight Polygon request for {endpoint}")
+        return payload
+
+    def _fetch_and_cache(self, cache_key, endpoint, params, to_date):
+        """
+        Fetch and cache a response while holding the key's cross-worker lock. If
+        another worker holds it, wait for that worker's response to appear in the
+        cache; if it gives up or fails (errors are not cached), fetch here instead.
+        """
+        lock_key = f"{cache_key}:lock"
+        token = uuid.uuid4().hex
+        polls = int(settings.POLYGON_SINGLE_FLIGHT_TIMEOUT / self.SINGLE_FLIGHT_POLL_INTERVAL)
+
+        for _ in range(polls):
+            # Held for as long as our request may take, so the lock cannot expire under a
+            # leader still queued at the rate limiter or retrying and let a second fetch in
+            if cache.add(lock_key, token, timeout=self._max_request_time()):
+                try:
+                    payload = cache.get(cache_key) # Filled while we were waiting for the lock
+                    if payload is None:
+                        payload = self._request_json(endpoint, params)
+                        cache.set(cache_key, payload, self._cache_ttl(payload, to_date))
+                    return payload
+                finally:
+                    if cache.get(lock_key) == token:
+                        cache.delete(lock_key)
+
+            payload = cache.get(cache_key)
+            if payload is not None:
+                logger.debug(f"Shared another worker's Polygon request for {endpoint}")
+                return payload
+            time.sleep(self.SINGLE_FLIGHT_POLL_INTERVAL)
+
+        logger.warning(f"Gave up waiting for another worker's Polygon request for {endpoint}")
+        payload = self._request_json(endpoint, params)
+        cache.set(cache_key, payload, self._cache_ttl(payload, to_date))
+        return payload
+
+    def _max_request_time(self, timeout=15):
+        """
+        Longest a _get() call can take in seconds: every attempt may wait out the rate
+        limiter's timeout for this service's priority, then the connect and read
+        timeouts, and every retry backs off for at most BACKOFF_MAX.
+        """
+        http = settings.POLYGON_HTTP
+        attempts = http['MAX_RETRIES'] + 1
+        rate_limit_wait = settings.POLYGON_RATE_LIMIT[f'{self.priority.upper()}_TIMEOUT'] if self.rate_limiter.capacity > 0 else 0
+        return int(attempts * (rate_limit_wait + http['CONNECT_TIMEOUT'] + timeout) + (attempts - 1) * http['BACKOFF_MAX']) + 1
+
+    @classmethod
+    def _cache_key(cls, endpoint, params=None):
+        key_source = json.dumps([endpoint, params or {}], sort_keys=True)
+        return f"{cls.CACHE_KEY_PREFIX}:response:{hashlib.sha1(key_source.encode()).hexdigest()}"
+
+    @classmethod
+    def _count_cache(cls, outcome):
+        counter_key = f"{cls.CACHE_KEY_PREFIX}:cache_stats:{outcome}"
+        cache.add(counter_key, 0, timeout=None)
+        try:
+            cache.incr(counter_key)
+        except ValueError: # Evicted between add() and incr()
+            cache.set(counter_key, 1, timeout=None)
+
+    @classmethod
+    def get_cache_stats(cls):
+        """
+        Return the response cache hit/miss counters.
+
+        Returns:
+            dict: {'hits': int, 'misses': int}
+        """
+        keys = {outcome: f"{cls.CACHE_KEY_PREFIX}:cache_stats:{outcome}" for outcome in ('hits', 'misses')}
+        values = cache.get_many(keys.values())
+        return {outcome: values.get(key, 0) for outcome, key in keys.items()}
+
+    @staticmethod
+    def _normalize_trade(ticker, trade):
+        """
+        Convert a raw Polygon trade object ({'p', 's', 't', ...}) into a
+        {symbol, price, timestamp, volume} record. Trade timestamps are
+        nanoseconds since the epoch (SIP time).
+        """
+        if not trade or trade.get('p') is None or not trade.get('t'):
+            return None
+
+        return {
+            'symbol': ticker,
+            'price': Decimal(str(trade['p'])),
+            'timestamp': datetime.fromtimestamp(trade['t'] / 1_000_000_000, tz=dt_timezone.utc),
+            'volume': trade.get('s'),
+        }
+
+    def get_last_trade(self, ticker):
+        """
+        Get the most recent trade for a stock.
+
+        Args:
+            ticker (str): The stock ticker symbol
+
+        Returns:
+            dict: {'symbol', 'price', 'timestamp', 'volume'} or None if the request failed
+        """
+        endpoint = f"{self.BASE_URL}/v2/last/trade/{ticker}"
+
+        try:
+            response = self._get(endpoint, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+
+            trade = self._normalize_trade(ticker, data.get('results')) if data.get('status') == 'OK' else None
+            if not trade:
+                logger.warning(f"No last trade data found for {ticker}")
+            return trade
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching last trade for {ticker}: {str(e)}")
+            return None
+
+    def get_last_trades(self, tickers):
+        """
+        Get the most recent trade for many stocks using the multi-ticker
+        snapshot endpoint, one request per SNAPSHOT_BATCH_SIZE tickers.
+
+        Args:
+            tickers (list): The stock ticker symbols
+
+        Returns:
+            dict: {ticker: {'symbol', 'price', 'timestamp', 'volume'}} for every
+                  ticker with a last trade, or None if a request failed
+        """
+        endpoint = f"{self.BASE_URL}/v2/snapshot/locale/us/markets/stocks/tickers"
+        trades = {}
+
+        for start in range(0, len(tickers), self.SNAPSHOT_BATCH_SIZE):
+            batch = tickers[start:start + self.SNAPSHOT_BATCH_SIZE]
+            try:
+                response = self._get(endpoint, params={'tickers': ','.join(batch)}, timeout=10)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.error(f"Error fetching snapshot for {len(batch)} tickers: {str(e)}")
+                return None
+
+            if data.get('status') != 'OK':
+                logger.warning(f"Unexpected snapshot response status: {data.get('status')}")
+                return None
+
+            for snapshot in data.get('tickers') or []:
+                ticker = snapshot.get('ticker')
+                trade = self._normalize_trade(ticker, snapshot.get('lastTrade'))
+                if trade:
+                    trades[ticker] = trade
+
+        missing = set(tickers) - set(trades)
+        if missing:
+            logger.warning(f"No snapshot trade data found for {sorted(missing)}")
+        return trades
 
     def get_previous_close(self, ticker):
         """
@@ -31,9 +357,7 @@ class PolygonService:
         endpoint = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/prev"
 
         try:
-            response = self.session.get(endpoint)
-            response.raise_for_status()
-            data = response.json()
+            data = self._cached_request_json(endpoint)
 
             if data.get('status') == 'OK' and data.get('results'):
                 return data['results'][0]
@@ -59,9 +383,7 @@ class PolygonService:
         endpoint = f"{self.BASE_URL}/v1/open-close/{ticker}/{date}"
 
         try:
-            response = self.session.get(endpoint)
-            response.raise_for_status()
-            data = response.json()
+            data = self._cached_request_json(endpoint, to_date=date)
 
             if data.get('status') == 'OK':
                 return data
@@ -90,9 +412,7 @@ class PolygonService:
         endpoint = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}"
 
         try:
-            response = self.session.get(endpoint)
-            response.raise_for_status()
-            data = response.json()
+            data = self._cached_request_json(endpoint, to_date=to_date)
 
             if data.get('status') == 'OK' and data.get('results'):
                 return data['results']
@@ -104,6 +424,42 @@ class PolygonService:
             logger.error(f"Error fetching aggregate data for {ticker}: {str(e)}")
             return []
 
+    def get_aggregate_bars(self, ticker, multiplier, timespan, from_date, to_date):
+        """
+        Download every aggregate bar in a range for bulk work such as backfills.
+        Unlike get_aggregates() the responses are not cached (each range is read once),
+        truncated responses are continued through next_url, and failures are told
+        apart from empty ranges.
+
+        Args:
+            ticker (str): The stock ticker symbol
+            multiplier (int): The size of the timespan multiplier
+            timespan (str): The timespan unit (minute, hour, day, ...)
+            from_date (str): The start date in YYYY-MM-DD format
+            to_date (str): The end date in YYYY-MM-DD format
+
+        Returns:
+            list: Polygon aggregates in time order, [] if there are none, or None if a request failed
+        """
+        url = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}"
+        params = {'adjusted': 'true', 'sort': 'asc', 'limit': self.AGGREGATES_LIMIT}
+        bars = []
+
+        try:
+            while url:
+                data = self._request_json(url, params=params)
+                if data.get('status') not in ('OK', 'DELAYED'):
+                    if data.get('status') == 'NOT_FOUND' or data.get('resultsCount') == 0:
+                        break
+                    logger.warning(f"Unexpected aggregates response for {ticker}: {data}")
+                    return None
+                bars.extend(data.get('results') or [])
+                url, params = data.get('next_url'), None # next_url carries its own query string
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error downloading aggregate bars for {ticker} from {from_date} to {to_date}: {e}")
+            return None
+        return bars
+
     def get_daily_aggregates_against_average(self, ticker, days=30):
         """
         Get daily aggregates and compare against the average for the specified period.
@@ -115,11 +471,14 @@ class PolygonService:
         Returns:
             dict: Analysis results including daily data and comparison to average
         """
+        from stocks_api.services.bar_store import DailyBarStore # bar_store builds on this module
+
         today = datetime.now().date()
         from_date = (today - timedelta(days=days)).strftime('%Y-%m-%d')
         to_date = today.strftime('%Y-%m-%d')
 
-        aggregates = self.get_aggregates(ticker, 1, 'day', from_date, to_date)
+        # Historical bars never change, so read them through the local bar store
+        aggregates = DailyBarStore(polygon_service=self).get_bars(ticker, today - timedelta(days=days), today)
 
         if not aggregates:
             return {
@@ -128,34 +487,8 @@ class PolygonService:
                 'message': f'No data available for {ticker} in the specified date range'
             }
 
-        # Calculate average values
-        avg_close = sum(agg.get('c', 0) for agg in aggregates) / len(aggregates)
-        avg_volume = sum(agg.get('v', 0) for agg in aggregates) / len(aggregates)
-
-        # Compare each day to the average
-        daily_analysis = []
-        for agg in aggregates:
-            close_price = agg.get('c', 0)
-            volume = agg.get('v', 0)
-
-            close_diff_pct = ((close_price - avg_close) / avg_close) * 100 if avg_close else 0
-            volume_diff_pct = ((volume - avg_volume) / avg_volume) * 100 if avg_volume else 0
-
-            daily_analysis.append({
-                'date': datetime.fromtimestamp(agg.get('t', 0) / 1000).strftime('%Y-%m-%d'),
-                'close': close_price,
-                'volume': volume,
-                'close_vs_avg': {
-                    'diff': close_price - avg_close,
-                    'diff_pct': close_diff_pct,
-                    'is_above_avg': close_price > avg_close
-                },
-                'volume_vs_avg': {
-                    'diff': volume - avg_volume,
-                    'diff_pct': volume_diff_pct,
-                    'is_above_avg': volume > avg_volume
-                }
-            })
+        # Averages and per-day comparisons are computed column-wise in the analytics module
+        averages, daily_analysis = compare_to_average(aggregates_to_frame(aggregates))
 
         return {
             'ticker': ticker,
@@ -165,10 +498,7 @@ class PolygonService:
                 'to': to_date,
                 'days': days
             },
-            'averages': {
-                'close': avg_close,
-                'volume': avg_volume
-            },
+            'averages': averages,
             'daily_analysis': daily_analysis
         }
 
@@ -190,15 +520,15 @@ class PolygonService:
 
         try:
             price = Decimal(str(prev_close.get('c', 0)))
-            timestamp = datetime.fromtimestamp(prev_close.get('t', 0) / 1000)
+            timestamp = datetime.fromtimestamp(prev_close.get('t', 0) / 1000, tz=dt_timezone.utc)
 
-            # Create a new price update
-            PriceUpdate.objects.create(
+            # Upsert, so running the update twice for the same close keeps one row
+            PriceUpdate.upsert([PriceUpdate(
                 symbol=symbol_obj,
                 price=price,
                 timestamp=timestamp,
                 volume=prev_close.get('v')
-            )
+            )])
 
             logger.info(f"Updated price data for {ticker}: ${price} at {timestamp}")
             return True
@@ -210,18 +540,12 @@ class PolygonService:
     def get_daily_aggregates(self, ticker_symbol: str, date_from: str, date_to: str):
         url = f"{self.BASE_URL}/v2/aggs/ticker/{ticker_symbol}/range/1/day/{date_from}/{date_to}"
         params = {
-            'apiKey': self.API_KEY,
             'sort': 'asc',
         }
         logger.info(f"PolygonService: Requesting URL: {url} with params (excluding apiKey for log)") # Log URL
         try:
-            response = requests.get(url, params=params, timeout=15)
-            logger.info(f"PolygonService: Response status code: {response.status_code} for {url}") # Log status code
-            if response.status_code != 200:
-                logger.error(f"PolygonService: Error response content: {response.text} for {url}") # Log error content
-            response.raise_for_status() # This will raise HTTPError for 4xx/5xx
+            data = self._cached_request_json(url, params=params, to_date=date_to)
 
-            data = response.json()
             if data.get('status') == 'OK' and 'results' in data:
                 return data['results']
             elif data.get('resultsCount') == 0:
@@ -231,11 +555,11 @@ class PolygonService:
                 logger.warning(f"PolygonService: Unexpected response structure or status for {ticker_symbol}. Response: {data}")
                 return None
         except requests.exceptions.HTTPError as http_err:
-            logger.error(f"HTTP error occurred while fetching daily aggregates for {ticker_symbol}: {http_err} - Response Text: {http_err.response.text if http_err.response else 'No response body'}")
+            logger.error(f"HTTP error occurred while fetching daily aggregates for {ticker_symbol}: {http_err} - Response Text: {http_err.response.text if http_err.response is not None else 'No response body'}")
             return None
         except requests.exceptions.RequestException as req_err:
             logger.error(f"Request error occurred while fetching daily aggregates for {ticker_symbol}: {req_err}")
             return None
         except (KeyError, ValueError) as json_err: # For response.json() or data access issues
-            logger.error(f"JSON parsing error for daily aggregates {ticker_symbol}: {json_err} - Raw Response (first 500 chars): {response.text[:500] if 'response' in locals() and hasattr(response, 'text') else 'N/A'}")
+            logger.error(f"JSON parsing error for daily aggregates {ticker_symbol}: {json_err}")
             return None
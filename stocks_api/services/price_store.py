@@ -0,0 +1,311 @@
+import copy
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from stocks_api.services.locks import cache_lock
+
+logger = logging.getLogger(__name__)
+
+
+class BaseLastPriceStore:
+    """
+    Last known price per ticker, shared by everything that computes percentage changes.
+
+    Entries are dicts: {'price': Decimal, 'timestamp': datetime}.
+
+    Backends only provide an exclusive section (`_atomic`) plus raw reads and
+    writes; the compare-and-update operations are built on top of those so every
+    backend gets the same semantics. Swaps are ordered by timestamp: an entry only
+    replaces the stored one if it is strictly newer, so two workers processing
+    ticks for the same symbol always agree on which price came "before".
+    """
+
+    def get(self, ticker):
+        return self.get_many([ticker]).get(ticker)
+
+    def get_many(self, tickers):
+        """Return {ticker: entry} for every ticker that has a stored price."""
+        return self._read(list(tickers))
+
+    def swap_many(self, entries):
+        """
+        Atomically store every entry that is newer than the stored one.
+
+        Args:
+            entries: {ticker: {'price': Decimal, 'timestamp': datetime}}
+
+        Returns:
+            dict: {ticker: (previous entry or None, applied)}, where `applied` is False
+                  when the stored entry was at least as new and was left in place
+        """
+        if not entries:
+            return {}
+
+        results = {}
+        with self._atomic():
+            stored = self._read(list(entries))
+            updates = {}
+            for ticker, entry in entries.items():
+                previous = stored.get(ticker)
+                applied = previous is None or entry['timestamp'] > previous['timestamp']
+                if applied:
+                    updates[ticker] = entry
+                results[ticker] = (previous, applied)
+            if updates:
+                self._write(updates)
+        return results
+
+    def swap(self, ticker, price, timestamp):
+        """Single-ticker swap_many; returns (previous entry or None, applied)."""
+        return self.swap_many({ticker: {'price': price, 'timestamp': timestamp}})[ticker]
+
+    def compare_and_set(self, ticker, expected, new):
+        """
+        Replace the entry for `ticker` with `new` only if it still equals `expected`.
+        A `new` of None removes the entry.
+        """
+        with self._atomic():
+            if self._read([ticker]).get(ticker) != expected:
+                return False
+            if new is None:
+                self._delete([ticker])
+            else:
+                self._write({ticker: new})
+            return True
+
+    def revert_swaps(self, entries, results):
+        """
+        Undo the applied part of a swap_many whose ticks were never stored (e.g. the
+        database write failed), so they are not treated as stale when retried.
+        Entries that another worker has replaced since are left alone.
+
+        Args:
+            entries: The entries passed to swap_many
+            results: What swap_many returned for them
+        """
+        for ticker, (previous, applied) in results.items():
+            if applied:
+                self.compare_and_set(ticker, entries[ticker], previous)
+
+    def is_warm(self):
+        """Whether the store has already been loaded from the database."""
+        raise NotImplementedError
+
+    def mark_warm(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def _atomic(self):
+        raise NotImplementedError
+        yield
+
+    def _read(self, tickers):
+        raise NotImplementedError
+
+    def _write(self, entries):
+        raise NotImplementedError
+
+    def _delete(self, tickers):
+        raise NotImplementedError
+
+
+class InMemoryLastPriceStore(BaseLastPriceStore):
+    """
+    Per-process store. Fine for a single worker, but every process keeps its own copy.
+    """
+
+    def __init__(self):
+        self._prices = {}
+        self._warm = False
+        self._lock = threading.RLock()
+
+    def is_warm(self):
+        return self._warm
+
+    def mark_warm(self):
+        self._warm = True
+
+    def clear(self):
+        with self._lock:
+            self._prices.clear()
+            self._warm = False
+
+    @contextmanager
+    def _atomic(self):
+        with self._lock:
+            yield
+
+    def _read(self, tickers):
+        return {ticker: self._prices[ticker] for ticker in tickers if ticker in self._prices}
+
+    def _write(self, entries):
+        self._prices.update(entries)
+
+    def _delete(self, tickers):
+        for ticker in tickers:
+            self._prices.pop(ticker, None)
+
+
+class DjangoCacheLastPriceStore(BaseLastPriceStore):
+    """
+    Store backed by a Django cache alias. With a shared cache (e.g. Redis) every
+    gunicorn and Celery process sees the same prices; swaps are serialised with a
+    lock key taken through cache.add(), which is atomic on shared backends.
+
+    Options:
+        CACHE_ALIAS: cache to use (default 'default')
+        KEY_PREFIX: prefix for all keys (default 'last_price')
+        LOCK_TIMEOUT: seconds before a stale lock expires (default 5)
+    """
+
+    def __init__(self, CACHE_ALIAS='default', KEY_PREFIX='last_price', LOCK_TIMEOUT=5):
+        self.cache = caches[CACHE_ALIAS]
+        self.key_prefix = KEY_PREFIX
+        self.lock_timeout = LOCK_TIMEOUT
+
+    def _key(self, ticker):
+        return f"{self.key_prefix}:{ticker}"
+
+    def is_warm(self):
+        return bool(self.cache.get(f"{self.key_prefix}:__warm__"))
+
+    def mark_warm(self):
+        self.cache.set(f"{self.key_prefix}:__warm__", True, timeout=None)
+
+    @contextmanager
+    def _atomic(self):
+        with cache_lock(self.cache, f"{self.key_prefix}:__lock__", timeout=self.lock_timeout):
+            yield
+
+    def _read(self, tickers):
+        found = self.cache.get_many([self._key(ticker) for ticker in tickers])
+        return {ticker: found[self._key(ticker)] for ticker in tickers if self._key(ticker) in found}
+
+    def _write(self, entries):
+        self.cache.set_many({self._key(ticker): entry for ticker, entry in entries.items()}, timeout=None)
+
+    def _delete(self, tickers):
+        self.cache.delete_many([self._key(ticker) for ticker in tickers])
+
+
+class FileLastPriceStore(BaseLastPriceStore):
+    """
+    Store kept in a JSON file guarded by an flock, shared by every process on the
+    host (e.g. all gunicorn and Celery workers in one container) without extra services.
+
+    Options:
+        PATH: file to store prices in (default <BASE_DIR>/last_prices.json)
+    """
+
+    def __init__(self, PATH=None):
+        self.path = str(PATH or os.path.join(settings.BASE_DIR, 'last_prices.json'))
+        self._state = None
+        self._thread_lock = threading.RLock()
+
+    @staticmethod
+    def _decode(entry):
+        return {'price': Decimal(entry['price']), 'timestamp': datetime.fromisoformat(entry['timestamp'])}
+
+    @staticmethod
+    def _encode(entry):
+        return {'price': str(entry['price']), 'timestamp': entry['timestamp'].isoformat()}
+
+    def is_warm(self):
+        with self._atomic():
+            return self._state['warm']
+
+    def mark_warm(self):
+        with self._atomic():
+            self._state['warm'] = True
+
+    def clear(self):
+        with self._atomic():
+            self._state = {'warm': False, 'prices': {}}
+
+    @contextmanager
+    def _atomic(self):
+        with self._thread_lock:
+            if self._state is not None: # Re-entrant call, the file is already locked
+                yield
+                return
+
+            # The flock is taken on a separate file: the data file is replaced on every
+            # write, so a lock on it would not be seen by processes that opened the new one
+            with open(f"{self.path}.lock", 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    loaded = self._load()
+                    self._state = copy.deepcopy(loaded)
+                    yield
+                    if self._state != loaded:
+                        self._save(self._state)
+                finally:
+                    self._state = None
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            with open(self.path) as handle:
+                content = handle.read()
+        except FileNotFoundError:
+            content = ''
+        try:
+            return json.loads(content) if content else {'warm': False, 'prices': {}}
+        except ValueError:
+            # Not warm, so prices are reloaded from the database
+            logger.error(f"Last price store {self.path} is not valid JSON, starting empty")
+            return {'warm': False, 'prices': {}}
+
+    def _save(self, state):
+        # Write a temporary file and rename it over the old one, so a crash mid-write
+        # never leaves a truncated file behind
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w') as output:
+                json.dump(state, output)
+                output.flush()
+                os.fsync(output.fileno())
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _read(self, tickers):
+        with self._atomic():
+            prices = self._state['prices']
+            return {ticker: self._decode(prices[ticker]) for ticker in tickers if ticker in prices}
+
+    def _write(self, entries):
+        with self._atomic():
+            self._state['prices'].update({ticker: self._encode(entry) for ticker, entry in entries.items()})
+
+    def _delete(self, tickers):
+        with self._atomic():
+            for ticker in tickers:
+                self._state['prices'].pop(ticker, None)
+
+
+@lru_cache(maxsize=None)
+def get_last_price_store():
+    """
+    Return the process-wide store configured by settings.LAST_PRICE_STORE.
+    """
+    config = getattr(settings, 'LAST_PRICE_STORE', {})
+    backend = import_string(config.get('BACKEND', 'stocks_api.services.price_store.InMemoryLastPriceStore'))
+    logger.info(f"Using last price store backend {backend.__name__}")
+    return backend(**config.get('OPTIONS', {}))
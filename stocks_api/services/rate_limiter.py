@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from stocks_api.services.locks import cache_lock
+
+logger = logging.getLogger(__name__)
+
+# Priority classes: interactive requests (API views) preempt background ones (Celery tasks)
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """
+    No request token became available in time. Subclasses RequestException so
+    callers treat it like any other failed Polygon request.
+    """
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket holding up to `capacity` request tokens, refilled continuously so
+    the bucket goes from empty to full in `period` seconds (Polygon quotas are per
+    minute). The bucket lives in a Django cache, so with a shared cache (e.g. Redis)
+    every gunicorn and Celery process draws from the same quota.
+
+    Priorities:
+    - interactive requests may take any token;
+    - background requests leave `interactive_reserve` tokens in the bucket and
+      back off entirely while an interactive request is waiting for a token.
+
+    A capacity of 0 disables rate limiting.
+    """
+
+    def __init__(self, capacity, period=60, interactive_reserve=1, cache_alias='default', key_prefix='polygon:rate_limit'):
+        self.capacity = capacity
+        self.period = period
+        self.interactive_reserve = min(interactive_reserve, max(capacity - 1, 0))
+        self.cache = caches[cache_alias]
+        self.key_prefix = key_prefix
+
+    @classmethod
+    def from_settings(cls):
+        config = settings.POLYGON_RATE_LIMIT
+        return cls(
+            capacity=config['CAPACITY'],
+            period=config['PERIOD'],
+            interactive_reserve=config['INTERACTIVE_RESERVE'],
+            cache_alias=config.get('CACHE_ALIAS', 'default'),
+        )
+
+    @property
+    def refill_rate(self):
+        """Tokens added per second."""
+        return self.capacity / self.period
+
+    def _refilled(self, state, now):
+        if state is None:
+            return float(self.capacity)
+        tokens, updated = state
+        return min(float(self.capacity), tokens + (now - updated) * self.refill_rate)
+
+    def try_acquire(self, priority=INTERACTIVE):
+        """
+        Take one token if this priority class may have one right now.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one should be available
+
+        Raises:
+            RateLimitExceeded: If the bucket lock could not be taken
+        """
+        if not self.capacity:
+            return 0.0
+
+        floor = 0 if priority == INTERACTIVE else self.interactive_reserve
+        if priority != INTERACTIVE and self.cache.get(f"{self.key_prefix}:interactive_waiting"):
+            return 1 / self.refill_rate
+
+        try:
+            with cache_lock(self.cache, f"{self.key_prefix}:lock"):
+                now = time.time()
+                tokens = self._refilled(self.cache.get(f"{self.key_prefix}:bucket"), now)
+                if tokens - floor >= 1:
+                    self.cache.set(f"{self.key_prefix}:bucket", (tokens - 1, now), timeout=None)
+                    return 0.0
+        except TimeoutError as e:
+            # Report a stuck bucket lock like any other failed request, not as a bare TimeoutError
+            raise RateLimitExceeded(f"Polygon rate limiter is busy: {e}") from e
+        return (floor + 1 - tokens) / self.refill_rate
+
+    def _start_waiting(self, priority, wait):
+        if priority == INTERACTIVE:
+            # Tell background requests to stand aside until this one is served
+            self.cache.set(f"{self.key_prefix}:interactive_waiting", True, timeout=max(1, int(wait) + 1))
+            return True
+        return False
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """
+        Block until a token is taken.
+
+        Args:
+            priority (str): INTERACTIVE or BACKGROUND
+            timeout (float): Seconds to wait at most (default: the priority's
+                             timeout from settings.POLYGON_RATE_LIMIT)
+
+        Raises:
+            RateLimitExceeded: If no token became available within the timeout
+        """
+        if timeout is None:
+            timeout = settings.POLYGON_RATE_LIMIT[f'{priority.upper()}_TIMEOUT']
+        deadline = time.monotonic() + timeout
+        waiting_key = f"{self.key_prefix}:interactive_waiting"
+        flagged = False
+
+        try:
+            while True:
+                wait = self.try_acquire(priority)
+                if not wait:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimitExceeded(f"No Polygon request token available within {timeout}s ({priority})")
+                flagged = self._start_waiting(priority, wait) or flagged
+                logger.debug(f"Polygon rate limit reached, {priority} request waiting {wait:.2f}s")
+                time.sleep(min(wait, remaining))
+        finally:
+            if flagged:
+                self.cache.delete(waiting_key)
+
+    async def aacquire(self, priority=INTERACTIVE, timeout=None):
+        """
+        acquire() for async code: cache access runs in a worker thread and waiting
+        yields to the event loop instead of blocking it.
+        """
+        if not self.capacity:
+            return
+        if timeout is None:
+            timeout = settings.POLYGON_RATE_LIMIT[f'{priority.upper()}_TIMEOUT']
+        deadline = time.monotonic() + timeout
+        flagged = False
+
+        try:
+            while True:
+                wait = await sync_to_async(self.try_acquire, thread_sensitive=False)(priority)
+                if not wait:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimitExceeded(f"No Polygon request token available within {timeout}s ({priority})")
+                flagged = await sync_to_async(self._start_waiting, thread_sensitive=False)(priority, wait) or flagged
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            if flagged:
+                await sync_to_async(self.cache.delete, thread_sensitive=False)(f"{self.key_prefix}:interactive_waiting")
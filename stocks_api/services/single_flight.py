@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key within a process: the first caller
+    (the leader) runs the function, every caller arriving while it is in flight waits
+    and gets the leader's result or exception. Nothing is remembered once it returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers using `key`.
+
+        Returns:
+            tuple: (fn's result, whether this caller shared another caller's result)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines; calls are only shared within one event loop.
+
+    The call runs as its own task that every caller, the first one included, awaits
+    through asyncio.shield(), so a cancelled caller (e.g. a client that disconnected)
+    stops waiting without cancelling the call the others are waiting for.
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary() # event loop -> {key: Task}
+
+    async def do(self, key, coroutine_fn):
+        """
+        Await coroutine_fn() once for all concurrent callers using `key`.
+
+        Returns:
+            tuple: (the coroutine's result, whether this caller shared another caller's result)
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = calls[key] = loop.create_task(coroutine_fn())
+            task.add_done_callback(lambda done: self._finish(calls, key, done))
+        return await asyncio.shield(task), shared
+
+    @staticmethod
+    def _finish(calls, key, task):
+        if calls.get(key) is task:
+            del calls[key]
+        if not task.cancelled():
+            task.exception() # Retrieved, so no "never retrieved" warning when every caller left
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from stocks_api.models import StockSymbol
+from stocks_api.services.analysis_service import get_analysis_service
+
+logger = logging.getLogger(__name__)
+
+# Polygon WebSocket channels: trades, per-second and per-minute aggregates
+FEEDS = ('T', 'A', 'AM')
+
+
+class StreamAuthError(Exception):
+    """Polygon rejected the API key."""
+
+
+def normalize_stream_message(message):
+    """
+    Convert a Polygon WebSocket trade ('T') or aggregate ('A', 'AM') message into
+    a {symbol, price, timestamp, volume} record. Stream timestamps are Unix ms;
+    aggregates are stamped with the end of their window and priced at the close.
+
+    Returns:
+        dict or None: The record, or None for other messages (status, etc.)
+    """
+    event = message.get('ev')
+    if event == 'T':
+        price, timestamp, volume = message.get('p'), message.get('t'), message.get('s')
+    elif event in ('A', 'AM'):
+        price, timestamp, volume = message.get('c'), message.get('e'), message.get('v')
+    else:
+        return None
+    if price is None or not timestamp or not message.get('sym'):
+        return None
+    return {
+        'symbol': message['sym'],
+        'price': Decimal(str(price)),
+        'timestamp': datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc),
+        'volume': volume,
+    }
+
+
+class PolygonStreamIngestor:
+    """
+    Long-running ingestion from Polygon's WebSocket feed, replacing the once-a-minute
+    REST poll with sub-second detection latency.
+
+    A reader task authenticates, subscribes to the feed for every ticker and pushes
+    normalized ticks onto a bounded queue; a batcher task drains it into micro-batches
+    of up to BATCH_SIZE ticks or BATCH_INTERVAL seconds and hands each one to
+    StockAnalysisService.process_price_batch. When analysis falls behind the queue
+    fills up and the reader stops reading the socket, so memory stays bounded and
+    the backpressure reaches the server instead of piling up ticks.
+
+    Dropped connections are retried with jittered exponential backoff (capped at
+    RECONNECT_MAX seconds) and the subscription is renewed on every connection.
+    Malformed messages are logged and skipped. A batch that fails analysis is retried
+    with the same backoff (process_price_batch restores the last prices it swapped, so
+    a retry sees the batch as new); after PROCESS_RETRIES failures, or if the reader
+    dies, the ingestor stops and run() raises rather than dropping ticks silently.
+    """
+
+    def __init__(self, tickers=None, feed=None, url=None, analysis_service=None):
+        """
+        Args:
+            tickers (list): Tickers to subscribe to (default: every StockSymbol, re-read on reconnect)
+            feed (str): One of FEEDS (default: settings.POLYGON_STREAM['FEED'])
+            url (str): WebSocket URL (default: settings.POLYGON_STREAM['URL'])
+            analysis_service (StockAnalysisService): Defaults to the shared service
+        """
+        config = settings.POLYGON_STREAM
+        self.tickers = tickers
+        self.feed = feed or config['FEED']
+        if self.feed not in FEEDS:
+            raise ValueError(f"feed must be one of {', '.join(FEEDS)}")
+        self.url = url or config['URL']
+        self.batch_size = config['BATCH_SIZE']
+        self.batch_interval = config['BATCH_INTERVAL']
+        self.reconnect_max = config['RECONNECT_MAX']
+        self.process_retries = config['PROCESS_RETRIES']
+        self.analysis_service = analysis_service or get_analysis_service()
+        self.queue = asyncio.Queue(maxsize=config['QUEUE_SIZE'])
+        self.stats = {'connections': 0, 'ticks': 0, 'skipped': 0, 'batches': 0, 'retries': 0, 'events': 0}
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        """
+        Ingest until stop() is called, then process whatever is still queued.
+
+        Raises:
+            Exception: Whatever ended the reader or the batcher early, e.g. a batch
+                that still failed after PROCESS_RETRIES retries
+        """
+        reader = asyncio.create_task(self._read_forever())
+        batcher = asyncio.create_task(self._batch_forever())
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait([reader, batcher, stopping], return_when=asyncio.FIRST_COMPLETED)
+        # Neither task returns on its own before stop(), so finishing first means it failed
+        failed = None if stopping.done() else reader if reader.done() else batcher
+        self.stop()
+        stopping.cancel()
+
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        if failed is None or failed is reader:
+            await asyncio.gather(batcher, return_exceptions=failed is not None)
+        logger.info(f"Stream ingestion stopped: {self.stats}")
+        if failed is not None:
+            logger.error(f"Stream ingestion failed: {failed.exception()!r}")
+            raise failed.exception()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _subscribed_tickers(self):
+        if self.tickers:
+            return list(self.tickers)
+        return await sync_to_async(lambda: list(StockSymbol.objects.values_list('ticker', flat=True)))()
+
+    async def _read_forever(self):
+        attempt = 0
+        while True:
+            try:
+                async with connect(self.url) as websocket:
+                    await self._authenticate(websocket)
+                    tickers = await self._subscribed_tickers()
+                    await websocket.send(json.dumps({
+                        'action': 'subscribe',
+                        'params': ','.join(f'{self.feed}.{ticker}' for ticker in tickers),
+                    }))
+                    self.stats['connections'] += 1
+                    attempt = 0
+                    logger.info(f"Subscribed to {self.feed} stream for {len(tickers)} tickers")
+
+                    async for raw in websocket:
+                        for tick in self._ticks(raw):
+                            self.stats['ticks'] += 1
+                            await self.queue.put(tick) # Blocks while the queue is full
+                logger.warning("Polygon stream closed by the server")
+            except (OSError, TimeoutError, ConnectionClosed, InvalidHandshake, StreamAuthError, ValueError) as e:
+                logger.error(f"Polygon stream connection failed: {e!r}")
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            logger.info(f"Reconnecting to the Polygon stream in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt):
+        return min(self.reconnect_max, 2 ** attempt) * random.uniform(0.5, 1)
+
+    def _ticks(self, raw):
+        """Normalized ticks of one WebSocket frame, skipping messages that can't be read."""
+        try:
+            messages = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"Skipping unreadable Polygon stream frame: {e}")
+            self.stats['skipped'] += 1
+            return []
+        if not isinstance(messages, list):
+            messages = [messages]
+
+        ticks = []
+        for message in messages:
+            try:
+                tick = normalize_stream_message(message)
+            except (AttributeError, TypeError, ValueError, ArithmeticError) as e:
+                logger.warning(f"Skipping malformed Polygon stream message {message!r}: {e!r}")
+                self.stats['skipped'] += 1
+                continue
+            if tick:
+                ticks.append(tick)
+            elif message.get('ev') == 'status':
+                logger.info(f"Polygon stream status: {message.get('message') or message.get('status')}")
+        return ticks
+
+    async def _authenticate(self, websocket):
+        await websocket.send(json.dumps({'action': 'auth', 'params': settings.POLYGON_API_KEY}))
+        while True:
+            for message in json.loads(await websocket.recv()):
+                status = message.get('status')
+                if status == 'auth_success':
+                    return
+                if status == 'auth_failed':
+                    raise StreamAuthError(message.get('message', 'authentication failed'))
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_interval
+        batch = []
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_forever(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._process(batch)
+
+    async def _process(self, batch):
+        attempt = 0
+        while True:
+            try:
+                events = await sync_to_async(self._process_sync)(batch)
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.process_retries:
+                    logger.error(f"Giving up on a batch of {len(batch)} streamed ticks after {attempt} attempts: {e}")
+                    raise
+                delay = self._backoff(attempt - 1)
+                self.stats['retries'] += 1
+                logger.warning(f"Error processing a batch of {len(batch)} streamed ticks, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+        self.stats['batches'] += 1
+        self.stats['events'] += len(events)
+
+    def _process_sync(self, batch):
+        close_old_connections() # Long-running process: drop connections the database has timed out
+        return self.analysis_service.process_price_batch(batch)
@@ -0,0 +1,230 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from stocks_api.models import PriceUpdate
+
+logger = logging.getLogger(__name__)
+
+# Stored in place of a missing volume
+NO_VOLUME = -1
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(timestamp):
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_epoch_us(value):
+    return EPOCH + int(value) * MICROSECOND
+
+
+class TickRing:
+    """
+    The last `capacity` ticks of one symbol in fixed-size int64/float64 arrays.
+
+    Every tick is written twice, at i and i + capacity, so the buffered ticks are
+    always one contiguous slice in timestamp order and a windowed read is a binary
+    search plus a slice, without reassembling the ring.
+    """
+    __slots__ = ('capacity', 'size', 'end', 'timestamps', 'prices', 'volumes')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.end = 0 # Next write position
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64) # Unix epoch microseconds
+        self.prices = np.zeros(2 * capacity, dtype=np.float64)
+        self.volumes = np.zeros(2 * capacity, dtype=np.int64)
+
+    @property
+    def newest(self):
+        """Timestamp of the newest tick (epoch microseconds), or None if empty."""
+        if not self.size:
+            return None
+        return int(self.timestamps[self.end + self.capacity - 1])
+
+    def extend(self, timestamps, prices, volumes):
+        """
+        Append ticks in timestamp order. Ticks not newer than the newest buffered
+        one are dropped (they are still in the database), like stale ticks in the
+        last price store.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        newest = self.newest
+        if newest is not None:
+            keep = timestamps > newest
+            timestamps, prices, volumes = timestamps[keep], np.asarray(prices)[keep], np.asarray(volumes)[keep]
+        count = len(timestamps)
+        if not count:
+            return
+        if count > self.capacity:
+            timestamps, prices, volumes = timestamps[-self.capacity:], prices[-self.capacity:], volumes[-self.capacity:]
+            count = self.capacity
+
+        positions = (self.end + np.arange(count)) % self.capacity
+        for column, values in ((self.timestamps, timestamps), (self.prices, prices), (self.volumes, volumes)):
+            column[positions] = values
+            column[positions + self.capacity] = values
+        self.end = (self.end + count) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+
+    def window(self, since=None, limit=None):
+        """
+        Buffered ticks, oldest first, as copies of the underlying slices.
+
+        Args:
+            since (int): Only ticks at or after this epoch-microsecond timestamp
+            limit (int): Only the newest `limit` ticks
+
+        Returns:
+            tuple: (timestamps, prices, volumes) numpy arrays
+        """
+        stop = self.end + self.capacity
+        start = stop - self.size
+        if since is not None:
+            start += int(np.searchsorted(self.timestamps[start:stop], since, side='left'))
+        if limit is not None:
+            start = max(start, stop - limit)
+        return self.timestamps[start:stop].copy(), self.prices[start:stop].copy(), self.volumes[start:stop].copy()
+
+
+class TickBuffer:
+    """
+    Per-process TickRing per symbol, so questions about recent prices are answered
+    from memory instead of the PriceUpdate table.
+
+    Ticks are added as they are ingested (extend) and loaded from the database
+    with one bulk query (load): on warm-up every symbol's last `capacity` rows,
+    afterwards only rows newer than what is buffered. Processes that do not ingest
+    themselves (e.g. web workers while Celery ingests) call load() before reading
+    to catch up.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._rings = {}
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def is_warm(self):
+        return self._warm
+
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
+            self._warm = False
+
+    def _ring(self, ticker):
+        ring = self._rings.get(ticker)
+        if ring is None:
+            ring = self._rings[ticker] = TickRing(self.capacity)
+        return ring
+
+    def extend(self, records):
+        """
+        Add ingested ticks.
+
+        Args:
+            records: Iterable of dicts with 'symbol', 'price', 'timestamp' and optionally 'volume'
+        """
+        by_ticker = {}
+        for record in sorted(records, key=lambda record: record['timestamp']):
+            volume = record.get('volume')
+            by_ticker.setdefault(record['symbol'], []).append(
+                (to_epoch_us(record['timestamp']), float(record['price']), NO_VOLUME if volume is None else volume)
+            )
+        with self._lock:
+            for ticker, ticks in by_ticker.items():
+                timestamps, prices, volumes = zip(*ticks)
+                self._ring(ticker).extend(timestamps, np.array(prices, dtype=np.float64), np.array(volumes, dtype=np.int64))
+
+    def load(self, tickers=None):
+        """
+        Load ticks from the database in one query: the last `capacity` rows of
+        symbols that are not buffered yet, rows newer than the buffer for the others.
+
+        Args:
+            tickers: Restrict to these tickers, all symbols if None (the warm-up)
+
+        Returns:
+            int: Number of ticks read
+        """
+        with self._lock:
+            newest = {ticker: ring.newest for ticker, ring in self._rings.items() if ring.size}
+
+        price_updates = PriceUpdate.objects.all()
+        if tickers is not None:
+            tickers = list(tickers)
+            if not tickers:
+                return 0
+            newer = Q()
+            for ticker in tickers:
+                if ticker in newest:
+                    newer |= Q(symbol_id=ticker, timestamp__gt=from_epoch_us(newest[ticker]))
+                else:
+                    newer |= Q(symbol_id=ticker)
+            price_updates = price_updates.filter(newer)
+        elif newest:
+            price_updates = price_updates.exclude(
+                Q(*[Q(symbol_id=ticker, timestamp__lte=from_epoch_us(value)) for ticker, value in newest.items()], _connector=Q.OR)
+            )
+
+        rows = price_updates.annotate(
+            row_number=Window(RowNumber(), partition_by=[F('symbol')], order_by=F('timestamp').desc())
+        ).filter(row_number__lte=self.capacity).order_by('symbol_id', 'timestamp').values_list('symbol_id', 'timestamp', 'price', 'volume')
+
+        self.extend({'symbol': ticker, 'timestamp': timestamp, 'price': price, 'volume': volume} for ticker, timestamp, price, volume in rows)
+        if tickers is None:
+            self._warm = True
+        return len(rows)
+
+    def window(self, ticker, since=None, limit=None):
+        """
+        Recent ticks of one symbol, oldest first.
+
+        Args:
+            ticker (str): The ticker symbol
+            since (datetime): Only ticks at or after this time
+            limit (int): Only the newest `limit` ticks
+
+        Returns:
+            tuple: (timestamps in epoch microseconds, prices, volumes with NO_VOLUME
+                   for missing ones) numpy arrays, empty if nothing is buffered
+        """
+        with self._lock:
+            ring = self._rings.get(ticker)
+            if ring is None:
+                empty = np.array([], dtype=np.int64)
+                return empty, np.array([], dtype=np.float64), empty.copy()
+            return ring.window(None if since is None else to_epoch_us(since), limit)
+
+    def latest(self, tickers):
+        """
+        Newest buffered tick per ticker.
+
+        Returns:
+            dict: { 'ticker': {'price': float, 'timestamp': datetime} }
+        """
+        latest = {}
+        with self._lock:
+            for ticker in tickers:
+                ring = self._rings.get(ticker)
+                if ring is not None and ring.size:
+                    position = ring.end + ring.capacity - 1
+                    latest[ticker] = {'price': float(ring.prices[position]), 'timestamp': from_epoch_us(ring.timestamps[position])}
+        return latest
+
+
+@lru_cache(maxsize=None)
+def get_tick_buffer():
+    """Return the process-wide TickBuffer sized by settings.TICK_BUFFER_SIZE."""
+    return TickBuffer(settings.TICK_BUFFER_SIZE)
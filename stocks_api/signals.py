@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AlertRule, DailyEventCount, SignificantEvent
+from .services.alert_engine import invalidate_alert_rules
+
+
+# bulk_create() skips these signals, so bulk writers call DailyEventCount.increment_for themselves
+@receiver(post_save, sender=SignificantEvent)
+def count_created_event(sender, instance, created, **kwargs):
+    if created:
+        DailyEventCount.increment_for([instance])
+
+
+@receiver(post_delete, sender=SignificantEvent)
+def uncount_deleted_event(sender, instance, **kwargs):
+    DailyEventCount.increment_for([instance], delta=-1)
+
+
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+def invalidate_alert_rule_index(sender, **kwargs):
+    invalidate_alert_rules()
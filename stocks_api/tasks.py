@@ -1,14 +1,94 @@
 from celery import shared_task
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import date
 from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from .services.backfill import PriceBackfill
+from .services.locks import cache_lock
 from .services.polygon_service import PolygonService
-from .services.analysis_service import StockAnalysisService
+from .services.rate_limiter import BACKGROUND
+from .services.analysis_service import get_analysis_service
 from .models import StockSymbol # To fetch all symbols dynamically
 
 logger = logging.getLogger(__name__)
 
+# Held while fetch_and_process_stock_data_task runs, see INGESTION_LOCK_TIMEOUT
+INGESTION_LOCK_KEY = 'lock:fetch_and_process_stock_data'
+
+def _fetch_trade_batch(polygon_service, batch):
+    """
+    Fetch one batch through the snapshot endpoint, falling back to one
+    get_last_trade call per ticker if the snapshot request fails.
+    """
+    trades = polygon_service.get_last_trades(batch)
+    if trades is not None:
+        return trades, {}
+
+    logger.warning(f"Snapshot request failed for {len(batch)} tickers, falling back to per-ticker requests")
+    trades = {}
+    errors = {}
+    for ticker in batch:
+        try:
+            trades[ticker] = polygon_service.get_last_trade(ticker)
+        except Exception as e:
+            logger.error(f"Error fetching trade data for {ticker}: {e}")
+            errors[ticker] = str(e)
+    return trades, errors
+
+def _fetch_last_trades(polygon_service, ticker_symbols, concurrency):
+    """
+    Fetch stage: split the watchlist into snapshot-sized batches and fan
+    them out over a bounded thread pool.
+
+    Only HTTP work happens in the worker threads; all ORM access stays in the
+    calling thread so the task keeps using a single DB connection.
+
+    Returns:
+        tuple: ({ticker: trade_data}, {ticker: error message})
+    """
+    trades = {}
+    errors = {}
+    batch_size = polygon_service.SNAPSHOT_BATCH_SIZE
+    batches = [ticker_symbols[i:i + batch_size] for i in range(0, len(ticker_symbols), batch_size)]
+    max_workers = max(1, min(concurrency, len(batches)))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='polygon-fetch') as executor:
+        futures = {executor.submit(_fetch_trade_batch, polygon_service, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                batch_trades, batch_errors = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching trade data for {batch}: {e}")
+                batch_trades, batch_errors = {}, {ticker: str(e) for ticker in batch}
+            trades.update(batch_trades)
+            errors.update(batch_errors)
+
+    return trades, errors
+
 @shared_task
-def fetch_and_process_stock_data_task(ticker_symbols=None):
+def fetch_and_process_stock_data_task(ticker_symbols=None, concurrency=None):
+    """
+    Fetch the latest trades and analyze them. Runs are serialized through a cache
+    lock: a run triggered while another one is still in progress (a slow beat run,
+    the manual /fetch-latest/ trigger) is skipped instead of processing the same
+    ticks twice. The lock is renewed while the run is in progress, however long
+    rate-limit waits and retries make it, and expires INGESTION_LOCK_TIMEOUT
+    seconds after a worker holding it dies.
+    """
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(cache_lock(cache, INGESTION_LOCK_KEY, timeout=settings.INGESTION_LOCK_TIMEOUT, wait=0, keep_alive=True))
+        except TimeoutError:
+            logger.warning("Another stock data fetch is still running, skipping this run.")
+            return "Skipped, another run is in progress."
+        return _fetch_and_process_stock_data(ticker_symbols, concurrency)
+
+def _fetch_and_process_stock_data(ticker_symbols, concurrency):
     if ticker_symbols is None:
         # Fetch all symbols from DB if not provided
         ticker_symbols = list(StockSymbol.objects.values_list('ticker', flat=True))
@@ -17,27 +97,33 @@ def fetch_and_process_stock_data_task(ticker_symbols=None):
         logger.warning("No ticker symbols provided or found in DB for fetching data.")
         return "No symbols to process."
 
-    polygon_service = PolygonService()
-    analysis_service = StockAnalysisService()
+    concurrency = concurrency or settings.POLYGON_FETCH_CONCURRENCY
+    polygon_service = PolygonService(priority=BACKGROUND)
+    analysis_service = get_analysis_service()
     results = []
+    task_started = time.perf_counter()
 
-    logger.info(f"Fetching data for symbols: {ticker_symbols}")
+    logger.info(f"Fetching data for {len(ticker_symbols)} symbols with concurrency {concurrency}: {ticker_symbols}")
+    trades, fetch_errors = _fetch_last_trades(polygon_service, ticker_symbols, concurrency)
+    fetch_seconds = time.perf_counter() - task_started
+
+    analysis_started = time.perf_counter()
+    records = []
     for ticker in ticker_symbols:
-        trade_data = polygon_service.get_last_trade(ticker)
+        if ticker in fetch_errors:
+            results.append(f"Error fetching {ticker}")
+            continue
+
+        trade_data = trades.get(ticker)
         if trade_data:
             logger.debug(f"Fetched data for {ticker}: Price {trade_data['price']} at {trade_data['timestamp']}")
             try:
-                current_price = Decimal(str(trade_data['price'])) # Ensure Decimal conversion
-                current_timestamp = trade_data['timestamp']
-                event = analysis_service.process_new_price_data(
-                    symbol_ticker=ticker,
-                    current_price=current_price,
-                    current_timestamp=current_timestamp
-                )
-                if event:
-                    results.append(f"Event for {ticker}: {event.event_type}")
-                else:
-                    results.append(f"No significant event for {ticker}")
+                records.append({
+                    'symbol': ticker,
+                    'price': Decimal(str(trade_data['price'])), # Ensure Decimal conversion
+                    'timestamp': trade_data['timestamp'],
+                    'volume': trade_data.get('volume'),
+                })
             except Exception as e:
                 logger.error(f"Error processing data for {ticker}: {e}")
                 results.append(f"Error processing {ticker}")
@@ -45,24 +131,50 @@ def fetch_and_process_stock_data_task(ticker_symbols=None):
             logger.warning(f"No trade data received for {ticker}")
             results.append(f"No data for {ticker}")
 
-    summary = f"Processed {len(ticker_symbols)} symbols. Results: {'; '.join(results)}"
+    if records:
+        try:
+            events = analysis_service.process_price_batch(records)
+            events_by_ticker = {event.symbol_id: event for event in events}
+            for record in records:
+                event = events_by_ticker.get(record['symbol'])
+                if event:
+                    results.append(f"Event for {record['symbol']}: {event.event_type}")
+                else:
+                    results.append(f"No significant event for {record['symbol']}")
+        except Exception as e:
+            logger.error(f"Error processing batch of {len(records)} price updates: {e}")
+            results.extend(f"Error processing {record['symbol']}" for record in records)
+    analysis_seconds = time.perf_counter() - analysis_started
+    total_seconds = time.perf_counter() - task_started
+
+    summary = (
+        f"Processed {len(ticker_symbols)} symbols in {total_seconds:.2f}s "
+        f"(fetch {fetch_seconds:.2f}s, analysis {analysis_seconds:.2f}s, concurrency {concurrency}). "
+        f"Results: {'; '.join(results)}"
+    )
     logger.info(summary)
     return summary
 
+@shared_task
+def backfill_prices_task(ticker_symbols, date_from, date_to, timespan='minute', concurrency=None):
+    """
+    Seed price history from Polygon aggregates (see PriceBackfill). Safe to retry or
+    re-run: finished chunks are skipped and stored rows are not duplicated.
+
+    Args:
+        ticker_symbols (list): Tickers to backfill
+        date_from (str): First day, YYYY-MM-DD
+        date_to (str): Last day, YYYY-MM-DD
+        timespan (str): Bar size, one of backfill.CHUNK_DAYS
+        concurrency (int): Parallel downloads (default: settings.POLYGON_BACKFILL_CONCURRENCY)
+    """
+    stats = PriceBackfill(concurrency=concurrency).run(
+        ticker_symbols, date.fromisoformat(date_from), date.fromisoformat(date_to), timespan
+    )
+    return f"Backfilled {', '.join(ticker_symbols)} from {date_from} to {date_to}: {stats}"
+
 # Example task to initialize last prices from DB (run once or periodically)
 @shared_task
 def initialize_last_prices_cache_task():
-    from stocks_api.services.analysis_service import LAST_PRICES_MEMORY_CACHE
-    from stocks_api.models import PriceUpdate # Assuming you store all updates
-
-    logger.info("Initializing LAST_PRICES_MEMORY_CACHE from database...")
-    symbols = StockSymbol.objects.all()
-    for symbol in symbols:
-        last_update = PriceUpdate.objects.filter(symbol=symbol).order_by('-timestamp').first()
-        if last_update:
-            LAST_PRICES_MEMORY_CACHE[symbol.ticker] = {
-                'price': last_update.price,
-                'timestamp': last_update.timestamp
-            }
-            logger.info(f"Initialized cache for {symbol.ticker} with price {last_update.price}")
-    logger.info("LAST_PRICES_MEMORY_CACHE initialization complete.")
\ No newline at end of file
+    logger.info("Initializing last price store from database...")
+    get_analysis_service()._initialize_cache_from_db()
@@ -0,0 +1,155 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from websockets.asyncio.server import serve
+
+RECORDED_STREAM = Path(__file__).parent / 'fixtures' / 'polygon_stream_ticks.json'
+
+
+class FakePolygonServer:
+    """
+    Minimal local stand-in for api.polygon.io so PolygonService can be tested
+    offline. Register canned JSON per path with add_route(); every request is
+    recorded in `requests` as (path, query params).
+
+    Usage:
+        with FakePolygonServer() as server:
+            server.add_route('/v2/last/trade/GOOGL', {'status': 'OK', ...})
+            with patch.object(PolygonService, 'BASE_URL', server.url):
+                ...
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.sequences = {}
+        self.requests = []
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def add_route(self, path, payload, status=200, headers=None):
+        """Serve `payload` (JSON-serialisable, or a callable taking the query params) at `path`."""
+        self.routes[path] = (payload, status, headers or {})
+
+    def add_sequence(self, path, responses):
+        """
+        Serve (payload, status, headers) tuples at `path` one request at a time;
+        the last one keeps being served once the others are used up.
+        """
+        self.sequences[path] = [(payload, status, headers or {}) for payload, status, headers in responses]
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                fake.requests.append((parsed.path, params))
+
+                sequence = fake.sequences.get(parsed.path)
+                if sequence:
+                    payload, status, headers = sequence.pop(0) if len(sequence) > 1 else sequence[0]
+                else:
+                    payload, status, headers = fake.routes.get(parsed.path, ({'status': 'NOT_FOUND'}, 404, {}))
+                if callable(payload):
+                    payload = payload(params)
+                body = json.dumps(payload).encode()
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakePolygonStream:
+    """
+    Local stand-in for Polygon's WebSocket feed. It speaks the connect / auth /
+    subscribe handshake and then replays recorded messages (by default the
+    fixtures/polygon_stream_ticks.json recording) for the subscribed channels.
+    The replay position is shared by all connections, so a client that reconnects
+    picks up where the dropped connection stopped.
+
+    Usage:
+        async with FakePolygonStream(disconnect_after=2) as stream:
+            ingestor = PolygonStreamIngestor(url=stream.url)
+            ...
+    """
+
+    def __init__(self, messages=None, api_key=None, disconnect_after=None, disconnects=1):
+        """
+        Args:
+            messages (list): Messages to replay (default: the recorded fixture)
+            api_key (str): Reject other keys with auth_failed (default: accept any)
+            disconnect_after (int): Drop the connection after sending this many messages
+            disconnects (int): How many connections get dropped that way
+        """
+        self.messages = messages if messages is not None else json.loads(RECORDED_STREAM.read_text())
+        self.api_key = api_key
+        self.disconnect_after = disconnect_after
+        self.disconnects = disconnects
+        self.position = 0
+        self.connections = 0
+        self.subscriptions = []
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def _handler(self, websocket):
+        self.connections += 1
+        await websocket.send(json.dumps([{'ev': 'status', 'status': 'connected', 'message': 'Connected Successfully'}]))
+
+        auth = json.loads(await websocket.recv())
+        if self.api_key and auth.get('params') != self.api_key:
+            await websocket.send(json.dumps([{'ev': 'status', 'status': 'auth_failed', 'message': 'authentication failed'}]))
+            return
+        await websocket.send(json.dumps([{'ev': 'status', 'status': 'auth_success', 'message': 'authenticated'}]))
+
+        subscribe = json.loads(await websocket.recv())
+        channels = set(subscribe['params'].split(','))
+        self.subscriptions.append(channels)
+
+        sent = 0
+        while self.position < len(self.messages):
+            if self.disconnects and sent == self.disconnect_after:
+                self.disconnects -= 1
+                return
+            message = self.messages[self.position]
+            self.position += 1
+            if f"{message['ev']}.{message['sym']}" in channels:
+                await websocket.send(json.dumps([message]))
+                sent += 1
+        await websocket.wait_closed() # Idle feed, like outside market hours
+
+    async def __aenter__(self):
+        self._server = await serve(self._handler, '127.0.0.1', 0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+        await self._server.wait_closed()
@@ -0,0 +1,163 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from stocks_api.models import Alert, AlertRule, PriceUpdate, StockSymbol
+from stocks_api.services.alert_engine import AlertEngine, AlertRuleIndex
+from stocks_api.services.analysis_service import StockAnalysisService
+from stocks_api.services.price_store import get_last_price_store
+from stocks_api.services.tick_buffer import TickBuffer, get_tick_buffer
+
+
+class AlertRuleIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.index = AlertRuleIndex([
+            (1, 10, 'GOOGL', 'UP', Decimal('5.00'), 300),
+            (2, 11, 'GOOGL', 'UP', Decimal('1.00'), 300),
+            (3, 12, 'GOOGL', 'UP', Decimal('2.50'), 300),
+            (4, 10, 'GOOGL', 'DOWN', Decimal('1.00'), 300),
+            (5, 10, 'GOOGL', 'UP', Decimal('1.00'), 3600),
+            (6, 10, 'AMZN', 'UP', Decimal('1.00'), 300),
+        ])
+
+    def test_matches_rules_with_thresholds_up_to_the_change(self):
+        self.assertEqual([rule.id for rule in self.index.matching('GOOGL', 300, 'UP', 2.5)], [2, 3])
+        self.assertEqual([rule.id for rule in self.index.matching('GOOGL', 300, 'UP', 0.5)], [])
+        self.assertEqual([rule.id for rule in self.index.matching('GOOGL', 300, 'DOWN', 9)], [4])
+
+    def test_groups_by_ticker_and_window(self):
+        self.assertEqual(self.index.size, 6)
+        self.assertEqual(sorted(self.index.windows('GOOGL')), [300, 3600])
+        self.assertEqual(self.index.windows('MSFT'), [])
+        self.assertEqual(self.index.matching('MSFT', 300, 'UP', 10), [])
+
+
+class AlertEngineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='password')
+        cls.googl = StockSymbol.objects.create(ticker='GOOGL', name='Google')
+        cls.amzn = StockSymbol.objects.create(ticker='AMZN', name='Amazon')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.now = timezone.now()
+        self.buffer = TickBuffer(16)
+        self.engine = AlertEngine(tick_buffer=self.buffer)
+
+    def add_ticks(self, ticker, *ticks):
+        self.buffer.extend(
+            {'symbol': ticker, 'price': Decimal(price), 'timestamp': self.now - timedelta(seconds=ago)} for ago, price in ticks
+        )
+
+    def rule(self, **kwargs):
+        return AlertRule.objects.create(**{'user': self.user, 'symbol': self.googl, 'direction': 'UP', 'threshold': Decimal('2.00'), 'window': 300, **kwargs})
+
+    def test_change_is_measured_over_the_rule_window(self):
+        short = self.rule(window=60)
+        long = self.rule(window=3600)
+        down = self.rule(direction='DOWN')
+        # 100 seventy minutes ago, 104 two minutes ago, 105 now: +0.96% over a minute, +5% over five minutes and an hour
+        self.add_ticks('GOOGL', (4200, '100'), (120, '104'), (0, '105'))
+
+        alerts = self.engine.evaluate(['GOOGL'])
+
+        self.assertEqual([alert.rule_id for alert in alerts], [long.id])
+        self.assertEqual(alerts[0].details['reference_price'], 100.0)
+        self.assertEqual(alerts[0].details['percentage_change'], '5.00')
+        self.assertNotIn(short.id, [alert.rule_id for alert in alerts])
+        self.assertNotIn(down.id, [alert.rule_id for alert in alerts])
+
+    def test_triggered_rule_is_silenced_for_its_window(self):
+        self.rule()
+        self.add_ticks('GOOGL', (600, '100'), (0, '103'))
+
+        self.assertEqual(len(self.engine.evaluate(['GOOGL'])), 1)
+        self.assertEqual(self.engine.evaluate(['GOOGL']), [])
+
+    def test_index_is_rebuilt_only_when_rules_change(self):
+        self.add_ticks('GOOGL', (600, '100'), (0, '103'))
+        self.assertEqual(self.engine.evaluate(['GOOGL']), [])
+
+        with self.assertNumQueries(0):
+            self.engine.evaluate(['GOOGL'])
+
+        rule = self.rule()
+        with self.assertNumQueries(2): # The rules, then the ticks newer than the buffer
+            alerts = self.engine.evaluate(['GOOGL'])
+        self.assertEqual([alert.rule_id for alert in alerts], [rule.id])
+
+        rule.delete()
+        self.assertEqual(self.engine.evaluate(['GOOGL']), [])
+
+    def test_ticks_stored_by_other_workers_are_loaded(self):
+        rule = self.rule()
+        self.add_ticks('GOOGL', (600, '100'))
+        PriceUpdate.objects.create(symbol=self.googl, price=Decimal('103'), timestamp=self.now)
+
+        alerts = self.engine.evaluate(['GOOGL'])
+
+        self.assertEqual([alert.rule_id for alert in alerts], [rule.id])
+        self.assertEqual(alerts[0].details['current_price'], 103.0)
+
+    def test_windows_longer_than_the_buffer_start_from_the_database(self):
+        hour = self.rule(window=3600)
+        day = self.rule(window=86400)
+        # The buffer only holds the last two minutes: 110 then 103
+        PriceUpdate.objects.create(symbol=self.googl, price=Decimal('100'), timestamp=self.now - timedelta(hours=2))
+        self.add_ticks('GOOGL', (120, '110'), (0, '103'))
+
+        alerts = self.engine.evaluate(['GOOGL'])
+
+        # +3% over the hour; the day reaches back before the ticker's first price
+        self.assertEqual([alert.rule_id for alert in alerts], [hour.id])
+        self.assertEqual(alerts[0].details['reference_price'], 100.0)
+        self.assertNotIn(day.id, [alert.rule_id for alert in alerts])
+
+    def test_disabled_rules_and_other_tickers_are_ignored(self):
+        self.rule(enabled=False)
+        self.rule(symbol=self.amzn)
+        self.add_ticks('GOOGL', (60, '100'), (0, '110'))
+
+        self.assertEqual(self.engine.evaluate(['GOOGL', 'MSFT']), [])
+
+
+class BatchAlertTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='password')
+        cls.googl = StockSymbol.objects.create(ticker='GOOGL', name='Google')
+
+    def setUp(self):
+        get_last_price_store().clear()
+        get_tick_buffer().clear()
+        self.addCleanup(get_tick_buffer().clear)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_batches_store_alerts_and_mark_rules_triggered(self):
+        rule = AlertRule.objects.create(user=self.user, symbol=self.googl, direction='DOWN', threshold=Decimal('1.50'), window=900)
+        service = StockAnalysisService()
+        now = timezone.now()
+
+        service.process_price_batch([
+            {'symbol': 'GOOGL', 'price': Decimal('100.00'), 'timestamp': now - timedelta(minutes=20)},
+            {'symbol': 'GOOGL', 'price': Decimal('99.00'), 'timestamp': now - timedelta(minutes=1)},
+        ])
+        self.assertFalse(Alert.objects.exists())
+
+        service.process_price_batch([{'symbol': 'GOOGL', 'price': Decimal('98.00'), 'timestamp': now}])
+
+        alert = Alert.objects.get()
+        self.assertEqual((alert.rule_id, alert.user_id, alert.symbol_id), (rule.id, self.user.id, 'GOOGL'))
+        self.assertEqual(alert.details['percentage_change'], '-2.00')
+        rule.refresh_from_db()
+        self.assertEqual(rule.last_triggered_at, alert.timestamp)
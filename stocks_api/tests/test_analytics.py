@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from stocks_api.services.analytics import (
+    aggregates_to_frame, analyze_aggregates, compare_to_average, frame_to_series, lttb_indices, prices_to_frame, resample_prices,
+)
+
+AGGREGATES = [
+    {'t': 1704171600000 + day * 86_400_000, 'o': 100.0, 'h': 101.0, 'l': 99.0, 'c': close, 'v': volume}
+    for day, (close, volume) in enumerate([(100.0, 1000.0), (102.0, 1100.0), (101.0, 900.0), (105.0, 5000.0), (104.0, 1000.0)])
+]
+
+
+class CompareToAverageTest(SimpleTestCase):
+
+    def test_matches_per_row_computation(self):
+        averages, daily_analysis = compare_to_average(aggregates_to_frame(AGGREGATES))
+
+        avg_close = sum(agg['c'] for agg in AGGREGATES) / len(AGGREGATES)
+        avg_volume = sum(agg['v'] for agg in AGGREGATES) / len(AGGREGATES)
+        self.assertEqual(averages, {'close': avg_close, 'volume': avg_volume})
+        self.assertEqual(daily_analysis[3], {
+            'date': '2024-01-05',
+            'close': 105.0,
+            'volume': 5000.0,
+            'close_vs_avg': {'diff': 105.0 - avg_close, 'diff_pct': (105.0 - avg_close) / avg_close * 100, 'is_above_avg': True},
+            'volume_vs_avg': {'diff': 5000.0 - avg_volume, 'diff_pct': (5000.0 - avg_volume) / avg_volume * 100, 'is_above_avg': True},
+        })
+        self.assertIs(type(daily_analysis[0]['close_vs_avg']['is_above_avg']), bool)
+
+    def test_missing_values_count_as_zero(self):
+        averages, daily_analysis = compare_to_average(aggregates_to_frame([{'t': 1704171600000, 'c': 10.0}]))
+
+        self.assertEqual(averages, {'close': 10.0, 'volume': 0.0})
+        self.assertEqual(daily_analysis[0]['volume_vs_avg']['diff_pct'], 0.0)
+
+
+class AnalyzeAggregatesTest(SimpleTestCase):
+
+    def test_statistics_and_anomalies(self):
+        analysis = analyze_aggregates(aggregates_to_frame(AGGREGATES), window=2, zscore_threshold=1.5)
+
+        self.assertEqual(analysis['count'], 5)
+        self.assertEqual(analysis['close']['median'], 102.0)
+        self.assertEqual(analysis['close']['last'], 104.0)
+        self.assertEqual(analysis['series']['rolling_close'], [100.0, 101.0, 101.5, 103.0, 104.5])
+        self.assertEqual([anomaly['timestamp'] for anomaly in analysis['volume_anomalies']], ['2024-01-05T05:00:00Z'])
+        self.assertAlmostEqual(sum(analysis['series']['close_zscore']), 0.0)
+
+    def test_flat_series_has_zero_zscores(self):
+        flat = [dict(agg, c=100.0, v=1000.0) for agg in AGGREGATES]
+
+        analysis = analyze_aggregates(aggregates_to_frame(flat))
+
+        self.assertEqual(analysis['series']['volume_zscore'], [0.0] * 5)
+        self.assertEqual(analysis['volume_anomalies'], [])
+
+    def test_empty_input(self):
+        self.assertEqual(analyze_aggregates(aggregates_to_frame([]))['count'], 0)
+
+
+class ResamplePricesTest(SimpleTestCase):
+
+    def setUp(self):
+        start = datetime(2024, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+        # Ticks at minutes 0-3 and 10-11, so the 5-minute bucket starting at :05 is empty
+        self.rows = [
+            (start + timedelta(minutes=minute), Decimal(price), volume)
+            for minute, price, volume in [(0, '10', 100), (1, '12', 100), (2, '9', None), (3, '11', 100), (10, '20', 100), (11, '19', 100)]
+        ]
+
+    def test_ohlcv_buckets_skip_empty_intervals(self):
+        bars = resample_prices(prices_to_frame(self.rows), '5m')
+
+        series = frame_to_series(bars)
+        self.assertEqual(series, {
+            'timestamp': ['2024-01-02T15:00:00Z', '2024-01-02T15:10:00Z'],
+            'open': [10.0, 20.0],
+            'high': [12.0, 20.0],
+            'low': [9.0, 19.0],
+            'close': [11.0, 19.0],
+            'volume': [300.0, 200.0],
+            'count': [4, 2],
+        })
+
+    def test_missing_values_become_none(self):
+        series = frame_to_series(prices_to_frame(self.rows))
+
+        self.assertEqual(series['volume'][1:3], [100.0, None])
+        self.assertEqual(resample_prices(prices_to_frame([]), '1h').empty, True)
+
+
+class LttbIndicesTest(SimpleTestCase):
+
+    def test_keeps_endpoints_and_peaks(self):
+        x = np.arange(100, dtype=float)
+        y = np.zeros(100)
+        y[37], y[71] = 50.0, -40.0
+
+        selected = lttb_indices(x, y, 10)
+
+        self.assertEqual(len(selected), 10)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 99)
+        self.assertIn(37, selected)
+        self.assertIn(71, selected)
+        self.assertTrue((np.diff(selected) > 0).all())
+
+    def test_short_series_is_returned_whole(self):
+        self.assertEqual(lttb_indices(np.arange(5.0), np.arange(5.0), 10).tolist(), [0, 1, 2, 3, 4])
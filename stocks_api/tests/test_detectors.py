@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from stocks_api.models import DetectorConfig, StockSymbol
+from stocks_api.services.detectors import (
+    DetectorEngine, GapOpenDetector, ThresholdDetector, Tick, VolatilityBreakoutDetector, VolumeSpikeDetector, ZScoreDetector,
+)
+
+# 10:00 in New York
+NOW = datetime(2024, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+SYMBOL = StockSymbol(ticker='GOOGL', name='Google')
+
+
+def make_ticks(prices, volumes=None, start=NOW, step=timedelta(seconds=1)):
+    """Chain prices into Ticks the way the analysis service does."""
+    ticks = []
+    previous = None
+    for i, price in enumerate(prices):
+        timestamp = start + i * step
+        ticks.append(Tick(SYMBOL, Decimal(str(price)), timestamp, volumes[i] if volumes else None, previous))
+        previous = {'price': Decimal(str(price)), 'timestamp': timestamp}
+    return ticks
+
+
+def run_detector(detector, ticks, **params):
+    params = {**detector.defaults, **params}
+    state = detector.initial_state()
+    events = []
+    for tick in ticks:
+        state, event = detector.update(state, tick, params)
+        events.append(event)
+    return events
+
+
+def alternating(count, low=100.0, high=100.1):
+    return [low if i % 2 else high for i in range(count)]
+
+
+class DetectorTest(SimpleTestCase):
+
+    def test_threshold_compares_against_the_previous_price(self):
+        events = run_detector(ThresholdDetector(), make_ticks([100, 101, 104, 101]))
+
+        self.assertEqual([event and event[0] for event in events], [None, None, 'PRICE_INCREASE', 'PRICE_DECREASE'])
+        self.assertEqual(events[2][1]['previous_price'], '101')
+        self.assertEqual(events[2][1]['percentage_change'], '2.97')
+
+    def test_zscore_needs_warm_up_before_flagging_outliers(self):
+        detector = ZScoreDetector()
+
+        self.assertEqual(run_detector(detector, make_ticks([100, 150])), [None, None])
+
+        events = run_detector(detector, make_ticks(alternating(40) + [101.0]))
+        self.assertTrue(all(event is None for event in events[:-1]))
+        self.assertEqual(events[-1][0], 'PRICE_ANOMALY')
+
+    def test_volatility_breakout_is_relative_to_recent_returns(self):
+        detector = VolatilityBreakoutDetector()
+        quiet = alternating(40)
+
+        self.assertIsNone(run_detector(detector, make_ticks(quiet + [100.0]))[-1])
+        self.assertEqual(run_detector(detector, make_ticks(quiet + [101.0]))[-1][0], 'VOLATILITY_BREAKOUT')
+
+    def test_volume_spike_against_the_average_volume(self):
+        detector = VolumeSpikeDetector()
+        volumes = [100] * 30
+
+        events = run_detector(detector, make_ticks([100] * 32, volumes + [400, 600]))
+
+        self.assertEqual([event and event[0] for event in events[-2:]], [None, 'VOLUME_SPIKE'])
+        self.assertEqual(events[-1][1]['ratio'], '5.22')
+
+    def test_gap_open_on_the_first_tick_of_a_new_trading_day(self):
+        detector = GapOpenDetector()
+        previous_close = make_ticks([100, 100], start=NOW - timedelta(hours=19))[-1]
+        opening = Tick(SYMBOL, Decimal('97'), NOW, None, {'price': previous_close.price, 'timestamp': previous_close.timestamp})
+        intraday = Tick(SYMBOL, Decimal('97'), NOW, None, {'price': Decimal('100'), 'timestamp': NOW - timedelta(minutes=1)})
+
+        self.assertEqual(run_detector(detector, [opening])[0][0], 'GAP_DOWN')
+        self.assertEqual(run_detector(detector, [intraday]), [None])
+        self.assertEqual(run_detector(detector, [opening], threshold=5.0), [None])
+
+
+class DetectorEngineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.googl = StockSymbol.objects.create(ticker='GOOGL', name='Google')
+        cls.amzn = StockSymbol.objects.create(ticker='AMZN', name='Amazon')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def ticks(self, symbol, prices, **kwargs):
+        return [tick._replace(symbol=symbol) for tick in make_ticks(prices, **kwargs)]
+
+    def test_returns_unsaved_events(self):
+        events = DetectorEngine().detect(self.ticks(self.googl, [100, 103]))
+
+        self.assertEqual([(event.symbol_id, event.event_type, event.pk) for event in events], [('GOOGL', 'PRICE_INCREASE', None)])
+
+    def test_state_carries_over_between_batches(self):
+        engine = DetectorEngine([ZScoreDetector()])
+        ticks = self.ticks(self.googl, alternating(40) + [101.0])
+
+        for start in range(0, 40, 7):
+            self.assertEqual(engine.detect(ticks[start:min(start + 7, 40)]), [])
+        events = engine.detect(ticks[40:])
+
+        self.assertEqual([event.event_type for event in events], ['PRICE_ANOMALY'])
+
+    def test_per_symbol_config_overrides_settings(self):
+        DetectorConfig.objects.create(symbol=self.googl, detector='threshold', threshold=5.0)
+        DetectorConfig.objects.create(symbol=self.amzn, detector='threshold', enabled=False)
+        engine = DetectorEngine([ThresholdDetector()])
+
+        with self.assertNumQueries(1):
+            events = engine.detect(self.ticks(self.googl, [100, 104, 110]) + self.ticks(self.amzn, [100, 150]))
+
+        self.assertEqual([(event.symbol_id, event.details['percentage_change']) for event in events], [('GOOGL', '5.77')])
+
+    @override_settings(SIGNAL_DETECTORS={'threshold': {'THRESHOLD': 1.0}, 'volume_spike': {'ENABLED': False}})
+    def test_settings_override_detector_defaults(self):
+        engine = DetectorEngine([ThresholdDetector(), VolumeSpikeDetector()])
+        volumes = [100] * 30 + [1000]
+
+        events = engine.detect(self.ticks(self.googl, [100] * 30 + [101.5], volumes=volumes))
+
+        self.assertEqual([event.event_type for event in events], ['PRICE_INCREASE'])
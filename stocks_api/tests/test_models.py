@@ -1,7 +1,7 @@
 from django.test import TestCase
 from django.utils import timezone
 from decimal import Decimal
-from stocks_api.models import StockSymbol, PriceUpdate, SignificantEvent
+from stocks_api.models import StockSymbol, PriceUpdate, SignificantEvent, DailyEventCount
 
 class StockSymbolModelTest(TestCase):
 
@@ -95,4 +95,35 @@ class PriceUpdateModelTest(TestCase):
 
         updates = PriceUpdate.objects.filter(symbol=self.symbol)
         self.assertEqual(updates[0].timestamp, update2_ts)
-        self.assertEqual(updates[1].timestamp, update1_ts)
\ No newline at end of file
+        self.assertEqual(updates[1].timestamp, update1_ts)
+
+class DailyEventCountModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.symbol = StockSymbol.objects.create(ticker="GOOGL", name="Google")
+
+    def test_counters_follow_event_creation_and_deletion(self):
+        event = SignificantEvent.objects.create(symbol=self.symbol, event_type='PRICE_INCREASE', details={})
+        SignificantEvent.objects.create(symbol=self.symbol, event_type='PRICE_INCREASE', details={})
+        SignificantEvent.objects.create(symbol=self.symbol, event_type='PRICE_DECREASE', details={})
+
+        counts = dict(DailyEventCount.objects.values_list('event_type', 'count'))
+        self.assertEqual(counts, {'PRICE_INCREASE': 2, 'PRICE_DECREASE': 1})
+
+        event.delete()
+        self.assertEqual(DailyEventCount.objects.get(event_type='PRICE_INCREASE').count, 1)
+
+    def test_increment_for_groups_events_by_day(self):
+        today = timezone.now()
+        events = [
+            SignificantEvent(symbol=self.symbol, event_type='PRICE_DECREASE', timestamp=today),
+            SignificantEvent(symbol=self.symbol, event_type='PRICE_DECREASE', timestamp=today),
+            SignificantEvent(symbol=self.symbol, event_type='PRICE_DECREASE', timestamp=today - timezone.timedelta(days=1)),
+        ]
+
+        DailyEventCount.increment_for(events)
+
+        self.assertEqual(
+            dict(DailyEventCount.objects.values_list('date', 'count')),
+            {timezone.localdate(today): 2, timezone.localdate(today) - timezone.timedelta(days=1): 1}
+        )
@@ -0,0 +1,170 @@
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+
+from stocks_api.services.price_store import (
+    DjangoCacheLastPriceStore,
+    FileLastPriceStore,
+    InMemoryLastPriceStore,
+    get_last_price_store,
+)
+
+NOW = datetime(2024, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+
+
+class LastPriceStoreContract:
+    """Behaviour every last price store backend must share."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_swap_returns_previous_entry(self):
+        self.assertEqual(self.store.swap('GOOGL', Decimal('100.00'), NOW), (None, True))
+
+        previous, applied = self.store.swap('GOOGL', Decimal('101.00'), NOW + timedelta(seconds=1))
+
+        self.assertTrue(applied)
+        self.assertEqual(previous, {'price': Decimal('100.00'), 'timestamp': NOW})
+        self.assertEqual(self.store.get('GOOGL')['price'], Decimal('101.00'))
+
+    def test_swap_never_replaces_newer_entry(self):
+        self.store.swap('GOOGL', Decimal('100.00'), NOW)
+
+        previous, applied = self.store.swap('GOOGL', Decimal('90.00'), NOW - timedelta(seconds=1))
+
+        self.assertFalse(applied)
+        self.assertEqual(self.store.get('GOOGL'), {'price': Decimal('100.00'), 'timestamp': NOW})
+
+    def test_compare_and_set(self):
+        entry = {'price': Decimal('100.00'), 'timestamp': NOW}
+        newer = {'price': Decimal('105.00'), 'timestamp': NOW + timedelta(seconds=1)}
+
+        self.assertTrue(self.store.compare_and_set('GOOGL', None, entry))
+        self.assertFalse(self.store.compare_and_set('GOOGL', None, newer))
+        self.assertTrue(self.store.compare_and_set('GOOGL', entry, newer))
+        self.assertEqual(self.store.get_many(['GOOGL', 'AMZN']), {'GOOGL': newer})
+
+    def test_revert_swaps_restores_previous_entries_unless_replaced(self):
+        entry = {'price': Decimal('100.00'), 'timestamp': NOW}
+        self.store.swap_many({'GOOGL': entry})
+        entries = {
+            'GOOGL': {'price': Decimal('101.00'), 'timestamp': NOW + timedelta(seconds=1)},
+            'AMZN': {'price': Decimal('200.00'), 'timestamp': NOW},
+            'MSFT': {'price': Decimal('300.00'), 'timestamp': NOW},
+        }
+        results = self.store.swap_many(entries)
+        # Another worker stores a newer MSFT price before the revert
+        self.store.swap('MSFT', Decimal('301.00'), NOW + timedelta(seconds=1))
+
+        self.store.revert_swaps(entries, results)
+
+        self.assertEqual(self.store.get('GOOGL'), entry)
+        self.assertIsNone(self.store.get('AMZN'))
+        self.assertEqual(self.store.get('MSFT')['price'], Decimal('301.00'))
+
+    def test_warm_marker(self):
+        self.assertFalse(self.store.is_warm())
+        self.store.mark_warm()
+        self.assertTrue(self.store.is_warm())
+
+    def test_concurrent_swaps_see_every_previous_price_once(self):
+        seen = []
+
+        def worker(offset):
+            for i in range(offset, 200, 4):
+                previous, applied = self.store.swap('GOOGL', Decimal(i), NOW + timedelta(seconds=i))
+                if applied and previous:
+                    seen.append(previous['timestamp'])
+
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # No two swaps ever observed the same previous price
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(self.store.get('GOOGL')['price'], Decimal(199))
+
+
+class InMemoryLastPriceStoreTest(LastPriceStoreContract, SimpleTestCase):
+
+    def make_store(self):
+        return InMemoryLastPriceStore()
+
+
+@override_settings(CACHES={'prices': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'price-store-test'}})
+class DjangoCacheLastPriceStoreTest(LastPriceStoreContract, SimpleTestCase):
+
+    def make_store(self):
+        return DjangoCacheLastPriceStore(CACHE_ALIAS='prices', KEY_PREFIX='test_prices')
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.store.cache.clear)
+
+
+class FileLastPriceStoreTest(LastPriceStoreContract, SimpleTestCase):
+
+    def make_store(self):
+        return FileLastPriceStore(PATH=self.path)
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(lambda: os.path.exists(f"{self.path}.lock") and os.remove(f"{self.path}.lock"))
+        super().setUp()
+
+    def test_entries_survive_a_new_instance(self):
+        self.store.swap('GOOGL', Decimal('100.50'), NOW)
+
+        self.store.mark_warm()
+
+        other_process_store = self.make_store()
+        self.assertEqual(other_process_store.get('GOOGL'), {'price': Decimal('100.50'), 'timestamp': NOW})
+        self.assertTrue(other_process_store.is_warm())
+
+    def test_reads_do_not_rewrite_the_file(self):
+        self.store.swap('GOOGL', Decimal('100.50'), NOW)
+        modified = os.stat(self.path).st_mtime_ns
+        inode = os.stat(self.path).st_ino
+
+        self.store.get_many(['GOOGL', 'AMZN'])
+        self.store.is_warm()
+
+        self.assertEqual((os.stat(self.path).st_mtime_ns, os.stat(self.path).st_ino), (modified, inode))
+
+    def test_invalid_file_starts_empty(self):
+        with open(self.path, 'w') as handle:
+            handle.write('{"warm": true, "prices": {"GOO')
+
+        self.assertFalse(self.store.is_warm())
+        self.store.swap('GOOGL', Decimal('100.50'), NOW)
+        self.assertEqual(self.make_store().get('GOOGL')['price'], Decimal('100.50'))
+
+
+class GetLastPriceStoreTest(SimpleTestCase):
+
+    def tearDown(self):
+        get_last_price_store.cache_clear()
+
+    @override_settings(LAST_PRICE_STORE={
+        'BACKEND': 'stocks_api.services.price_store.DjangoCacheLastPriceStore',
+        'OPTIONS': {'KEY_PREFIX': 'configured'},
+    })
+    def test_backend_is_built_from_settings(self):
+        get_last_price_store.cache_clear()
+
+        store = get_last_price_store()
+
+        self.assertIsInstance(store, DjangoCacheLastPriceStore)
+        self.assertEqual(store.key_prefix, 'configured')
+        self.assertIs(get_last_price_store(), store)
@@ -0,0 +1,128 @@
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from stocks_api.services.polygon_service import PolygonService
+from stocks_api.services.rate_limiter import BACKGROUND, INTERACTIVE, RateLimitExceeded, TokenBucketRateLimiter
+from .fake_polygon import FakePolygonServer
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rate-limiter-default'},
+    'limits': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rate-limiter-test'},
+}
+
+
+class FakeClock:
+    """Stands in for the time module in rate_limiter so waits take no real time."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TokenBucketRateLimiterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch('stocks_api.services.rate_limiter.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = TokenBucketRateLimiter(capacity=5, period=60, interactive_reserve=1, cache_alias='limits')
+        self.addCleanup(self.limiter.cache.clear)
+
+    def test_bucket_allows_a_burst_up_to_capacity_then_refills_over_the_period(self):
+        waits = [self.limiter.try_acquire(INTERACTIVE) for _ in range(6)]
+
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertAlmostEqual(waits[5], 12.0)
+        self.clock.sleep(12)
+        self.assertEqual(self.limiter.try_acquire(INTERACTIVE), 0.0)
+
+    def test_stuck_bucket_lock_is_reported_as_rate_limit_exceeded(self):
+        self.limiter.cache.add('polygon:rate_limit:lock', 'held by a dead worker', timeout=60)
+
+        with patch('stocks_api.services.locks.time', self.clock):
+            with self.assertRaises(RateLimitExceeded):
+                self.limiter.try_acquire(INTERACTIVE)
+
+    def test_background_requests_leave_the_interactive_reserve(self):
+        for _ in range(4):
+            self.assertEqual(self.limiter.try_acquire(BACKGROUND), 0.0)
+
+        self.assertGreater(self.limiter.try_acquire(BACKGROUND), 0)
+        self.assertEqual(self.limiter.try_acquire(INTERACTIVE), 0.0)
+
+    def test_background_requests_yield_while_interactive_ones_wait(self):
+        for _ in range(5):
+            self.limiter.try_acquire(INTERACTIVE)
+        self.limiter.cache.set('polygon:rate_limit:interactive_waiting', True)
+        self.clock.sleep(60)
+
+        self.assertGreater(self.limiter.try_acquire(BACKGROUND), 0)
+        self.assertEqual(self.limiter.try_acquire(INTERACTIVE), 0.0)
+
+    def test_acquire_waits_for_a_token_and_gives_up_after_the_timeout(self):
+        for _ in range(5):
+            self.limiter.acquire(INTERACTIVE, timeout=0)
+
+        self.limiter.acquire(INTERACTIVE, timeout=30)
+        self.assertAlmostEqual(self.clock.now, 1_000_012.0)
+        with self.assertRaises(RateLimitExceeded):
+            self.limiter.acquire(BACKGROUND, timeout=5)
+
+    def test_zero_capacity_disables_the_limit(self):
+        limiter = TokenBucketRateLimiter(capacity=0, cache_alias='limits')
+
+        self.assertEqual([limiter.try_acquire(BACKGROUND) for _ in range(100)], [0.0] * 100)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PolygonServiceRateLimitTest(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = patch.object(PolygonService, 'BASE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server.add_route('/v2/last/trade/GOOGL', {'status': 'OK', 'results': {'p': 1.0, 's': 1, 't': 1}})
+
+    @override_settings(POLYGON_RATE_LIMIT={
+        'CAPACITY': 2, 'PERIOD': 3600, 'INTERACTIVE_RESERVE': 0, 'INTERACTIVE_TIMEOUT': 0, 'BACKGROUND_TIMEOUT': 0,
+        'CACHE_ALIAS': 'limits',
+    })
+    def test_requests_over_quota_fail_like_request_errors_without_reaching_polygon(self):
+        service = PolygonService()
+        self.addCleanup(service.rate_limiter.cache.clear)
+
+        results = [service.get_last_trade('GOOGL') for _ in range(3)]
+
+        self.assertIsNotNone(results[0])
+        self.assertIsNone(results[2])
+        self.assertEqual(len(self.server.requests), 2)
+
+    @override_settings(POLYGON_RATE_LIMIT={
+        'CAPACITY': 5, 'PERIOD': 3600, 'INTERACTIVE_RESERVE': 0, 'INTERACTIVE_TIMEOUT': 0, 'BACKGROUND_TIMEOUT': 0,
+        'CACHE_ALIAS': 'limits',
+    })
+    def test_concurrent_workers_share_one_bucket(self):
+        services = [PolygonService(priority=BACKGROUND) for _ in range(4)]
+        self.addCleanup(services[0].rate_limiter.cache.clear)
+
+        threads = [threading.Thread(target=lambda s=s: [s.get_last_trade('GOOGL') for _ in range(3)]) for s in services]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.requests), 5)
@@ -0,0 +1,817 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest.mock import patch, MagicMock
+from decimal import Decimal
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from stocks_api.models import StockSymbol, PriceUpdate, SignificantEvent, DailyEventCount, DailyBar, DailyBarCoverage, BackfillChunk, DetectorConfig
+from stocks_api.services.backfill import PriceBackfill, chunk_ranges
+from stocks_api.services.bar_store import DailyBarStore, MARKET_TIMEZONE
+from stocks_api.services.event_stream import EventBroadcaster, stream_events
+from stocks_api.services.async_polygon_service import AsyncPolygonService
+from stocks_api.services.analysis_service import StockAnalysisService, get_analysis_service
+from stocks_api.services.polygon_service import PolygonService
+from stocks_api.services.price_store import get_last_price_store
+from .fake_polygon import FakePolygonServer
+
+# 2024-01-02T15:00:00Z in nanoseconds, the resolution Polygon uses for trade timestamps
+TRADE_TS_NS = 1704207600 * 1_000_000_000
+TRADE_DATETIME = datetime(2024, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+
+# Tests against the fake server count requests exactly, so they run without the
+# rate limiter, retries or circuit breaker unless they test those
+NO_RATE_LIMIT = {**settings.POLYGON_RATE_LIMIT, 'CAPACITY': 0}
+NO_RETRIES = {**settings.POLYGON_HTTP, 'MAX_RETRIES': 0, 'BREAKER_FAILURE_THRESHOLD': 0}
+
+
+@override_settings(POLYGON_RATE_LIMIT=NO_RATE_LIMIT, POLYGON_HTTP=NO_RETRIES)
+class PolygonServiceLastTradeTest(TestCase):
+
+    def setUp(self):
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = patch.object(PolygonService, 'BASE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = PolygonService()
+
+    def test_get_last_trade_normalizes_record(self):
+        self.server.add_route('/v2/last/trade/GOOGL', {
+            'status': 'OK',
+            'results': {'T': 'GOOGL', 'p': 151.23, 's': 100, 't': TRADE_TS_NS},
+        })
+
+        trade = self.service.get_last_trade('GOOGL')
+
+        self.assertEqual(trade, {
+            'symbol': 'GOOGL',
+            'price': Decimal('151.23'),
+            'timestamp': TRADE_DATETIME,
+            'volume': 100,
+        })
+        path, params = self.server.requests[0]
+        self.assertIn('apiKey', params)
+
+    def test_get_last_trade_returns_none_on_http_error(self):
+        self.server.add_route('/v2/last/trade/GOOGL', {'status': 'ERROR'}, status=500)
+
+        self.assertIsNone(self.service.get_last_trade('GOOGL'))
+
+    def test_get_last_trades_uses_one_snapshot_request_per_batch(self):
+        def snapshot(params):
+            return {
+                'status': 'OK',
+                'tickers': [
+                    {'ticker': ticker, 'lastTrade': {'p': 100 + i, 's': 10, 't': TRADE_TS_NS}}
+                    for i, ticker in enumerate(params['tickers'].split(','))
+                    if ticker != 'MISSING'
+                ],
+            }
+        self.server.add_route('/v2/snapshot/locale/us/markets/stocks/tickers', snapshot)
+
+        with patch.object(PolygonService, 'SNAPSHOT_BATCH_SIZE', 2):
+            trades = self.service.get_last_trades(['GOOGL', 'AMZN', 'MSFT', 'MISSING'])
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[0][1]['tickers'], 'GOOGL,AMZN')
+        self.assertEqual(set(trades), {'GOOGL', 'AMZN', 'MSFT'})
+        self.assertEqual(trades['AMZN']['price'], Decimal('101'))
+        self.assertEqual(trades['MSFT']['timestamp'], TRADE_DATETIME)
+
+    def test_get_last_trades_returns_none_on_failure(self):
+        self.server.add_route('/v2/snapshot/locale/us/markets/stocks/tickers', {'status': 'ERROR'}, status=403)
+
+        self.assertIsNone(self.service.get_last_trades(['GOOGL']))
+
+
+
+@override_settings(POLYGON_RATE_LIMIT=NO_RATE_LIMIT, POLYGON_HTTP=NO_RETRIES)
+class PolygonServiceResponseCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = patch.object(PolygonService, 'BASE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = PolygonService()
+
+    def aggregates_path(self, date_from, date_to):
+        return f'/v2/aggs/ticker/GOOGL/range/1/day/{date_from}/{date_to}'
+
+    def test_repeated_calls_are_served_from_cache(self):
+        path = self.aggregates_path('2024-01-02', '2024-01-05')
+        self.server.add_route(path, {'status': 'OK', 'resultsCount': 1, 'results': [{'c': 140.0, 't': 1704171600000}]})
+
+        first = self.service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+        second = self.service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][1]['sort'], 'asc')
+        self.assertEqual(PolygonService.get_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_ttl_depends_on_whether_range_is_closed(self):
+        today = date.today().isoformat()
+        self.server.add_route(self.aggregates_path('2024-01-02', '2024-01-05'), {'status': 'OK', 'results': [{'c': 1}]})
+        self.server.add_route(self.aggregates_path('2024-01-02', today), {'status': 'OK', 'results': [{'c': 1}]})
+        self.server.add_route(self.aggregates_path('2024-01-06', '2024-01-07'), {'status': 'OK', 'resultsCount': 0})
+
+        with patch('stocks_api.services.polygon_service.cache.set', wraps=cache.set) as cache_set:
+            self.service.get_aggregates('GOOGL', 1, 'day', '2024-01-02', '2024-01-05')
+            self.service.get_aggregates('GOOGL', 1, 'day', '2024-01-02', today)
+            self.assertEqual(self.service.get_aggregates('GOOGL', 1, 'day', '2024-01-06', '2024-01-07'), [])
+
+        ttls = [call.args[2] for call in cache_set.call_args_list]
+        self.assertEqual(ttls, [
+            settings.POLYGON_CACHE_TTL['HISTORICAL'],
+            settings.POLYGON_CACHE_TTL['RECENT'],
+            settings.POLYGON_CACHE_TTL['EMPTY'],
+        ])
+
+    def test_not_found_is_negative_cached(self):
+        self.assertIsNone(self.service.get_daily_open_close('GOOGL', '2024-01-01'))
+        self.assertIsNone(self.service.get_daily_open_close('GOOGL', '2024-01-01'))
+
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_errors_are_not_cached(self):
+        self.server.add_route('/v2/aggs/ticker/GOOGL/prev', {'status': 'ERROR'}, status=500)
+        self.assertIsNone(self.service.get_previous_close('GOOGL'))
+
+        self.server.add_route('/v2/aggs/ticker/GOOGL/prev', {'status': 'OK', 'results': [{'c': 141.5}]})
+        self.assertEqual(self.service.get_previous_close('GOOGL'), {'c': 141.5})
+        self.assertEqual(len(self.server.requests), 2)
+
+@override_settings(POLYGON_RATE_LIMIT=NO_RATE_LIMIT, POLYGON_HTTP={
+    **NO_RETRIES, 'MAX_RETRIES': 3, 'BACKOFF_BASE': 1, 'BACKOFF_MAX': 10, 'BREAKER_FAILURE_THRESHOLD': 3,
+})
+class PolygonServiceRetryTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = patch.object(PolygonService, 'BASE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        sleep_patcher = patch('stocks_api.services.polygon_service.time')
+        self.sleeps = sleep_patcher.start().sleep
+        self.addCleanup(sleep_patcher.stop)
+        self.service = PolygonService()
+        self.path = '/v2/aggs/ticker/GOOGL/prev'
+
+    def test_5xx_is_retried_with_jittered_backoff(self):
+        self.server.add_sequence(self.path, [
+            ({'status': 'ERROR'}, 503, None),
+            ({'status': 'ERROR'}, 502, None),
+            ({'status': 'OK', 'results': [{'c': 141.5}]}, 200, None),
+        ])
+
+        self.assertEqual(self.service.get_previous_close('GOOGL'), {'c': 141.5})
+        self.assertEqual(len(self.server.requests), 3)
+        first, second = [call.args[0] for call in self.sleeps.call_args_list]
+        self.assertTrue(0 <= first <= 1 and 0 <= second <= 2)
+
+    def test_429_honors_retry_after(self):
+        self.server.add_sequence(self.path, [
+            ({'status': 'ERROR'}, 429, {'Retry-After': '7'}),
+            ({'status': 'OK', 'results': [{'c': 141.5}]}, 200, None),
+        ])
+
+        self.assertEqual(self.service.get_previous_close('GOOGL'), {'c': 141.5})
+        self.sleeps.assert_called_once_with(7.0)
+
+    def test_retry_after_beyond_backoff_max_gives_up(self):
+        self.server.add_route(self.path, {'status': 'ERROR'}, status=429, headers={'Retry-After': '120'})
+
+        self.assertIsNone(self.service.get_previous_close('GOOGL'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.add_route(self.path, {'status': 'ERROR'}, status=403)
+
+        self.assertIsNone(self.service.get_previous_close('GOOGL'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_circuit_opens_after_repeated_failures_and_recovers(self):
+        self.server.add_route(self.path, {'status': 'ERROR'}, status=500)
+        self.assertIsNone(self.service.get_previous_close('GOOGL'))
+        self.assertEqual(len(self.server.requests), 3) # breaker opened on the third failure
+
+        # Open: fail fast without touching the network
+        self.assertIsNone(self.service.get_previous_close('GOOGL'))
+        self.assertEqual(len(self.server.requests), 3)
+
+        # After the reset timeout one trial request goes through and closes the circuit
+        self.server.add_route(self.path, {'status': 'OK', 'results': [{'c': 141.5}]})
+        with patch('stocks_api.services.circuit_breaker.time.time', return_value=time.time() + 60):
+            self.assertEqual(self.service.get_previous_close('GOOGL'), {'c': 141.5})
+        self.assertEqual(self.service.get_previous_close('GOOGL'), {'c': 141.5})
+        self.assertEqual(len(self.server.requests), 4) # second call served from the response cache
+
+
+@override_settings(POLYGON_RATE_LIMIT=NO_RATE_LIMIT, POLYGON_HTTP=NO_RETRIES, POLYGON_SINGLE_FLIGHT_TIMEOUT=1)
+class PolygonServiceSingleFlightTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = patch.object(PolygonService, 'BASE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = '/v2/aggs/ticker/GOOGL/range/1/day/2024-01-02/2024-01-05'
+        self.cache_key = PolygonService._cache_key(f'{self.server.url}{self.path}', {'sort': 'asc'})
+
+    def slow_aggregates(self, params):
+        threading.Event().wait(0.2)
+        return {'status': 'OK', 'results': [{'c': 140.0}]}
+
+    def test_concurrent_identical_calls_share_one_request(self):
+        self.server.add_route(self.path, self.slow_aggregates)
+        results = []
+
+        def fetch():
+            results.append(PolygonService().get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05'))
+        threads = [threading.Thread(target=fetch) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(results, [[{'c': 140.0}]] * 10)
+
+    def test_waits_for_another_workers_request_through_the_cache(self):
+        self.server.add_route(self.path, {'status': 'OK', 'results': [{'c': 1.0}]})
+        cache.add(f'{self.cache_key}:lock', True) # another worker is fetching
+        threading.Timer(0.2, cache.set, (self.cache_key, {'status': 'OK', 'results': [{'c': 140.0}]})).start()
+
+        bars = PolygonService().get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+
+        self.assertEqual(bars, [{'c': 140.0}])
+        self.assertEqual(self.server.requests, [])
+
+    def test_fetches_itself_when_the_other_worker_never_delivers(self):
+        self.server.add_route(self.path, {'status': 'OK', 'results': [{'c': 1.0}]})
+        cache.add(f'{self.cache_key}:lock', True, timeout=60)
+
+        bars = PolygonService().get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+
+        self.assertEqual(bars, [{'c': 1.0}])
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(POLYGON_RATE_LIMIT={**NO_RATE_LIMIT, 'CAPACITY': 5, 'BACKGROUND_TIMEOUT': 300}, POLYGON_HTTP={**NO_RETRIES, 'MAX_RETRIES': 2})
+    def test_lock_outlives_the_slowest_request(self):
+        self.server.add_route(self.path, {'status': 'OK', 'results': [{'c': 140.0}]})
+        service = PolygonService(priority='background')
+        lock_timeouts = []
+
+        def add(key, value, timeout=None, **kwargs):
+            if key == f'{self.cache_key}:lock':
+                lock_timeouts.append(timeout)
+            return cache_add(key, value, timeout=timeout, **kwargs)
+        cache_add = cache.add
+        with patch.object(cache, 'add', side_effect=add):
+            service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+
+        # Three attempts that may each wait 300s for a token, far beyond POLYGON_SINGLE_FLIGHT_TIMEOUT
+        self.assertEqual(lock_timeouts, [service._max_request_time()])
+        self.assertGreater(lock_timeouts[0], 3 * 300)
+        self.assertIsNone(cache.get(f'{self.cache_key}:lock'))
+
+    async def test_async_calls_on_one_event_loop_share_one_request(self):
+        self.server.add_route(self.path, self.slow_aggregates)
+        service = AsyncPolygonService()
+
+        with patch.object(AsyncPolygonService, 'BASE_URL', self.server.url):
+            results = await asyncio.gather(*(
+                service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05') for _ in range(10)
+            ))
+        await AsyncPolygonService.aclose()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(results, [[{'c': 140.0}]] * 10)
+
+    async def test_cancelled_async_leader_does_not_cancel_the_shared_request(self):
+        self.server.add_route(self.path, self.slow_aggregates)
+        service = AsyncPolygonService()
+
+        with patch.object(AsyncPolygonService, 'BASE_URL', self.server.url):
+            leader = asyncio.create_task(service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05'))
+            await asyncio.sleep(0.05)
+            waiter = asyncio.create_task(service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05'))
+            await asyncio.sleep(0.05)
+            leader.cancel() # e.g. its client disconnected
+            bars = await waiter
+        await AsyncPolygonService.aclose()
+
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(bars, [{'c': 140.0}])
+        self.assertEqual(len(self.server.requests), 1)
+
+
+@override_settings(POLYGON_RATE_LIMIT=NO_RATE_LIMIT, POLYGON_HTTP={**NO_RETRIES, 'MAX_RETRIES': 2, 'BACKOFF_BASE': 0})
+class AsyncPolygonServiceTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        for service_class in (PolygonService, AsyncPolygonService):
+            patcher = patch.object(service_class, 'BASE_URL', self.server.url)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = AsyncPolygonService()
+
+    def aggregates_path(self, ticker):
+        return f'/v2/aggs/ticker/{ticker}/range/1/day/2024-01-02/2024-01-05'
+
+    async def test_daily_aggregates_share_the_sync_response_cache(self):
+        self.server.add_route(self.aggregates_path('GOOGL'), {'status': 'OK', 'results': [{'c': 140.0, 't': 1704171600000}]})
+
+        bars = await self.service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+        await AsyncPolygonService.aclose()
+
+        self.assertEqual(bars, [{'c': 140.0, 't': 1704171600000}])
+        self.assertEqual(self.server.requests[0][1]['sort'], 'asc')
+        self.assertIn('apiKey', self.server.requests[0][1])
+        # The sync client finds the same cache entry
+        sync_bars = await sync_to_async(PolygonService().get_daily_aggregates)('GOOGL', '2024-01-02', '2024-01-05')
+        self.assertEqual(sync_bars, bars)
+        self.assertEqual(len(self.server.requests), 1)
+
+    async def test_concurrent_requests_share_one_client(self):
+        tickers = [f'T{i}' for i in range(20)]
+        for ticker in tickers:
+            self.server.add_route(self.aggregates_path(ticker), {'status': 'OK', 'results': [{'c': 1.0}]})
+
+        results = await asyncio.gather(*(self.service.get_daily_aggregates(ticker, '2024-01-02', '2024-01-05') for ticker in tickers))
+        self.assertEqual(len(AsyncPolygonService._clients), 1)
+        await AsyncPolygonService.aclose()
+
+        self.assertEqual(results, [[{'c': 1.0}]] * 20)
+        self.assertEqual(len(self.server.requests), 20)
+
+    async def test_server_errors_are_retried_then_reported_as_none(self):
+        self.server.add_sequence(self.aggregates_path('GOOGL'), [
+            ({'status': 'ERROR'}, 503, None),
+            ({'status': 'OK', 'results': [{'c': 1.0}]}, 200, None),
+        ])
+        self.server.add_route(self.aggregates_path('MSFT'), {'status': 'ERROR'}, status=500)
+
+        recovered = await self.service.get_daily_aggregates('GOOGL', '2024-01-02', '2024-01-05')
+        failed = await self.service.get_daily_aggregates('MSFT', '2024-01-02', '2024-01-05')
+        await AsyncPolygonService.aclose()
+
+        self.assertEqual(recovered, [{'c': 1.0}])
+        self.assertIsNone(failed)
+        self.assertEqual(len(self.server.requests), 5)
+
+
+class ProcessPriceBatchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.googl = StockSymbol.objects.create(ticker="GOOGL", name="Google")
+        cls.amzn = StockSymbol.objects.create(ticker="AMZN", name="Amazon")
+        cls.msft = StockSymbol.objects.create(ticker="MSFT", name="Microsoft")
+        cls.now = timezone.now()
+        PriceUpdate.objects.create(symbol=cls.googl, timestamp=cls.now - timedelta(minutes=1), price=Decimal('100.00'))
+        PriceUpdate.objects.create(symbol=cls.amzn, timestamp=cls.now - timedelta(minutes=1), price=Decimal('200.00'))
+
+    def setUp(self):
+        self.price_store = get_last_price_store()
+        self.price_store.clear()
+        # Detector state
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_batch_creates_events_and_price_updates(self):
+        service = StockAnalysisService()
+        records = [
+            {'symbol': 'GOOGL', 'price': Decimal('105.00'), 'timestamp': self.now},
+            {'symbol': 'AMZN', 'price': Decimal('201.00'), 'timestamp': self.now, 'volume': 50},
+            {'symbol': 'MSFT', 'price': Decimal('300.00'), 'timestamp': self.now},
+            {'symbol': 'UNKNOWN', 'price': Decimal('1.00'), 'timestamp': self.now},
+        ]
+
+        events = service.process_price_batch(records)
+
+        self.assertEqual([(event.symbol_id, event.event_type) for event in events], [('GOOGL', 'PRICE_INCREASE')])
+        self.assertEqual(SignificantEvent.objects.count(), 1)
+        self.assertEqual(DailyEventCount.objects.get(symbol=self.googl, event_type='PRICE_INCREASE').count, 1)
+        self.assertEqual(PriceUpdate.objects.filter(timestamp=self.now).count(), 3)
+        self.assertEqual(PriceUpdate.objects.get(symbol=self.amzn, timestamp=self.now).volume, 50)
+        self.assertEqual(self.price_store.get('MSFT')['price'], Decimal('300.00'))
+
+    def test_batch_query_count_does_not_grow_with_symbols(self):
+        service = StockAnalysisService()
+        service._ensure_warm()
+        self.price_store.clear()
+        records = [
+            {'symbol': ticker, 'price': Decimal('90.00'), 'timestamp': self.now}
+            for ticker in ('GOOGL', 'AMZN', 'MSFT')
+        ]
+
+        # symbols, last prices missing from the store, detector configs, events, rollup insert + update,
+        # price updates, plus the savepoint and its release, and indexing the alert rules on the first batch
+        with self.assertNumQueries(10):
+            events = service.process_price_batch(records)
+
+        self.assertEqual({event.symbol_id for event in events}, {'GOOGL', 'AMZN'})
+
+    def test_ticks_for_one_symbol_are_chained_in_timestamp_order(self):
+        service = StockAnalysisService()
+        records = [
+            {'symbol': 'GOOGL', 'price': Decimal('110.00'), 'timestamp': self.now + timedelta(seconds=2)},
+            {'symbol': 'GOOGL', 'price': Decimal('100.50'), 'timestamp': self.now + timedelta(seconds=1)},
+        ]
+
+        events = service.process_price_batch(records)
+
+        # 100 -> 100.50 is below the threshold, 100.50 -> 110 is not
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].details['previous_price'], '100.50')
+
+    def test_per_symbol_threshold_is_read_from_detector_config(self):
+        service = StockAnalysisService()
+        DetectorConfig.objects.create(symbol=self.googl, detector='threshold', threshold=10.0)
+        records = [
+            {'symbol': 'GOOGL', 'price': Decimal('105.00'), 'timestamp': self.now},
+            {'symbol': 'AMZN', 'price': Decimal('210.00'), 'timestamp': self.now},
+        ]
+
+        events = service.process_price_batch(records)
+
+        self.assertEqual([(event.symbol_id, event.event_type) for event in events], [('AMZN', 'PRICE_INCREASE')])
+
+    def test_stale_ticks_are_stored_but_not_analyzed(self):
+        service = StockAnalysisService()
+        self.price_store.swap('GOOGL', Decimal('100.00'), self.now)
+
+        events = service.process_price_batch([
+            {'symbol': 'GOOGL', 'price': Decimal('150.00'), 'timestamp': self.now - timedelta(seconds=30)},
+        ])
+
+        self.assertEqual(events, [])
+        self.assertEqual(self.price_store.get('GOOGL')['timestamp'], self.now)
+        self.assertTrue(PriceUpdate.objects.filter(symbol=self.googl, price=Decimal('150.00')).exists())
+
+    def test_failed_write_restores_last_prices_for_a_retry(self):
+        service = StockAnalysisService()
+        service._ensure_warm()
+        records = [{'symbol': 'GOOGL', 'price': Decimal('105.00'), 'timestamp': self.now}]
+        state_key = service.detector_engine._state_key('GOOGL')
+        detector_state = cache.get(state_key)
+
+        with patch.object(PriceUpdate, 'upsert', side_effect=RuntimeError("database is locked")):
+            with self.assertRaises(RuntimeError):
+                service.process_price_batch(records)
+        self.assertEqual(self.price_store.get('GOOGL')['price'], Decimal('100.00'))
+        self.assertEqual(cache.get(state_key), detector_state) # The detectors haven't counted the tick yet
+
+        events = service.process_price_batch(records)
+
+        self.assertEqual([event.event_type for event in events], ['PRICE_INCREASE'])
+        self.assertNotEqual(cache.get(state_key), detector_state)
+        self.assertTrue(PriceUpdate.objects.filter(symbol=self.googl, timestamp=self.now).exists())
+
+    def test_replayed_batch_is_stored_once(self):
+        service = StockAnalysisService()
+        records = [
+            {'symbol': 'GOOGL', 'price': Decimal('105.00'), 'timestamp': self.now, 'volume': 10},
+            {'symbol': 'GOOGL', 'price': Decimal('105.00'), 'timestamp': self.now, 'volume': 12},
+        ]
+
+        service.process_price_batch(records)
+        # A retried task delivers the same tick again
+        replayed = service.process_price_batch(records[1:])
+
+        self.assertEqual(replayed, [])
+        self.assertEqual(SignificantEvent.objects.count(), 1)
+        self.assertEqual(PriceUpdate.objects.filter(symbol=self.googl, timestamp=self.now).get().volume, 12)
+
+
+class PriceStoreWarmUpTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(5):
+            symbol = StockSymbol.objects.create(ticker=f"SYM{i}", name=f"Symbol {i}")
+            for minutes in range(3):
+                PriceUpdate.objects.create(symbol=symbol, timestamp=now - timedelta(minutes=minutes), price=Decimal(100 + i + minutes))
+        cls.now = now
+
+    def setUp(self):
+        self.price_store = get_last_price_store()
+        self.price_store.clear()
+
+    def test_construction_does_not_query(self):
+        with self.assertNumQueries(0):
+            StockAnalysisService()
+
+    def test_warm_up_is_a_single_query(self):
+        service = StockAnalysisService()
+
+        with self.assertNumQueries(1):
+            service._ensure_warm()
+            service._ensure_warm()
+
+        self.assertTrue(self.price_store.is_warm())
+        self.assertEqual(
+            self.price_store.get_many([f"SYM{i}" for i in range(5)]),
+            {f"SYM{i}": {'price': Decimal(100 + i), 'timestamp': self.now} for i in range(5)}
+        )
+
+    def test_warm_store_is_not_reloaded_by_new_instances(self):
+        StockAnalysisService()._ensure_warm()
+
+        with self.assertNumQueries(0):
+            StockAnalysisService()._ensure_warm()
+
+    def test_service_instance_is_shared_per_process(self):
+        self.assertIs(get_analysis_service(), get_analysis_service())
+
+
+def make_daily_aggregate(day, close):
+    midnight = datetime.combine(day, datetime.min.time(), tzinfo=MARKET_TIMEZONE)
+    return {'o': close - 1, 'h': close + 1, 'l': close - 2, 'c': close, 'v': 1000.0, 'vw': close, 'n': 10,
+            't': int(midnight.timestamp() * 1000)}
+
+
+class DailyBarStoreTest(TestCase):
+
+    def setUp(self):
+        self.polygon_service = MagicMock()
+        self.polygon_service.get_daily_aggregates.side_effect = self.fake_daily_aggregates
+        self.store = DailyBarStore(polygon_service=self.polygon_service)
+
+    @staticmethod
+    def fake_daily_aggregates(ticker, date_from, date_to):
+        # Weekdays only, like the real market calendar
+        day = date.fromisoformat(date_from)
+        aggregates = []
+        while day <= date.fromisoformat(date_to):
+            if day.weekday() < 5:
+                aggregates.append(make_daily_aggregate(day, 100.0 + day.day))
+            day += timedelta(days=1)
+        return aggregates
+
+    def test_first_request_downloads_and_second_is_served_locally(self):
+        bars = self.store.get_bars('GOOGL', date(2024, 1, 1), date(2024, 1, 14))
+
+        self.assertEqual(len(bars), 10)
+        self.assertEqual(bars[0], make_daily_aggregate(date(2024, 1, 1), 101.0))
+        self.polygon_service.get_daily_aggregates.assert_called_once_with('GOOGL', '2024-01-01', '2024-01-14')
+
+        # coverage lookup + bar query, weekends are not re-requested
+        with self.assertNumQueries(2):
+            self.assertEqual(self.store.get_bars('GOOGL', date(2024, 1, 6), date(2024, 1, 14)), bars[5:])
+        self.assertEqual(self.polygon_service.get_daily_aggregates.call_count, 1)
+
+    def test_only_missing_sub_ranges_are_downloaded(self):
+        self.store.get_bars('GOOGL', date(2024, 1, 8), date(2024, 1, 12))
+
+        self.store.get_bars('GOOGL', date(2024, 1, 1), date(2024, 1, 19))
+
+        self.assertEqual(
+            [call.args for call in self.polygon_service.get_daily_aggregates.call_args_list[1:]],
+            [('GOOGL', '2024-01-01', '2024-01-07'), ('GOOGL', '2024-01-13', '2024-01-19')]
+        )
+        self.assertEqual(list(DailyBarCoverage.objects.values_list('date_from', 'date_to')), [(date(2024, 1, 1), date(2024, 1, 19))])
+        self.assertEqual(DailyBar.objects.count(), 15)
+
+    def test_ranges_touching_today_are_refreshed(self):
+        today = date.today()
+        self.store.get_bars('GOOGL', today - timedelta(days=3), today)
+        self.store.get_bars('GOOGL', today - timedelta(days=3), today)
+
+        self.assertEqual(
+            self.polygon_service.get_daily_aggregates.call_args_list[1].args,
+            ('GOOGL', today.isoformat(), today.isoformat())
+        )
+
+    def test_empty_ranges_are_recorded_only_for_known_tickers(self):
+        self.assertEqual(self.store.get_bars('GOOGL', date(2024, 1, 6), date(2024, 1, 7)), [])
+        self.polygon_service.get_daily_aggregates.side_effect = None
+        self.polygon_service.get_daily_aggregates.return_value = []
+        self.store.get_bars('TYPO', date(2024, 1, 1), date(2024, 1, 14))
+        self.assertFalse(DailyBarCoverage.objects.exists())
+
+        self.polygon_service.get_daily_aggregates.side_effect = self.fake_daily_aggregates
+        self.store.get_bars('GOOGL', date(2024, 1, 8), date(2024, 1, 12))
+        self.store.get_bars('GOOGL', date(2024, 1, 13), date(2024, 1, 14))
+        self.store.get_bars('GOOGL', date(2024, 1, 13), date(2024, 1, 14))
+
+        self.assertEqual(
+            [call.args for call in self.polygon_service.get_daily_aggregates.call_args_list],
+            [('GOOGL', '2024-01-06', '2024-01-07'), ('TYPO', '2024-01-01', '2024-01-14'),
+             ('GOOGL', '2024-01-08', '2024-01-12'), ('GOOGL', '2024-01-13', '2024-01-14')]
+        )
+        self.assertEqual(list(DailyBarCoverage.objects.values_list('ticker', 'date_from', 'date_to')), [('GOOGL', date(2024, 1, 8), date(2024, 1, 14))])
+
+    def test_download_failure_returns_none(self):
+        self.polygon_service.get_daily_aggregates.side_effect = None
+        self.polygon_service.get_daily_aggregates.return_value = None
+
+        self.assertIsNone(self.store.get_bars('GOOGL', date(2024, 1, 1), date(2024, 1, 14)))
+        self.assertFalse(DailyBarCoverage.objects.exists())
+
+
+@override_settings(POLYGON_RATE_LIMIT=NO_RATE_LIMIT, POLYGON_HTTP=NO_RETRIES)
+class PolygonServiceAggregateBarsTest(TestCase):
+
+    def test_truncated_responses_are_continued_at_next_url(self):
+        with FakePolygonServer() as server, patch.object(PolygonService, 'BASE_URL', server.url):
+            server.add_route('/v2/aggs/ticker/GOOGL/range/1/minute/2024-01-02/2024-01-03', {
+                'status': 'OK', 'resultsCount': 1, 'results': [{'c': 1.0, 't': 1}],
+                'next_url': f'{server.url}/v2/aggs/ticker/GOOGL/range/1/minute/cursor-1',
+            })
+            server.add_route('/v2/aggs/ticker/GOOGL/range/1/minute/cursor-1', {
+                'status': 'OK', 'resultsCount': 1, 'results': [{'c': 2.0, 't': 2}],
+            })
+            server.add_route('/v2/aggs/ticker/MSFT/range/1/minute/2024-01-02/2024-01-03', {'error': 'boom'}, status=500)
+
+            bars = PolygonService().get_aggregate_bars('GOOGL', 1, 'minute', '2024-01-02', '2024-01-03')
+            failed = PolygonService().get_aggregate_bars('MSFT', 1, 'minute', '2024-01-02', '2024-01-03')
+
+        self.assertEqual(bars, [{'c': 1.0, 't': 1}, {'c': 2.0, 't': 2}])
+        self.assertIsNone(failed)
+        self.assertEqual(server.requests[0][1]['limit'], str(PolygonService.AGGREGATES_LIMIT))
+        self.assertNotIn('limit', server.requests[1][1])
+
+
+def make_minute_bars(ticker, date_from, date_to):
+    # Two bars per weekday: the open and the close of the regular session (UTC)
+    bars = []
+    day = date.fromisoformat(date_from)
+    while day <= date.fromisoformat(date_to):
+        if day.weekday() < 5:
+            for hour, minute in ((14, 30), (20, 59)):
+                start = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc).replace(hour=hour, minute=minute)
+                bars.append({'o': 100.0, 'h': 101.0, 'l': 99.0, 'c': 100.0 + day.day, 'v': 500.0, 't': int(start.timestamp() * 1000)})
+        day += timedelta(days=1)
+    return bars
+
+
+class PriceBackfillTest(TestCase):
+
+    def setUp(self):
+        StockSymbol.objects.create(ticker='GOOGL', name='Google')
+        StockSymbol.objects.create(ticker='MSFT', name='Microsoft')
+        self.polygon_service = MagicMock()
+        self.polygon_service.get_aggregate_bars.side_effect = lambda ticker, multiplier, timespan, date_from, date_to: make_minute_bars(ticker, date_from, date_to)
+        self.backfill = PriceBackfill(polygon_service=self.polygon_service, concurrency=3)
+
+    def downloaded_ranges(self):
+        return sorted(call.args[0:1] + call.args[3:] for call in self.polygon_service.get_aggregate_bars.call_args_list)
+
+    def test_chunks_are_aligned_to_a_fixed_grid(self):
+        ranges = chunk_ranges(date(2024, 1, 1), date(2024, 3, 1), 'minute')
+
+        self.assertEqual(ranges[0][0], date(2024, 1, 1))
+        self.assertEqual(ranges[-1][1], date(2024, 3, 1))
+        self.assertTrue(all((end - start).days < 30 for start, end in ranges))
+        self.assertEqual(ranges[1:], chunk_ranges(ranges[1][0], date(2024, 3, 1), 'minute'))
+
+    def test_backfill_inserts_every_bar_once(self):
+        # A price the live ingestion already stored for one of the bars
+        PriceUpdate.objects.create(symbol_id='GOOGL', timestamp=datetime(2024, 1, 2, 14, 30, tzinfo=dt_timezone.utc), price=Decimal('102.00'))
+
+        stats = self.backfill.run(['GOOGL', 'MSFT', 'NOPE'], date(2024, 1, 1), date(2024, 2, 29))
+
+        weekdays = 44 # Jan 1 - Feb 29, 2024
+        chunks = len(chunk_ranges(date(2024, 1, 1), date(2024, 2, 29), 'minute'))
+        self.assertEqual(stats, {'chunks': chunks * 2, 'done': chunks * 2, 'failed': 0, 'rows': weekdays * 4})
+        self.assertEqual(PriceUpdate.objects.count(), weekdays * 4)
+        self.assertEqual(
+            PriceUpdate.objects.get(symbol_id='MSFT', timestamp=datetime(2024, 2, 29, 20, 59, tzinfo=dt_timezone.utc)).price,
+            Decimal('129.00')
+        )
+
+        # Running it again finds every chunk done
+        self.assertEqual(self.backfill.run(['GOOGL', 'MSFT'], date(2024, 1, 1), date(2024, 2, 29))['chunks'], 0)
+        self.assertEqual(self.polygon_service.get_aggregate_bars.call_count, chunks * 2)
+
+    def test_failed_chunks_are_retried_on_the_next_run(self):
+        def flaky(ticker, multiplier, timespan, date_from, date_to):
+            if ticker == 'MSFT' and date_from == '2024-01-01':
+                return None
+            if ticker == 'GOOGL' and date_from == '2024-01-01':
+                raise RuntimeError("connection reset")
+            return make_minute_bars(ticker, date_from, date_to)
+        self.polygon_service.get_aggregate_bars.side_effect = flaky
+
+        stats = self.backfill.run(['GOOGL', 'MSFT'], date(2024, 1, 1), date(2024, 2, 29))
+
+        self.assertEqual(stats['failed'], 2)
+        failed = BackfillChunk.objects.filter(status=BackfillChunk.FAILED)
+        self.assertEqual(sorted(failed.values_list('symbol_id', 'attempts')), [('GOOGL', 1), ('MSFT', 1)])
+
+        self.polygon_service.get_aggregate_bars.reset_mock()
+        self.polygon_service.get_aggregate_bars.side_effect = lambda ticker, multiplier, timespan, date_from, date_to: make_minute_bars(ticker, date_from, date_to)
+        retry = self.backfill.run(['GOOGL', 'MSFT'], date(2024, 1, 1), date(2024, 2, 29))
+
+        self.assertEqual((retry['chunks'], retry['done']), (2, 2))
+        self.assertEqual({call.args[3] for call in self.polygon_service.get_aggregate_bars.call_args_list}, {'2024-01-01'})
+        self.assertFalse(BackfillChunk.objects.exclude(status=BackfillChunk.DONE).exists())
+        self.assertEqual(PriceUpdate.objects.count(), 44 * 4)
+
+    def test_ranges_stop_at_yesterday(self):
+        today = date.today()
+
+        self.backfill.run(['GOOGL'], today - timedelta(days=3), today + timedelta(days=3))
+
+        self.assertTrue(all(call.args[4] < today.isoformat() for call in self.polygon_service.get_aggregate_bars.call_args_list))
+
+
+@override_settings(EVENT_STREAM={
+    'POLL_INTERVAL': 0.01, 'BATCH_SIZE': 2, 'QUEUE_SIZE': 3, 'HEARTBEAT_INTERVAL': 0.05, 'RETRY_MS': 3000,
+})
+class EventStreamTest(TestCase):
+
+    def setUp(self):
+        self.googl = StockSymbol.objects.create(ticker='GOOGL', name='Google')
+        self.msft = StockSymbol.objects.create(ticker='MSFT', name='Microsoft')
+
+    def create_event(self, symbol):
+        return SignificantEvent.objects.create(symbol=symbol, event_type='PRICE_INCREASE', details={'change_percent': 3})
+
+    async def read_until(self, stream, count):
+        """Collect SSE messages (skipping retry/keepalive lines) until `count` events arrived."""
+        messages = []
+        while len(messages) < count:
+            chunk = await asyncio.wait_for(anext(stream), 2)
+            if chunk.startswith('id:'):
+                messages.append(chunk)
+        return messages
+
+    async def test_live_events_are_pushed_to_matching_subscribers_only(self):
+        stream = stream_events({'GOOGL'})
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+
+        await asyncio.sleep(0.05) # let the poller record the current newest event
+        await sync_to_async(self.create_event)(self.msft)
+        event = await sync_to_async(self.create_event)(self.googl)
+        [message] = await self.read_until(stream, 1)
+        await stream.aclose()
+
+        self.assertTrue(message.startswith(f'id: {event.id}\nevent: significant_event\n'))
+        data = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual(data['symbol']['ticker'], 'GOOGL')
+        self.assertEqual(data['details'], {'change_percent': 3})
+
+    async def test_resume_replays_missed_events_in_pages(self):
+        first = await sync_to_async(self.create_event)(self.googl)
+        missed = [await sync_to_async(self.create_event)(self.googl) for _ in range(3)]
+
+        stream = stream_events(None, last_event_id=first.id)
+        messages = await self.read_until(stream, 3)
+        await stream.aclose()
+
+        self.assertEqual([int(m.split('\n')[0][4:]) for m in messages], [event.id for event in missed])
+
+    async def test_slow_subscribers_are_dropped(self):
+        broadcaster = EventBroadcaster()
+        slow = broadcaster.subscribe()
+        picky = broadcaster.subscribe({'MSFT'})
+
+        broadcaster.publish([(i, 'GOOGL', '{}') for i in range(1, 5)])
+        broadcaster._task.cancel()
+
+        self.assertNotIn(slow, broadcaster.subscribers)
+        self.assertIsNone(slow.queue.get_nowait())
+        self.assertIn(picky, broadcaster.subscribers)
+        self.assertTrue(picky.queue.empty())
+
+    async def test_poller_failure_ends_full_streams(self):
+        broadcaster = EventBroadcaster()
+        with patch('stocks_api.services.event_stream.fetch_events_after', side_effect=RuntimeError("database is down")):
+            subscription = broadcaster.subscribe()
+            while not subscription.queue.full():
+                subscription.queue.put_nowait((1, 'GOOGL', '{}'))
+            await asyncio.wait_for(broadcaster._task, 2)
+
+        self.assertNotIn(subscription, broadcaster.subscribers)
+        self.assertIsNone(subscription.queue.get_nowait())
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+from decimal import Decimal
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from stocks_api.models import PriceUpdate, SignificantEvent, StockSymbol
+from stocks_api.services.price_store import get_last_price_store
+from stocks_api.services.stream_ingestor import PolygonStreamIngestor, normalize_stream_message
+from .fake_polygon import FakePolygonStream
+
+FAST_STREAM = {**settings.POLYGON_STREAM, 'BATCH_INTERVAL': 0.05, 'RECONNECT_MAX': 0}
+
+
+async def wait_until(condition, timeout=5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condition not reached in time")
+        await asyncio.sleep(0.01)
+
+
+async def run_until(ingestor, condition):
+    task = asyncio.create_task(ingestor.run())
+    try:
+        await wait_until(condition)
+    finally:
+        ingestor.stop()
+        await asyncio.wait_for(task, 5)
+
+
+class NormalizeStreamMessageTest(SimpleTestCase):
+
+    def test_trades_and_aggregates(self):
+        trade = normalize_stream_message({'ev': 'T', 'sym': 'GOOGL', 'p': 151.23, 's': 100, 't': 1704207600000})
+        minute = normalize_stream_message({'ev': 'AM', 'sym': 'GOOGL', 'c': 151.5, 'v': 9000, 's': 1704207540000, 'e': 1704207600000})
+
+        expected_time = datetime(2024, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(trade, {'symbol': 'GOOGL', 'price': Decimal('151.23'), 'timestamp': expected_time, 'volume': 100})
+        self.assertEqual(minute, {'symbol': 'GOOGL', 'price': Decimal('151.5'), 'timestamp': expected_time, 'volume': 9000})
+        self.assertIsNone(normalize_stream_message({'ev': 'status', 'status': 'connected'}))
+
+
+@override_settings(POLYGON_STREAM=FAST_STREAM)
+class PolygonStreamIngestorTest(TestCase):
+
+    def setUp(self):
+        get_last_price_store().clear()
+        self.addCleanup(get_last_price_store().clear)
+        StockSymbol.objects.create(ticker='GOOGL', name='Google')
+        StockSymbol.objects.create(ticker='MSFT', name='Microsoft')
+
+    async def test_recorded_ticks_are_analyzed_in_batches(self):
+        async with FakePolygonStream() as stream:
+            ingestor = PolygonStreamIngestor(url=stream.url)
+            await run_until(ingestor, lambda: ingestor.stats['ticks'] == 6 and ingestor.queue.empty())
+
+        self.assertEqual(stream.subscriptions, [{'A.GOOGL', 'A.MSFT'}])
+        self.assertEqual(await PriceUpdate.objects.acount(), 6)
+        event = await SignificantEvent.objects.aget()
+        self.assertEqual(event.symbol_id, 'GOOGL')
+        self.assertEqual(event.event_type, 'PRICE_INCREASE')
+        self.assertLessEqual(ingestor.stats['batches'], 6)
+
+    async def test_reconnects_and_resubscribes_after_a_dropped_connection(self):
+        async with FakePolygonStream(disconnect_after=2) as stream:
+            ingestor = PolygonStreamIngestor(tickers=['GOOGL', 'MSFT'], url=stream.url)
+            await run_until(ingestor, lambda: ingestor.stats['ticks'] == 6 and ingestor.queue.empty())
+
+        self.assertEqual(stream.connections, 2)
+        self.assertEqual(stream.subscriptions, [{'A.GOOGL', 'A.MSFT'}] * 2)
+        self.assertEqual(ingestor.stats['connections'], 2)
+        self.assertEqual(await PriceUpdate.objects.acount(), 6)
+
+    async def test_rejected_api_key_is_retried_without_ingesting(self):
+        async with FakePolygonStream(api_key='another-key') as stream:
+            ingestor = PolygonStreamIngestor(url=stream.url)
+            await run_until(ingestor, lambda: stream.connections >= 2)
+
+        self.assertEqual(ingestor.stats['connections'], 0)
+        self.assertEqual(stream.subscriptions, [])
+
+
+@override_settings(POLYGON_STREAM={**FAST_STREAM, 'QUEUE_SIZE': 2, 'BATCH_SIZE': 2})
+class PolygonStreamBackpressureTest(SimpleTestCase):
+
+    async def test_reader_waits_for_slow_analysis_instead_of_buffering(self):
+        release = threading.Event()
+        batches = []
+
+        def slow_batch(batch):
+            release.wait(5)
+            batches.append(len(batch))
+            return []
+        analysis_service = MagicMock(process_price_batch=MagicMock(side_effect=slow_batch))
+        messages = [{'ev': 'T', 'sym': 'GOOGL', 'p': 100 + i, 's': 1, 't': 1704207600000 + i} for i in range(20)]
+
+        async with FakePolygonStream(messages=messages) as stream:
+            ingestor = PolygonStreamIngestor(tickers=['GOOGL'], feed='T', url=stream.url, analysis_service=analysis_service)
+            task = asyncio.create_task(ingestor.run())
+            await wait_until(lambda: ingestor.queue.full())
+            await asyncio.sleep(0.1)
+
+            # One batch in analysis, a full queue, at most one tick waiting to be queued
+            self.assertLessEqual(ingestor.stats['ticks'], 2 + 2 + 1)
+            release.set()
+            await wait_until(lambda: sum(batches) == 20)
+            ingestor.stop()
+            await asyncio.wait_for(task, 5)
+
+        self.assertEqual(max(batches), 2)
+
+
+@override_settings(POLYGON_STREAM={**FAST_STREAM, 'PROCESS_RETRIES': 2})
+class PolygonStreamFailureTest(SimpleTestCase):
+
+    def messages(self, count):
+        return [{'ev': 'T', 'sym': 'GOOGL', 'p': 100 + i, 's': 1, 't': 1704207600000 + i} for i in range(count)]
+
+    def test_malformed_messages_are_skipped(self):
+        ingestor = PolygonStreamIngestor(tickers=['GOOGL'], analysis_service=MagicMock())
+
+        ticks = ingestor._ticks(json.dumps([
+            {'ev': 'T', 'sym': 'GOOGL', 'p': 'n/a', 's': 1, 't': 1704207600000},
+            'not a message',
+            {'ev': 'T', 'sym': 'GOOGL', 'p': 101, 's': 1, 't': 1704207600000},
+        ]))
+        single = ingestor._ticks(json.dumps({'ev': 'T', 'sym': 'GOOGL', 'p': 102, 's': 1, 't': 1704207600000}))
+
+        self.assertEqual([tick['price'] for tick in ticks + single], [Decimal('101'), Decimal('102')])
+        self.assertEqual(ingestor._ticks('{not json'), [])
+        self.assertEqual(ingestor.stats['skipped'], 3)
+
+    async def test_failed_batch_is_retried(self):
+        analysis_service = MagicMock(process_price_batch=MagicMock(side_effect=[OSError('database is locked'), []]))
+
+        async with FakePolygonStream(messages=self.messages(1)) as stream:
+            ingestor = PolygonStreamIngestor(tickers=['GOOGL'], feed='T', url=stream.url, analysis_service=analysis_service)
+            await run_until(ingestor, lambda: ingestor.stats['batches'] == 1)
+
+        self.assertEqual(ingestor.stats['retries'], 1)
+        first, second = analysis_service.process_price_batch.call_args_list
+        self.assertEqual(first, second)
+
+    async def test_ingestor_stops_when_a_batch_keeps_failing(self):
+        analysis_service = MagicMock(process_price_batch=MagicMock(side_effect=OSError('database is gone')))
+
+        async with FakePolygonStream(messages=self.messages(1)) as stream:
+            ingestor = PolygonStreamIngestor(tickers=['GOOGL'], feed='T', url=stream.url, analysis_service=analysis_service)
+            with self.assertRaisesMessage(OSError, 'database is gone'):
+                await asyncio.wait_for(ingestor.run(), 5)
+
+        self.assertEqual(analysis_service.process_price_batch.call_count, 3)
+        self.assertEqual(ingestor.stats['batches'], 0)
+
+    async def test_ingestor_stops_when_the_reader_dies(self):
+        ingestor = PolygonStreamIngestor(tickers=['GOOGL'], analysis_service=MagicMock())
+
+        with patch.object(ingestor, '_read_forever', side_effect=RuntimeError('reader bug')):
+            with self.assertRaisesMessage(RuntimeError, 'reader bug'):
+                await asyncio.wait_for(ingestor.run(), 5)
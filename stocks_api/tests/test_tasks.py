@@ -1,13 +1,18 @@
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from unittest.mock import patch, MagicMock
 from decimal import Decimal
 from datetime import datetime
 import pytz
+import time
 
-from stocks_api.tasks import fetch_and_process_stock_data_task
+from stocks_api.services.locks import cache_lock
+from stocks_api.tasks import INGESTION_LOCK_KEY, fetch_and_process_stock_data_task
 from stocks_api.models import StockSymbol, SignificantEvent
 
 @override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True)
+@patch('stocks_api.tasks.PolygonService')
+@patch('stocks_api.tasks.get_analysis_service')
 class FetchStockDataTaskTest(TestCase):
 
     @classmethod
@@ -15,34 +20,99 @@ class FetchStockDataTaskTest(TestCase):
         StockSymbol.objects.create(ticker="GOOGL", name="Google")
         StockSymbol.objects.create(ticker="AMZN", name="Amazon")
 
-    def test_fetch_and_process_data_success_no_event(self, MockStockAnalysisService, MockPolygonService):
+    def test_fetch_and_process_data_success_no_event(self, mock_get_analysis_service, MockPolygonService):
         mock_polygon_instance = MockPolygonService.return_value
-        mock_polygon_instance.get_last_trade.side_effect = [
-            {'symbol': 'GOOGL', 'price': Decimal('150.00'), 'timestamp': datetime.now(pytz.utc)},
-            {'symbol': 'AMZN', 'price': Decimal('120.00'), 'timestamp': datetime.now(pytz.utc)},
-        ]
+        mock_polygon_instance.SNAPSHOT_BATCH_SIZE = 250
+        trades = {
+            'GOOGL': {'symbol': 'GOOGL', 'price': Decimal('150.00'), 'timestamp': datetime.now(pytz.utc)},
+            'AMZN': {'symbol': 'AMZN', 'price': Decimal('120.00'), 'timestamp': datetime.now(pytz.utc)},
+        }
+        mock_polygon_instance.get_last_trades.return_value = trades
 
-
-        mock_analysis_instance = MockStockAnalysisService.return_value
-        mock_analysis_instance.process_new_price_data.return_value = None
+        mock_analysis_instance = mock_get_analysis_service.return_value
+        mock_analysis_instance.process_price_batch.return_value = []
 
         # --- Execute Task ---
-        result_summary = fetch_and_process_stock_data_task.delay(ticker_symbols=['GOOGL', 'AMZN'])
+        result_summary = fetch_and_process_stock_data_task(ticker_symbols=['GOOGL', 'AMZN'])
 
         # --- Assertions ---
-        self.assertEqual(mock_polygon_instance.get_last_trade.call_count, 2)
-        mock_polygon_instance.get_last_trade.assert_any_call('GOOGL')
-        mock_polygon_instance.get_last_trade.assert_any_call('AMZN')
-
-        self.assertEqual(mock_analysis_instance.process_new_price_data.call_count, 2)
+        # One snapshot request covers the whole watchlist
+        mock_polygon_instance.get_last_trades.assert_called_once_with(['GOOGL', 'AMZN'])
+        mock_polygon_instance.get_last_trade.assert_not_called()
 
-        mock_analysis_instance.process_new_price_data.assert_any_call(
-            symbol_ticker='GOOGL',
-            current_price=Decimal('150.00'),
-            current_timestamp=mock_polygon_instance.get_last_trade.side_effect[0]['timestamp']
-        )
+        # Both prices are handed to the analysis stage as one batch
+        mock_analysis_instance.process_price_batch.assert_called_once()
+        records = mock_analysis_instance.process_price_batch.call_args.args[0]
+        self.assertEqual([record['symbol'] for record in records], ['GOOGL', 'AMZN'])
+        self.assertEqual(records[0]['price'], Decimal('150.00'))
+        self.assertEqual(records[0]['timestamp'], trades['GOOGL']['timestamp'])
 
         # Check that no SignificantEvent was created
         self.assertEqual(SignificantEvent.objects.count(), 0)
         self.assertIn("No significant event for GOOGL", result_summary)
-        self.assertIn("No significant event for AMZN", result_summary)
\ No newline at end of file
+        self.assertIn("No significant event for AMZN", result_summary)
+
+    def test_snapshot_failure_falls_back_to_isolated_per_ticker_fetch(self, mock_get_analysis_service, MockPolygonService):
+        mock_polygon_instance = MockPolygonService.return_value
+        mock_polygon_instance.SNAPSHOT_BATCH_SIZE = 250
+        mock_polygon_instance.get_last_trades.return_value = None
+
+        def get_last_trade(ticker):
+            if ticker == 'AMZN':
+                raise RuntimeError("connection reset")
+            return {'symbol': ticker, 'price': Decimal('150.00'), 'timestamp': datetime.now(pytz.utc)}
+
+        mock_polygon_instance.get_last_trade.side_effect = get_last_trade
+        mock_event = MagicMock(symbol_id='GOOGL', event_type='PRICE_INCREASE')
+        mock_get_analysis_service.return_value.process_price_batch.return_value = [mock_event]
+
+        result_summary = fetch_and_process_stock_data_task(ticker_symbols=['GOOGL', 'AMZN'], concurrency=2)
+
+        self.assertEqual(mock_polygon_instance.get_last_trade.call_count, 2)
+        records = mock_get_analysis_service.return_value.process_price_batch.call_args.args[0]
+        self.assertEqual([record['symbol'] for record in records], ['GOOGL'])
+        self.assertIn("Event for GOOGL: PRICE_INCREASE", result_summary)
+        self.assertIn("Error fetching AMZN", result_summary)
+        self.assertIn("Processed 2 symbols in", result_summary)
+        self.assertIn("concurrency 2", result_summary)
+
+    def test_defaults_to_all_symbols_in_db(self, mock_get_analysis_service, MockPolygonService):
+        MockPolygonService.return_value.SNAPSHOT_BATCH_SIZE = 1
+        MockPolygonService.return_value.get_last_trades.return_value = {}
+
+        result_summary = fetch_and_process_stock_data_task()
+
+        # A batch size of one splits the watchlist into one snapshot request per symbol
+        self.assertEqual(MockPolygonService.return_value.get_last_trades.call_count, 2)
+        self.assertIn("No data for GOOGL", result_summary)
+        self.assertIn("No data for AMZN", result_summary)
+
+    def test_overlapping_run_is_skipped(self, mock_get_analysis_service, MockPolygonService):
+        with cache_lock(cache, INGESTION_LOCK_KEY):
+            result_summary = fetch_and_process_stock_data_task(ticker_symbols=['GOOGL'])
+
+        self.assertEqual(result_summary, "Skipped, another run is in progress.")
+        MockPolygonService.return_value.get_last_trades.assert_not_called()
+
+        # The lock is released once the run holding it finishes
+        MockPolygonService.return_value.SNAPSHOT_BATCH_SIZE = 250
+        MockPolygonService.return_value.get_last_trades.return_value = {}
+        self.assertIn("No data for GOOGL", fetch_and_process_stock_data_task(ticker_symbols=['GOOGL']))
+        self.assertIsNone(cache.get(INGESTION_LOCK_KEY))
+
+    @override_settings(INGESTION_LOCK_TIMEOUT=1)
+    def test_lock_is_kept_for_runs_longer_than_its_timeout(self, mock_get_analysis_service, MockPolygonService):
+        overlapping = []
+
+        def slow_fetch(batch):
+            if batch == ['AMZN']:
+                time.sleep(1.5) # e.g. waiting for rate limit tokens
+                overlapping.append(fetch_and_process_stock_data_task(ticker_symbols=['GOOGL']))
+            return {}
+        MockPolygonService.return_value.SNAPSHOT_BATCH_SIZE = 250
+        MockPolygonService.return_value.get_last_trades.side_effect = slow_fetch
+
+        fetch_and_process_stock_data_task(ticker_symbols=['AMZN'])
+
+        self.assertEqual(overlapping, ["Skipped, another run is in progress."])
+        self.assertIsNone(cache.get(INGESTION_LOCK_KEY))
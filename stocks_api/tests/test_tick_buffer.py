@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from stocks_api.models import PriceUpdate, StockSymbol
+from stocks_api.services.analysis_service import StockAnalysisService
+from stocks_api.services.tick_buffer import NO_VOLUME, TickBuffer, TickRing, from_epoch_us, get_tick_buffer, to_epoch_us
+
+NOW = datetime(2024, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+
+
+class TickRingTest(SimpleTestCase):
+
+    def test_wraps_around_and_reads_in_order(self):
+        ring = TickRing(4)
+        for start in range(0, 6, 2):
+            ring.extend(np.arange(start, start + 2), np.arange(start, start + 2) * 1.5, np.arange(start, start + 2))
+
+        timestamps, prices, volumes = ring.window()
+
+        self.assertEqual(timestamps.tolist(), [2, 3, 4, 5])
+        self.assertEqual(prices.tolist(), [3.0, 4.5, 6.0, 7.5])
+        self.assertEqual(ring.newest, 5)
+
+    def test_windows_are_slices_by_time_and_count(self):
+        ring = TickRing(8)
+        ring.extend(np.arange(10, 20), np.arange(10, 20, dtype=float), np.zeros(10))
+
+        self.assertEqual(ring.window(since=15)[0].tolist(), [15, 16, 17, 18, 19])
+        self.assertEqual(ring.window(limit=3)[0].tolist(), [17, 18, 19])
+        self.assertEqual(ring.window(since=18, limit=5)[0].tolist(), [18, 19])
+
+    def test_ticks_older_than_the_newest_are_dropped(self):
+        ring = TickRing(4)
+        ring.extend([5], [1.0], [0])
+
+        ring.extend([3, 5, 6], [2.0, 3.0, 4.0], [0, 0, 0])
+
+        self.assertEqual(ring.window()[0].tolist(), [5, 6])
+        self.assertEqual(ring.window()[1].tolist(), [1.0, 4.0])
+
+    def test_epoch_microseconds_round_trip(self):
+        timestamp = NOW + timedelta(microseconds=123457)
+        self.assertEqual(from_epoch_us(to_epoch_us(timestamp)), timestamp)
+
+
+class TickBufferLoadTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.googl = StockSymbol.objects.create(ticker='GOOGL', name='Google')
+        cls.msft = StockSymbol.objects.create(ticker='MSFT', name='Microsoft')
+        PriceUpdate.objects.bulk_create(
+            [PriceUpdate(symbol=cls.googl, timestamp=NOW + timedelta(seconds=i), price=100 + i, volume=10) for i in range(6)]
+            + [PriceUpdate(symbol=cls.msft, timestamp=NOW, price=300)]
+        )
+
+    def setUp(self):
+        self.buffer = TickBuffer(4)
+
+    def test_warm_up_loads_the_last_rows_of_every_symbol_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.load(), 5)
+
+        self.assertTrue(self.buffer.is_warm())
+        timestamps, prices, volumes = self.buffer.window('GOOGL')
+        self.assertEqual(prices.tolist(), [102.0, 103.0, 104.0, 105.0])
+        self.assertEqual(from_epoch_us(timestamps[-1]), NOW + timedelta(seconds=5))
+        self.assertEqual(self.buffer.window('MSFT')[2].tolist(), [NO_VOLUME])
+        self.assertEqual(self.buffer.latest(['MSFT', 'AMZN']), {'MSFT': {'price': 300.0, 'timestamp': NOW}})
+
+    def test_catching_up_reads_only_newer_rows(self):
+        self.buffer.load(['GOOGL'])
+        PriceUpdate.objects.create(symbol=self.googl, timestamp=NOW + timedelta(seconds=6), price=Decimal('106.50'))
+
+        self.assertEqual(self.buffer.load(['GOOGL']), 1)
+
+        self.assertEqual(self.buffer.window('GOOGL', limit=2)[1].tolist(), [105.0, 106.5])
+        self.assertEqual(len(self.buffer.window('MSFT')[0]), 0)
+
+
+class RecentTicksAnalysisTest(TestCase):
+
+    def setUp(self):
+        get_tick_buffer().clear()
+        self.addCleanup(get_tick_buffer().clear)
+        StockSymbol.objects.create(ticker='GOOGL', name='Google')
+
+    def test_ingested_ticks_are_read_back_with_window_statistics(self):
+        service = StockAnalysisService()
+        service.process_price_batch([
+            {'symbol': 'GOOGL', 'price': Decimal('100.00'), 'timestamp': NOW, 'volume': 10},
+            {'symbol': 'GOOGL', 'price': Decimal('110.00'), 'timestamp': NOW + timedelta(seconds=1), 'volume': 30},
+            {'symbol': 'GOOGL', 'price': Decimal('105.00'), 'timestamp': NOW + timedelta(seconds=2)},
+        ])
+
+        # Served from the buffer: only the catch-up query for newer rows hits the database
+        with self.assertNumQueries(1):
+            recent = service.get_recent_ticks('GOOGL')
+
+        self.assertEqual(recent['count'], 3)
+        self.assertEqual(recent['series']['price'], [100.0, 110.0, 105.0])
+        self.assertEqual(recent['series']['volume'], [10, 30, None])
+        self.assertEqual(recent['series']['timestamp'][0], '2024-01-02T15:00:00.000000Z')
+        self.assertEqual(recent['stats']['change_percent'], 5.0)
+        self.assertEqual(recent['stats']['vwap'], 107.5)
+        self.assertEqual(service.get_recent_ticks('GOOGL', limit=1)['series']['price'], [105.0])
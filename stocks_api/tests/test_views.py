@@ -4,9 +4,21 @@ from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
+import json
+from datetime import date, timedelta
+from unittest.mock import patch
 from .factories import StockSymbolFactory, SignificantEventFactory
+from .fake_polygon import FakePolygonServer
+from stocks_api.models import Alert, AlertRule, DailyBar, PriceUpdate, SignificantEvent, StockSymbol
+from stocks_api.pagination import TimestampKeysetPagination
+from stocks_api.services.analysis_service import get_analysis_service
+from stocks_api.services.async_polygon_service import AsyncPolygonService
+from stocks_api.services.tick_buffer import get_tick_buffer
 from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import AccessToken
 
 class SignificantEventAPITests(APITestCase):
     def setUp(self):
@@ -210,3 +222,531 @@ class SignificantEventAPITests(APITestCase):
         url = reverse('significant-event-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class EventSummaryAPITests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        googl = StockSymbolFactory(ticker='GOOGL', name='Google')
+        msft = StockSymbolFactory(ticker='MSFT', name='Microsoft')
+        StockSymbolFactory(ticker='AMZN', name='Amazon') # No events
+        SignificantEventFactory.create_batch(3, symbol=googl, event_type='PRICE_INCREASE')
+        SignificantEventFactory(symbol=googl, event_type='PRICE_DECREASE')
+        SignificantEventFactory.create_batch(2, symbol=msft, event_type='PRICE_DECREASE')
+
+    def test_summary_shape(self):
+        response = self.client.get(reverse('event-summary'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'period_days': 7,
+            'total_events': 6,
+            'increases': 3,
+            'decreases': 3,
+            'by_symbol': {
+                'GOOGL': {'total': 4, 'increases': 3, 'decreases': 1},
+                'MSFT': {'total': 2, 'increases': 0, 'decreases': 2},
+            },
+        })
+
+    def test_summary_breakdowns(self):
+        response = self.client.get(reverse('event-summary') + '?daily=true&top=1')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        today = timezone.now().date().isoformat()
+        self.assertEqual(response.data['by_day'], {today: {'total': 6, 'increases': 3, 'decreases': 3}})
+        self.assertEqual(response.data['top_movers'], [{'ticker': 'GOOGL', 'total': 4, 'increases': 3, 'decreases': 1}])
+
+    def test_summary_query_count_is_independent_of_symbols(self):
+        StockSymbolFactory.create_batch(20)
+
+        with self.assertNumQueries(1):
+            get_analysis_service().get_significant_events_summary(days=365, include_daily=True, top_n=3)
+
+        # Served from the cache until the TTL expires
+        with self.assertNumQueries(0):
+            get_analysis_service().get_significant_events_summary(days=365, include_daily=True, top_n=3)
+
+
+class DailyAggregatesAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    @patch('stocks_api.views.DailyBarStore')
+    def test_reads_through_bar_store(self, MockDailyBarStore):
+        MockDailyBarStore.return_value.get_bars.return_value = [{'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5, 'v': 100, 't': 1704171600000}]
+
+        response = self.client.get(reverse('daily-aggregates') + '?symbol=googl&date_from=2024-01-02&date_to=2024-01-05')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['c'], 1.5)
+        MockDailyBarStore.return_value.get_bars.assert_called_once_with('GOOGL', date(2024, 1, 2), date(2024, 1, 5))
+
+    @patch('stocks_api.views.DailyBarStore')
+    def test_download_failure_is_503(self, MockDailyBarStore):
+        MockDailyBarStore.return_value.get_bars.return_value = None
+
+        response = self.client.get(reverse('daily-aggregates') + '?symbol=GOOGL')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@override_settings(
+    POLYGON_RATE_LIMIT={**settings.POLYGON_RATE_LIMIT, 'CAPACITY': 0},
+    POLYGON_HTTP={**settings.POLYGON_HTTP, 'MAX_RETRIES': 0, 'BREAKER_FAILURE_THRESHOLD': 0},
+)
+class AsyncDailyAggregatesAPITests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.server = FakePolygonServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = patch.object(AsyncPolygonService, 'BASE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_downloads_through_the_async_client_and_stores_bars(self):
+        self.server.add_route('/v2/aggs/ticker/GOOGL/range/1/day/2024-01-02/2024-01-05', {
+            'status': 'OK', 'results': [{'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5, 'v': 100, 't': 1704171600000}],
+        })
+        url = reverse('async-daily-aggregates') + '?symbol=googl&date_from=2024-01-02&date_to=2024-01-05'
+
+        response = self.client.get(url)
+        again = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['c'], 1.5)
+        self.assertEqual(again.json(), response.json())
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(DailyBar.objects.filter(ticker='GOOGL', date=date(2024, 1, 2)).exists())
+
+    def test_download_failure_is_503(self):
+        self.server.add_route('/v2/aggs/ticker/GOOGL/range/1/day/2024-01-02/2024-01-05', {'status': 'ERROR'}, status=500)
+
+        with self.assertLogs('stocks_api.services.async_polygon_service', 'ERROR') as logs:
+            response = self.client.get(reverse('async-daily-aggregates') + '?symbol=GOOGL&date_from=2024-01-02&date_to=2024-01-05')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('HTTP 500', logs.output[0])
+        self.assertNotIn('apiKey', '\n'.join(logs.output))
+
+    def test_requires_authentication_and_valid_dates(self):
+        url = reverse('async-daily-aggregates')
+        self.assertEqual(self.client.get(url + '?symbol=GOOGL&date_from=2024-13-01').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.credentials()
+        self.assertEqual(self.client.get(url + '?symbol=GOOGL').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get(url + '?symbol=GOOGL').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(EVENT_STREAM={**settings.EVENT_STREAM, 'POLL_INTERVAL': 0.01})
+class SignificantEventStreamAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.token = str(AccessToken.for_user(self.user))
+        self.symbol = StockSymbolFactory(ticker='GOOGL', name='Google')
+
+    async def open_stream(self, query='', **headers):
+        response = await self.async_client.get(reverse('event-stream') + query, headers=headers)
+        if response.status_code == status.HTTP_200_OK:
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(await anext(response.streaming_content), b'retry: 3000\n\n')
+        return response
+
+    async def test_streams_events_after_last_event_id(self):
+        missed = await sync_to_async(SignificantEventFactory)(symbol=self.symbol)
+
+        response = await self.open_stream('?symbols=googl', Authorization=f'Bearer {self.token}', **{'Last-Event-ID': str(missed.id - 1)})
+        message = await anext(response.streaming_content)
+
+        self.assertTrue(message.startswith(f'id: {missed.id}\n'.encode()))
+
+    async def test_accepts_token_query_parameter_for_event_source(self):
+        response = await self.open_stream(f'?token={self.token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get(reverse('event-stream') + f'?token={self.token}')
+
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_requires_authentication(self):
+        self.assertEqual((await self.open_stream()).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual((await self.open_stream('?token=bad')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AggregateAnalyticsAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    @patch('stocks_api.views.DailyBarStore')
+    def test_analyzes_each_symbol(self, MockDailyBarStore):
+        bars = {
+            'GOOGL': [{'t': 1704171600000, 'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5, 'v': 100}],
+            'MSFT': None,
+        }
+        MockDailyBarStore.return_value.get_bars.side_effect = lambda ticker, date_from, date_to: bars[ticker]
+
+        response = self.client.get(reverse('aggregate-analytics') + '?symbols=googl, MSFT&window=5')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results']['GOOGL']['close']['mean'], 1.5)
+        self.assertIn('error', response.data['results']['MSFT'])
+        self.assertEqual(response.data['window'], 5)
+
+    @patch('stocks_api.views.DailyBarStore')
+    def test_intraday_bars_are_downloaded_in_full(self, MockDailyBarStore):
+        polygon_service = MockDailyBarStore.return_value.polygon_service
+        polygon_service.get_aggregate_bars.return_value = [
+            {'t': 1704171600000 + minute * 60000, 'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5, 'v': 100} for minute in range(3)
+        ]
+
+        response = self.client.get(reverse('aggregate-analytics') + '?symbols=GOOGL&timespan=minute&date_from=2024-01-02&date_to=2024-01-02')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results']['GOOGL']['count'], 3)
+        polygon_service.get_aggregate_bars.assert_called_once_with('GOOGL', 1, 'minute', '2024-01-02', '2024-01-02')
+        polygon_service.get_aggregates.assert_not_called()
+
+    @patch('stocks_api.views.DailyBarStore')
+    def test_upstream_failure_is_503(self, MockDailyBarStore):
+        MockDailyBarStore.return_value.polygon_service.get_aggregate_bars.return_value = None
+
+        response = self.client.get(reverse('aggregate-analytics') + '?symbols=GOOGL,MSFT&timespan=hour')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('error', response.data['results']['GOOGL'])
+
+    def test_requires_symbols(self):
+        response = self.client.get(reverse('aggregate-analytics'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_unknown_timespan(self):
+        response = self.client.get(reverse('aggregate-analytics') + '?symbols=GOOGL&timespan=week')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceHistoryKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        symbol = StockSymbolFactory(ticker='GOOGL', name='Google')
+        start = timezone.now() - timedelta(hours=1)
+        self.updates = [
+            PriceUpdate.objects.create(symbol=symbol, timestamp=start + timedelta(minutes=i), price=100 + i)
+            for i in range(7)
+        ]
+        self.url = reverse('price-history-list') + '?symbol__ticker=GOOGL'
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids, response
+
+    def test_next_links_visit_every_row_once_in_order(self):
+        ids, last_response = self.walk(self.url + '&page_size=3')
+
+        self.assertEqual(ids, [update.id for update in self.updates])
+        self.assertEqual(last_response.data['count'], 7)
+
+    def test_descending_order_and_previous_link(self):
+        response = self.client.get(self.url + '&page_size=3&ordering=-timestamp')
+        second_page = self.client.get(response.data['next'])
+        back = self.client.get(second_page.data['previous'])
+
+        expected = [update.id for update in reversed(self.updates)]
+        self.assertEqual([row['id'] for row in second_page.data['results']], expected[3:6])
+        self.assertEqual([row['id'] for row in back.data['results']], expected[:3])
+        self.assertIsNone(back.data['previous'])
+
+    def test_count_can_be_skipped(self):
+        response = self.client.get(self.url + '&count=false')
+
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_page_size_is_capped(self):
+        with patch.object(TimestampKeysetPagination, 'max_page_size', 2):
+            response = self.client.get(self.url + '&page_size=500')
+
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_page_number_requests_still_work(self):
+        response = self.client.get(self.url + '&page=1&page_size=3')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(self.url + '&cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rows_sharing_a_timestamp_are_ordered_by_id(self):
+        # Price updates are unique per timestamp, events are not
+        symbol = StockSymbol.objects.get(ticker='GOOGL')
+        events = [SignificantEventFactory(symbol=symbol) for _ in range(5)]
+        start = timezone.now() - timedelta(hours=1)
+        for i, event in enumerate(events):
+            SignificantEvent.objects.filter(pk=event.pk).update(timestamp=start + timedelta(minutes=i // 2))
+
+        ids, _ = self.walk(reverse('significant-event-list') + '?page_size=2&ordering=timestamp')
+
+        self.assertEqual(ids, [event.id for event in events])
+
+class PriceExportAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        googl = StockSymbolFactory(ticker='GOOGL', name='Google')
+        msft = StockSymbolFactory(ticker='MSFT', name='Microsoft')
+        StockSymbolFactory(ticker='AAPL', name='Apple')
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        for i in range(5):
+            PriceUpdate.objects.create(symbol=googl, timestamp=self.start + timedelta(minutes=i), price=100 + i, volume=10 * i)
+        PriceUpdate.objects.create(symbol=msft, timestamp=self.start, price=300, volume=None)
+        self.url = reverse('price-export')
+
+    def export(self, query):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(PRICE_EXPORT_CHUNK_SIZE=2)
+    def test_csv_export_streams_every_row_in_symbol_and_time_order(self):
+        lines = self.export('?symbols=msft,GOOGL').splitlines()
+
+        self.assertEqual(lines[0], 'symbol,timestamp,price,volume')
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[1], f'GOOGL,{self.start.isoformat()},100.00,0')
+        self.assertEqual(lines[-1], f'MSFT,{self.start.isoformat()},300.00,')
+
+    def test_ndjson_export_filters_by_time_range(self):
+        query = f'?symbols=GOOGL&output=ndjson&timestamp__gte={(self.start + timedelta(minutes=3)).isoformat()}'
+        rows = [json.loads(line) for line in self.export(query.replace('+', '%2B')).splitlines()]
+
+        self.assertEqual([row['price'] for row in rows], ['103.00', '104.00'])
+        self.assertEqual(rows[0]['volume'], 30)
+
+    def test_date_only_and_naive_timestamps_are_read_as_utc(self):
+        day = self.start.date()
+        naive = (self.start + timedelta(minutes=3)).replace(tzinfo=None).isoformat()
+
+        self.assertEqual(len(self.export(f'?symbols=GOOGL&timestamp__gte={day - timedelta(days=1)}').splitlines()), 6)
+        self.assertEqual(len(self.export(f'?symbols=GOOGL&timestamp__gte={day + timedelta(days=1)}').splitlines()), 1)
+        self.assertEqual(len(self.export(f'?symbols=GOOGL&timestamp__lte={day - timedelta(days=1)}').splitlines()), 1)
+        self.assertEqual(len(self.export(f'?symbols=GOOGL&timestamp__gte={naive}').splitlines()), 3)
+
+    @override_settings(PRICE_EXPORT_CHUNK_SIZE=2)
+    def test_columnar_export_emits_one_batch_per_chunk(self):
+        batches = [json.loads(line) for line in self.export('?symbols=GOOGL&output=columnar').splitlines()]
+
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(batches[0]['price'], ['100.00', '101.00'])
+        self.assertEqual(sum(len(batch['symbol']) for batch in batches), 5)
+
+    def test_requires_symbols_and_known_output(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url + '?symbols=GOOGL&output=xml').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url + '?symbols=GOOGL&timestamp__gte=yesterday').status_code, status.HTTP_400_BAD_REQUEST)
+
+class CompactListAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        self.symbol = StockSymbolFactory(ticker='GOOGL', name='Google')
+        start = timezone.now() - timedelta(hours=1)
+        self.updates = [
+            PriceUpdate.objects.create(symbol=self.symbol, timestamp=start + timedelta(minutes=i), price=100 + i, volume=i)
+            for i in range(5)
+        ]
+
+    def test_price_history_rows_match_the_regular_serializer(self):
+        url = reverse('price-history-compact') + '?symbol__ticker=GOOGL'
+        compact = self.client.get(url).data
+        regular = self.client.get(reverse('price-history-list') + '?symbol__ticker=GOOGL').data
+
+        self.assertEqual(compact['columns'], ['id', 'symbol', 'timestamp', 'price', 'volume'])
+        self.assertEqual(compact['count'], 5)
+        first = dict(zip(compact['columns'], compact['results'][0]))
+        expected = regular['results'][0]
+        self.assertEqual(first['id'], expected['id'])
+        self.assertEqual(first['symbol'], expected['symbol']['ticker'])
+        self.assertEqual(first['price'], expected['price'])
+        self.assertEqual(first['volume'], expected['volume'])
+
+    def test_compact_route_keeps_keyset_pagination(self):
+        url = reverse('price-history-compact') + '?symbol__ticker=GOOGL&page_size=2'
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids.extend(row[0] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(ids, [update.id for update in self.updates])
+
+    def test_columnar_layout_and_event_filters(self):
+        SignificantEventFactory(symbol=self.symbol, event_type='PRICE_INCREASE')
+        SignificantEventFactory(symbol=self.symbol, event_type='PRICE_DECREASE')
+        response = self.client.get(reverse('significant-event-compact') + '?event_type=PRICE_INCREASE&columnar=true')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results']['symbol'], ['GOOGL'])
+        self.assertEqual(response.data['results']['event_type'], ['PRICE_INCREASE'])
+
+class PriceHistoryBarsAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        symbol = StockSymbolFactory(ticker='GOOGL', name='Google')
+        other = StockSymbolFactory(ticker='MSFT', name='Microsoft')
+        self.start = timezone.now().replace(hour=14, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        # Two hours of one tick per minute; the price climbs during the first hour and falls during the second
+        PriceUpdate.objects.bulk_create([
+            PriceUpdate(symbol=symbol, timestamp=self.start + timedelta(minutes=i), price=100 + (i if i < 60 else 120 - i), volume=10)
+            for i in range(120)
+        ] + [PriceUpdate(symbol=other, timestamp=self.start, price=300, volume=10)])
+        self.url = reverse('price-history-bars') + '?symbol__ticker=GOOGL'
+
+    def test_hourly_ohlcv_buckets(self):
+        response = self.client.get(self.url + '&interval=1h')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tick_count'], 120)
+        self.assertEqual(response.data['columns'], ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'count'])
+        first, second = response.data['results']
+        self.assertEqual(first[0], self.start.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        self.assertEqual(first[1:], [100.0, 159.0, 100.0, 159.0, 600.0, 60])
+        self.assertEqual(second[1:], [160.0, 160.0, 101.0, 101.0, 600.0, 60])
+
+    def test_lttb_points_and_time_filter(self):
+        timestamp_lte = (self.start + timedelta(minutes=89)).isoformat().replace('+00:00', 'Z')
+        response = self.client.get(reverse('price-history-bars'), {'symbol__ticker': 'GOOGL', 'points': 5, 'timestamp__lte': timestamp_lte, 'columnar': 'true'})
+
+        self.assertEqual(response.data['tick_count'], 90)
+        self.assertEqual(response.data['count'], 5)
+        prices = response.data['results']['price']
+        self.assertEqual(prices[0], 100.0)
+        self.assertEqual(prices[-1], 131.0)
+        self.assertIn(160.0, prices) # The peak survives downsampling
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url + '&interval=7m').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url + '&points=2').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url + '&points=many').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_a_symbol_and_a_bound(self):
+        self.assertEqual(self.client.get(reverse('price-history-bars') + '?interval=1h').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+        timestamp_gte = (self.start + timedelta(minutes=110)).isoformat().replace('+00:00', 'Z')
+        response = self.client.get(reverse('price-history-bars'), {'symbol__ticker': 'GOOGL', 'timestamp__gte': timestamp_gte})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 10)
+
+class RecentTicksAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        get_tick_buffer().clear()
+        self.addCleanup(get_tick_buffer().clear)
+        symbol = StockSymbolFactory(ticker='GOOGL', name='Google')
+        now = timezone.now()
+        PriceUpdate.objects.create(symbol=symbol, timestamp=now - timedelta(hours=1), price=90)
+        PriceUpdate.objects.create(symbol=symbol, timestamp=now - timedelta(seconds=30), price=100, volume=5)
+        PriceUpdate.objects.create(symbol=symbol, timestamp=now - timedelta(seconds=10), price=101, volume=5)
+
+    def test_recent_window_from_the_buffer(self):
+        response = self.client.get(reverse('recent-ticks'), {'symbol': 'googl', 'seconds': 60})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['symbol'], 'GOOGL')
+        self.assertEqual(response.data['series']['price'], [100.0, 101.0])
+        self.assertEqual(response.data['stats']['vwap'], 100.5)
+
+    def test_limit_and_validation(self):
+        self.assertEqual(self.client.get(reverse('recent-ticks'), {'symbol': 'GOOGL', 'limit': 1}).data['count'], 1)
+        self.assertEqual(self.client.get(reverse('recent-ticks')).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('recent-ticks'), {'symbol': 'GOOGL', 'limit': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+class AlertRuleAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        self.client = APIClient()
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        self.symbol = StockSymbolFactory(ticker='GOOGL', name='Google')
+        self.other_rule = AlertRule.objects.create(user=self.other_user, symbol=self.symbol, direction='UP', threshold=1, window=60)
+
+    def test_create_and_list_own_rules(self):
+        response = self.client.post(reverse('alert-rule-list'), {'symbol': 'GOOGL', 'direction': 'DOWN', 'threshold': '3.5', 'window': 900}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AlertRule.objects.get(pk=response.data['id']).user, self.user)
+
+        response = self.client.get(reverse('alert-rule-list'))
+        self.assertEqual([rule['id'] for rule in response.data['results']], [AlertRule.objects.get(user=self.user).id])
+        self.assertEqual(self.client.get(reverse('alert-rule-detail', args=[self.other_rule.id])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_rules_are_rejected(self):
+        for data in (
+            {'symbol': 'NOPE', 'direction': 'UP', 'threshold': '1', 'window': 60},
+            {'symbol': 'GOOGL', 'direction': 'SIDEWAYS', 'threshold': '1', 'window': 60},
+            {'symbol': 'GOOGL', 'direction': 'UP', 'threshold': '0', 'window': 60},
+            {'symbol': 'GOOGL', 'direction': 'UP', 'threshold': '1', 'window': 61},
+        ):
+            self.assertEqual(self.client.post(reverse('alert-rule-list'), data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MAX_ALERT_RULES_PER_USER=1)
+    def test_rule_limit_per_user(self):
+        data = {'symbol': 'GOOGL', 'direction': 'UP', 'threshold': '1', 'window': 60}
+        self.assertEqual(self.client.post(reverse('alert-rule-list'), data, format='json').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(reverse('alert-rule-list'), data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_alerts_are_listed_per_user(self):
+        rule = AlertRule.objects.create(user=self.user, symbol=self.symbol, direction='UP', threshold=1, window=60)
+        Alert.objects.create(rule=rule, user=self.user, symbol=self.symbol, timestamp=timezone.now(), details={'percentage_change': '1.20'})
+        Alert.objects.create(rule=self.other_rule, user=self.other_user, symbol=self.symbol, timestamp=timezone.now(), details={})
+
+        response = self.client.get(reverse('alert-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(alert['rule'], alert['symbol']) for alert in response.data['results']], [(rule.id, 'GOOGL')])
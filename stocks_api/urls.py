@@ -1,17 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DailyAggregatesView, EventSummaryView, FetchLatestStockDataView, PriceHistoryViewSet, SignificantEventViewSet, StockSymbolViewSet
+from .views import AggregateAnalyticsView, AlertRuleViewSet, AlertViewSet, AsyncDailyAggregatesView, DailyAggregatesView, EventSummaryView, FetchLatestStockDataView, PriceExportView, PriceHistoryViewSet, RecentTicksView, SignificantEventStreamView, SignificantEventViewSet, StockSymbolViewSet
 from stocks_api.views import QueryTestPageView
 
 router = DefaultRouter()
 router.register(r'significant-events', SignificantEventViewSet, basename='significant-event')
 router.register(r'price-history', PriceHistoryViewSet, basename='price-history')
 router.register(r'symbols', StockSymbolViewSet, basename='stock-symbol')
+router.register(r'alert-rules', AlertRuleViewSet, basename='alert-rule')
+router.register(r'alerts', AlertViewSet, basename='alert')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('test-query-page/', QueryTestPageView.as_view(), name='test_query_page'),
     path('event-summary/', EventSummaryView.as_view(), name='event-summary'),
+    path('event-stream/', SignificantEventStreamView.as_view(), name='event-stream'),
     path('fetch-latest/', FetchLatestStockDataView.as_view(), name='fetch-latest-stock-data'),
     path('daily-aggregates/', DailyAggregatesView.as_view(), name='daily-aggregates'),
+    path('async/daily-aggregates/', AsyncDailyAggregatesView.as_view(), name='async-daily-aggregates'),
+    path('aggregate-analytics/', AggregateAnalyticsView.as_view(), name='aggregate-analytics'),
+    path('price-export/', PriceExportView.as_view(), name='price-export'),
+    path('recent-ticks/', RecentTicksView.as_view(), name='recent-ticks'),
 ]
@@ -1,27 +1,76 @@
-from datetime import date, timedelta, datetime
+from datetime import date, timedelta, datetime, timezone as dt_timezone
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.generic import TemplateView
 
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.exceptions import ParseError, NotFound
+from rest_framework.exceptions import APIException, NotAuthenticated, ParseError, NotFound, ValidationError
 from rest_framework.permissions import IsAdminUser, AllowAny,  IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from rest_framework import status, viewsets, permissions, filters
+from rest_framework.decorators import action
 
 import uuid
 
-from .models import SignificantEvent, StockSymbol, PriceUpdate
-from .serializers import SignificantEventSerializer, StockSymbolSerializer, PriceUpdateSerializer
-from .services.polygon_service import PolygonService
-from .services.analysis_service import StockAnalysisService
+from .models import Alert, AlertRule, SignificantEvent, StockSymbol, PriceUpdate
+from .pagination import TimestampKeysetPagination
+from .serializers import AlertRuleSerializer, AlertSerializer, SignificantEventSerializer, StockSymbolSerializer, PriceUpdateSerializer
+from .services.async_polygon_service import AsyncPolygonService
+from .services.analytics import RESAMPLE_INTERVALS, aggregates_to_frame, analyze_aggregates, frame_to_series, lttb_indices, prices_to_frame, resample_prices
+from .services.bar_store import DailyBarStore
+from .services.event_stream import stream_events
+from .services.export import EXPORT_CONTENT_TYPES, EXPORT_FORMATS, export_queryset
+from .services.analysis_service import get_analysis_service
 from .tasks import fetch_and_process_stock_data_task
 
-class SignificantEventViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly, events created by background task
+class CompactListMixin:
+    """
+    Adds a `compact/` list route that skips the serializers: rows are read with
+    values_list() (no model instances, symbol inlined as its ticker) and returned
+    as flat arrays under a single 'columns' header. Filtering, ordering and
+    pagination work as on the regular list route.
+    Set ?columnar=true to get one array per column instead of one per row.
+    """
+    compact_fields = [] # (output column, queryset field) pairs; must include 'id' and 'timestamp'
+    compact_string_columns = [] # columns sent as strings, like their serializer fields (e.g. decimals)
+
+    @action(detail=False, methods=['get'])
+    def compact(self, request, *args, **kwargs):
+        columns = [column for column, _ in self.compact_fields]
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values_list(*(field for _, field in self.compact_fields), named=True)
+
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        string_positions = [columns.index(column) for column in self.compact_string_columns]
+        results = [list(row) for row in rows]
+        for row in results:
+            for position in string_positions:
+                if row[position] is not None:
+                    row[position] = str(row[position])
+
+        if request.query_params.get('columnar', '').lower() in ('1', 'true', 'yes'):
+            results = {column: [row[i] for row in results] for i, column in enumerate(columns)}
+
+        if page is None:
+            return Response({'columns': columns, 'results': results})
+        response = self.get_paginated_response(results)
+        response.data = {'columns': columns, **response.data}
+        return response
+
+class SignificantEventViewSet(CompactListMixin, viewsets.ReadOnlyModelViewSet): # ReadOnly, events created by background task
     """
     API endpoint to query significant stock price change events.
     Supports filtering by:
@@ -29,11 +78,13 @@ class SignificantEventViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly, events
     - event_type (e.g., ?event_type=PRICE_INCREASE)
     - timestamp__gte (e.g., ?timestamp__gte=2023-01-01T00:00:00Z)
     - timestamp__lte
-    Supports pagination.
+    Supports keyset pagination on (timestamp, id), see TimestampKeysetPagination.
+    Flat rows without nested symbols are served at compact/, see CompactListMixin.
     """
     queryset = SignificantEvent.objects.all().select_related('symbol').order_by('-timestamp')
     serializer_class = SignificantEventSerializer
     permission_classes = [permissions.IsAuthenticated] # Requires JWT token
+    pagination_class = TimestampKeysetPagination
 
     # Filtering
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -44,6 +95,51 @@ class SignificantEventViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly, events
     }
     ordering_fields = ['timestamp', 'symbol__ticker', 'event_type']
     ordering = ['-timestamp'] # Default ordering
+    compact_fields = [('id', 'id'), ('symbol', 'symbol_id'), ('event_type', 'event_type'), ('timestamp', 'timestamp'), ('details', 'details')]
+
+class AlertRuleViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint to manage the current user's alert rules: alert when a symbol
+    moves by at least `threshold` percent `direction` (UP or DOWN) within
+    `window` seconds. Rules are evaluated on every ingested batch.
+    Supports filtering by symbol, direction and enabled.
+    """
+    serializer_class = AlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['symbol', 'direction', 'enabled']
+    ordering_fields = ['created_at', 'symbol', 'threshold']
+
+    def get_queryset(self):
+        return AlertRule.objects.filter(user=self.request.user).order_by('-created_at')
+
+    def perform_create(self, serializer):
+        if AlertRule.objects.filter(user=self.request.user).count() >= settings.MAX_ALERT_RULES_PER_USER:
+            raise ValidationError(f"At most {settings.MAX_ALERT_RULES_PER_USER} alert rules per user.")
+        serializer.save(user=self.request.user)
+
+class AlertViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint to query the alerts triggered by the current user's rules.
+    Supports filtering by symbol, rule and timestamp (gte/lte), and keyset
+    pagination on (timestamp, id), see TimestampKeysetPagination.
+    """
+    serializer_class = AlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimestampKeysetPagination
+
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {
+        'symbol': ['exact'],
+        'rule': ['exact'],
+        'timestamp': ['gte', 'lte'],
+    }
+    ordering_fields = ['timestamp']
+    ordering = ['-timestamp']
+
+    def get_queryset(self):
+        return Alert.objects.filter(user=self.request.user).order_by('-timestamp')
 
 class StockSymbolViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -56,17 +152,20 @@ class StockSymbolViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['ticker', 'name']
 
-class PriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class PriceHistoryViewSet(CompactListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint to query price history for a specific stock symbol.
     Supports filtering by:
     - symbol__ticker (required, e.g., ?symbol__ticker=GOOGL)
     - timestamp__gte (e.g., ?timestamp__gte=2023-01-01T00:00:00Z)
     - timestamp__lte
-    Supports pagination.
+    Supports keyset pagination on (timestamp, id), see TimestampKeysetPagination.
+    Flat rows without nested symbols are served at compact/, see CompactListMixin.
+    Downsampled series for charts are served at bars/, see bars().
     """
     serializer_class = PriceUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimestampKeysetPagination
 
     # Filtering
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -76,6 +175,9 @@ class PriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     }
     ordering_fields = ['timestamp']
     ordering = ['timestamp']  # Default ordering - oldest to newest
+    compact_fields = [('id', 'id'), ('symbol', 'symbol_id'), ('timestamp', 'timestamp'), ('price', 'price'), ('volume', 'volume')]
+    compact_string_columns = ['price']
+    MAX_POINTS = 5000
 
     def get_queryset(self):
         """
@@ -91,17 +193,76 @@ class PriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def bars(self, request, *args, **kwargs):
+        """
+        Unpaginated chart series with the list route's filters, downsampled server side:
+        - symbol__ticker (required)
+        - interval (optional): One of RESAMPLE_INTERVALS (e.g. 5m, 1h, 1d). Ticks are
+          bucketed into open/high/low/close/volume/count bars. Without it rows are raw ticks.
+        - points (optional): Keep at most this many rows (3 to MAX_POINTS), picked with
+          LTTB on the close (or tick price) so the chart keeps its shape.
+        - columnar (optional): true for one array per column, as on compact/.
+        Without a timestamp filter interval or points is required, so a symbol's whole
+        history is never returned as raw ticks.
+        """
+        if not request.query_params.get('symbol__ticker'):
+            raise ParseError("symbol__ticker is required.")
+        interval = request.query_params.get('interval')
+        if interval and interval not in RESAMPLE_INTERVALS:
+            raise ParseError(f"interval must be one of {', '.join(RESAMPLE_INTERVALS)}.")
+        points = request.query_params.get('points')
+        if points is not None:
+            try:
+                points = int(points)
+            except ValueError:
+                raise ParseError("points must be an integer.")
+            if not 3 <= points <= self.MAX_POINTS:
+                raise ParseError(f"points must be between 3 and {self.MAX_POINTS}.")
+        has_time_range = any(param.startswith('timestamp__') for param in request.query_params)
+        if not (has_time_range or interval or points):
+            raise ParseError("interval or points is required without a timestamp__gte/timestamp__lte range.")
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('timestamp', 'id')
+        frame = prices_to_frame(queryset.values_list('timestamp', 'price', 'volume').iterator(chunk_size=settings.PRICE_EXPORT_CHUNK_SIZE))
+        tick_count = len(frame)
+        if interval:
+            frame = resample_prices(frame, interval)
+        if points and len(frame) > points:
+            values = frame['close' if interval else 'price'].to_numpy()
+            frame = frame.iloc[lttb_indices(frame.index.asi8.astype(float), values, points)]
+
+        series = frame_to_series(frame)
+        columns = list(series)
+        if request.query_params.get('columnar', '').lower() in ('1', 'true', 'yes'):
+            results = series
+        else:
+            results = [list(row) for row in zip(*series.values())]
+        return Response({
+            'symbol': request.query_params.get('symbol__ticker'),
+            'interval': interval,
+            'tick_count': tick_count,
+            'count': len(frame),
+            'columns': columns,
+            'results': results,
+        })
+
 class EventSummaryView(APIView):
     """
     API endpoint to get a summary of significant events.
     Supports days parameter to specify the time period (default: 7 days).
+    Optional breakdowns:
+    - daily=true: per-day event counts
+    - top=N: the N symbols with the most events
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, format=None):
         days = int(request.query_params.get('days', 7))
-        analysis_service = StockAnalysisService()
-        summary = analysis_service.get_significant_events_summary(days=days)
+        include_daily = request.query_params.get('daily', '').lower() in ('1', 'true', 'yes')
+        top_n = int(request.query_params.get('top', 0)) or None
+        analysis_service = get_analysis_service()
+        summary = analysis_service.get_significant_events_summary(days=days, include_daily=include_daily, top_n=top_n)
         return Response(summary)
 
 # @method_decorator(login_required, name='dispatch')
@@ -133,10 +294,35 @@ class FetchLatestStockDataView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def parse_date_range(query_params):
+    """
+    Read the date_from / date_to (YYYY-MM-DD) query parameters.
+    date_to defaults to yesterday and date_from to 30 days of data ending at date_to.
+    """
+    date_to_str = query_params.get('date_to')
+    date_from_str = query_params.get('date_from')
+
+    try:
+        if date_to_str:
+            date_to_obj = datetime.strptime(date_to_str, '%Y-%m-%d').date()
+        else:
+            date_to_obj = date.today() - timedelta(days=1) # Defaults to yesterday
+
+        if date_from_str:
+            date_from_obj = datetime.strptime(date_from_str, '%Y-%m-%d').date()
+        else:
+            date_from_obj = date_to_obj - timedelta(days=29) # Defaults to 30 days of data (ending yesterday)
+
+    except ValueError:
+        raise ParseError("Invalid date format. Please use YYYY-MM-DD.")
+
+    return date_from_obj, date_to_obj
+
 class DailyAggregatesView(APIView):
     """
     Retrieves daily Open, High, Low, Close (OHLC) data for a given stock symbol
-    from Polygon.io for a specified date range.
+    for a specified date range. Bars are served from the local DailyBar table;
+    only ranges that were never downloaded are fetched from Polygon.io.
     Query parameters:
     - symbol (required): The stock ticker (e.g., GOOGL).
     - date_from (optional): Start date (YYYY-MM-DD). Defaults to 30 days ago.
@@ -149,32 +335,11 @@ class DailyAggregatesView(APIView):
         if not symbol:
             return Response({"error": "Symbol query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        date_to_str = request.query_params.get('date_to')
-        date_from_str = request.query_params.get('date_from')
-
-        try:
-            if date_to_str:
-                date_to_obj = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-            else:
-                date_to_obj = date.today() - timedelta(days=1) # Defaults to yesterday
-
-            if date_from_str:
-                date_from_obj = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-            else:
-                date_from_obj = date_to_obj - timedelta(days=29) # Defaults to 30 days of data (ending yesterday)
-
-            if date_from_obj > date_to_obj:
-                return Response({"error": "date_from cannot be after date_to."}, status=status.HTTP_400_BAD_REQUEST)
-
-        except ValueError:
-            raise ParseError("Invalid date format. Please use YYYY-MM-DD.")
+        date_from_obj, date_to_obj = parse_date_range(request.query_params)
+        if date_from_obj > date_to_obj:
+            return Response({"error": "date_from cannot be after date_to."}, status=status.HTTP_400_BAD_REQUEST)
 
-        polygon_service = PolygonService()
-        aggregates = polygon_service.get_daily_aggregates(
-            symbol.upper(),
-            date_from_obj.strftime('%Y-%m-%d'),
-            date_to_obj.strftime('%Y-%m-%d')
-        )
+        aggregates = DailyBarStore().get_bars(symbol.upper(), date_from_obj, date_to_obj)
 
         if aggregates is None: # Service indicated an error fetching data
             return Response(
@@ -187,4 +352,256 @@ class DailyAggregatesView(APIView):
                 status=status.HTTP_200_OK
             )
 
-        return Response(aggregates, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(aggregates, status=status.HTTP_200_OK)
+
+async def authenticate_jwt(request, allow_query_token=False):
+    """
+    JWT authentication for async Django views (DRF views are sync-only).
+
+    Args:
+        request: The Django request
+        allow_query_token (bool): Also accept the access token as ?token=, for
+                                  clients like EventSource that cannot set headers
+
+    Returns:
+        User: The authenticated user
+
+    Raises:
+        APIException: NotAuthenticated or AuthenticationFailed (401)
+    """
+    authentication = JWTAuthentication()
+
+    def authenticate():
+        result = authentication.authenticate(request)
+        if result is None and allow_query_token and request.GET.get('token'):
+            validated_token = authentication.get_validated_token(request.GET['token'])
+            result = (authentication.get_user(validated_token), validated_token)
+        if result is None or not result[0].is_authenticated:
+            raise NotAuthenticated()
+        return result[0]
+
+    return await sync_to_async(authenticate)()
+
+class AsyncDailyAggregatesView(View):
+    """
+    Async DailyAggregatesView for ASGI deployments (e.g. uvicorn financial_analyzer.asgi:application).
+    Same parameters and responses, but Polygon downloads are awaited on a shared pooled
+    client (AsyncPolygonService) so a single process can serve many requests whose
+    data is still being fetched. DRF views are sync, so JWT authentication is done here.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            await authenticate_jwt(request)
+            date_from_obj, date_to_obj = parse_date_range(request.GET)
+        except APIException as e:
+            return JsonResponse({"detail": e.detail}, status=e.status_code)
+
+        symbol = request.GET.get('symbol')
+        if not symbol:
+            return JsonResponse({"error": "Symbol query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from_obj > date_to_obj:
+            return JsonResponse({"error": "date_from cannot be after date_to."}, status=status.HTTP_400_BAD_REQUEST)
+
+        bar_store = DailyBarStore(polygon_service=AsyncPolygonService())
+        aggregates = await bar_store.aget_bars(symbol.upper(), date_from_obj, date_to_obj)
+
+        if aggregates is None:
+            return JsonResponse(
+                {"error": f"Could not retrieve aggregate data for {symbol} from external service."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if not aggregates:
+            return JsonResponse({"message": f"No aggregate data found for {symbol} in the specified range.", "results": []})
+        return JsonResponse(aggregates, safe=False)
+
+class SignificantEventStreamView(View):
+    """
+    Pushes new significant events as Server-Sent Events instead of clients polling
+    /significant-events/. Run under ASGI; one database poller per process feeds every
+    connected client (see EventBroadcaster).
+    Query parameters:
+    - symbols (optional): Comma-separated tickers to subscribe to (default: all).
+    - last_id (optional): Resume after this event id; the Last-Event-ID header that
+      EventSource sends on reconnect takes precedence.
+    - token (optional): JWT access token, for EventSource clients that cannot send
+      an Authorization header.
+    Each message has the event id as `id`, type `significant_event` and the event in
+    the significant-events JSON format as `data`.
+    Under WSGI the stream would be collected into a list before anything is sent,
+    holding a worker forever, so WSGI requests are answered with 501.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {"error": "The event stream requires an ASGI server, e.g. uvicorn financial_analyzer.asgi:application."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        try:
+            await authenticate_jwt(request, allow_query_token=True)
+        except APIException as e:
+            return JsonResponse({"detail": e.detail}, status=e.status_code)
+
+        tickers = {ticker.strip().upper() for ticker in request.GET.get('symbols', '').split(',') if ticker.strip()}
+        cursor = request.headers.get('Last-Event-ID') or request.GET.get('last_id')
+        try:
+            last_event_id = int(cursor) if cursor else None
+        except ValueError:
+            return JsonResponse({"error": "Last-Event-ID must be an event id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream_events(tickers, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # Tell nginx not to buffer the stream
+        return response
+
+class AggregateAnalyticsView(APIView):
+    """
+    Vectorized statistics over daily bars for one or more stock symbols:
+    mean/median, z-scores, rolling averages and volume anomalies.
+    Query parameters:
+    - symbols (required): Comma-separated tickers (e.g., GOOGL,MSFT), at most MAX_SYMBOLS.
+    - date_from (optional): Start date (YYYY-MM-DD). Defaults to 30 days ago.
+    - date_to (optional): End date (YYYY-MM-DD). Defaults to yesterday.
+    - window (optional): Rolling average window in bars (default: 20).
+    - zscore (optional): Absolute volume z-score that flags an anomaly (default: 2.0).
+    - timespan (optional): Bar size, one of TIMESPANS (default: day). Daily bars are
+      read through the local bar store, intraday bars are downloaded page by page from
+      Polygon's aggregates endpoint.
+    A symbol whose bars could not be retrieved gets an error entry in the results; if
+    none could be retrieved the response is a 503.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_SYMBOLS = 20
+    TIMESPANS = ['minute', 'hour', 'day']
+
+    def get(self, request, *args, **kwargs):
+        symbols = [ticker.strip().upper() for ticker in request.query_params.get('symbols', '').split(',') if ticker.strip()]
+        if not symbols:
+            return Response({"error": "Symbols query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(symbols) > self.MAX_SYMBOLS:
+            return Response({"error": f"At most {self.MAX_SYMBOLS} symbols can be analyzed at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        date_from_obj, date_to_obj = parse_date_range(request.query_params)
+        if date_from_obj > date_to_obj:
+            return Response({"error": "date_from cannot be after date_to."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            window = int(request.query_params.get('window', 20))
+            zscore_threshold = float(request.query_params.get('zscore', 2.0))
+        except ValueError:
+            raise ParseError("window must be an integer and zscore a number.")
+        if window < 1:
+            raise ParseError("window must be at least 1.")
+        timespan = request.query_params.get('timespan', 'day')
+        if timespan not in self.TIMESPANS:
+            raise ParseError(f"timespan must be one of {', '.join(self.TIMESPANS)}.")
+
+        bar_store = DailyBarStore()
+        results = {}
+        for symbol in dict.fromkeys(symbols):
+            if timespan == 'day':
+                aggregates = bar_store.get_bars(symbol, date_from_obj, date_to_obj)
+            else:
+                aggregates = bar_store.polygon_service.get_aggregate_bars(
+                    symbol, 1, timespan, date_from_obj.strftime('%Y-%m-%d'), date_to_obj.strftime('%Y-%m-%d')
+                )
+            if aggregates is None:
+                results[symbol] = {"error": f"Could not retrieve aggregate data for {symbol} from external service."}
+                continue
+            results[symbol] = analyze_aggregates(aggregates_to_frame(aggregates), window=window, zscore_threshold=zscore_threshold)
+
+        if all('error' in result for result in results.values()):
+            return Response(
+                {"error": "Could not retrieve aggregate data from external service.", "results": results},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({
+            'period': {'from': date_from_obj, 'to': date_to_obj},
+            'timespan': timespan,
+            'window': window,
+            'zscore_threshold': zscore_threshold,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+class RecentTicksView(APIView):
+    """
+    The most recent ticks of a symbol, served from the in-memory tick buffer.
+    Query parameters:
+    - symbol (required): The ticker (e.g., GOOGL).
+    - seconds (optional): Only ticks from the last N seconds.
+    - limit (optional): Only the newest N ticks (default and max: settings.TICK_BUFFER_SIZE).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        symbol = request.query_params.get('symbol', '').strip().upper()
+        if not symbol:
+            return Response({"error": "Symbol query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            seconds = int(request.query_params.get('seconds', 0)) or None
+            limit = int(request.query_params.get('limit', settings.TICK_BUFFER_SIZE))
+        except ValueError:
+            raise ParseError("seconds and limit must be integers.")
+        if limit < 1 or (seconds is not None and seconds < 1):
+            raise ParseError("seconds and limit must be positive.")
+
+        recent = get_analysis_service().get_recent_ticks(symbol, seconds=seconds, limit=min(limit, settings.TICK_BUFFER_SIZE))
+        return Response({'symbol': symbol, **recent}, status=status.HTTP_200_OK)
+
+def parse_timestamp(value, end_of_day=False):
+    """
+    Parse an ISO 8601 datetime or a YYYY-MM-DD date (start of day, or end of day
+    when end_of_day is set) into an aware datetime. Returns None for empty values.
+    """
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            parsed = datetime.combine(day, datetime.max.time() if end_of_day else datetime.min.time())
+    except ValueError:
+        raise ParseError(f"Invalid timestamp '{value}'. Use YYYY-MM-DD or an ISO 8601 datetime.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+class PriceExportView(APIView):
+    """
+    Streams price history for a set of symbols and a time range without paging.
+    Rows are read from the database in chunks and written out as they arrive, so
+    server memory stays bounded however many rows are exported.
+    Query parameters:
+    - symbols (required): Comma-separated tickers (e.g., GOOGL,MSFT).
+    - timestamp__gte (optional): Start, YYYY-MM-DD or ISO 8601 datetime.
+    - timestamp__lte (optional): End, YYYY-MM-DD (whole day) or ISO 8601 datetime.
+    - output (optional): csv (default), ndjson (one JSON object per row) or columnar
+      (one JSON object of column lists per chunk).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        symbols = [ticker.strip().upper() for ticker in request.query_params.get('symbols', '').split(',') if ticker.strip()]
+        if not symbols:
+            return Response({"error": "Symbols query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        output = request.query_params.get('output', 'csv').lower()
+        if output not in EXPORT_FORMATS:
+            raise ParseError(f"output must be one of {', '.join(EXPORT_FORMATS)}.")
+
+        timestamp_from = parse_timestamp(request.query_params.get('timestamp__gte'))
+        timestamp_to = parse_timestamp(request.query_params.get('timestamp__lte'), end_of_day=True)
+        if timestamp_from and timestamp_to and timestamp_from > timestamp_to:
+            return Response({"error": "timestamp__gte cannot be after timestamp__lte."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = export_queryset(symbols, timestamp_from, timestamp_to)
+        response = StreamingHttpResponse(
+            EXPORT_FORMATS[output](queryset, settings.PRICE_EXPORT_CHUNK_SIZE),
+            content_type=EXPORT_CONTENT_TYPES[output],
+        )
+        extension = 'csv' if output == 'csv' else 'ndjson'
+        response['Content-Disposition'] = f'attachment; filename="price-history.{extension}"'
+        return response